@@ -1,4 +1,4 @@
-from typing import Dict
+from typing import Dict, Hashable, Optional
 
 from sqlalchemy.sql import Selectable
 
@@ -49,6 +49,16 @@ class BaseAuth:
 
         raise ReadResourceForbidden()
 
+    @classmethod
+    def read_cache_key(cls, ctx) -> Optional[Hashable]:
+        """
+        Key of the query variant ``can_read`` builds for the request,
+        e.g. user role. Read queries of resources with auth are cached
+        only if it's set, so it has to cover everything ``can_read``
+        takes from ``ctx``.
+        """
+        return None
+
     @classmethod
     def can_update(cls, session, user_id: int, obj_ids: list, skip_exc=False):
         if skip_exc:
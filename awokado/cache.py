@@ -0,0 +1,265 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import (
+    Any,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    Set,
+    Tuple,
+)
+
+import falcon
+from dynaconf import settings
+from sqlalchemy.sql.util import find_tables
+
+from awokado.custom_fields import ToMany, ToOne
+from awokado.filter_parser import FilterGrammar, get_relation_paths
+from awokado.utils import get_column
+
+if False:
+    from awokado.resource import BaseResource
+
+
+class BaseCacheBackend:
+    """
+    Storage of cached read responses and versions of tables.
+
+    Cache keys contain versions of the tables the response is read from,
+    a write bumps versions of the written tables, so cached responses
+    read from them aren't found anymore and expire by TTL / eviction.
+    A shared backend (e.g. Redis) has to bump versions atomically.
+    """
+
+    def get(self, key: str) -> Optional[bytes]:
+        raise NotImplementedError()
+
+    def set(self, key: str, value: bytes, ttl: Optional[float] = None):
+        raise NotImplementedError()
+
+    def get_versions(self, tables: Sequence[str]) -> List[int]:
+        raise NotImplementedError()
+
+    def bump_versions(self, tables: Iterable[str]) -> None:
+        raise NotImplementedError()
+
+    def clear(self) -> None:
+        raise NotImplementedError()
+
+
+class MemoryCacheBackend(BaseCacheBackend):
+    """
+    In-process LRU cache with TTL, ``size`` entries at most.
+    Isn't shared between processes, also is a stand-in
+    of shared backends in tests.
+    """
+
+    def __init__(self, size: int):
+        self.size = size
+        self.entries: "OrderedDict[str, Tuple[bytes, Optional[float]]]"
+        self.entries = OrderedDict()
+        self.versions: Dict[str, int] = {}
+        self.lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+
+            value, expires = entry
+            if expires is not None and expires <= time.monotonic():
+                del self.entries[key]
+                return None
+
+            self.entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: bytes, ttl: Optional[float] = None):
+        expires = time.monotonic() + ttl if ttl is not None else None
+
+        with self.lock:
+            self.entries[key] = (value, expires)
+            self.entries.move_to_end(key)
+
+            while len(self.entries) > self.size:
+                self.entries.popitem(last=False)
+
+    def get_versions(self, tables: Sequence[str]) -> List[int]:
+        with self.lock:
+            return [self.versions.get(table, 0) for table in tables]
+
+    def bump_versions(self, tables: Iterable[str]) -> None:
+        with self.lock:
+            for table in tables:
+                self.versions[table] = self.versions.get(table, 0) + 1
+
+    def clear(self) -> None:
+        with self.lock:
+            self.entries.clear()
+            self.versions.clear()
+
+
+def get_tables(selectable: Any) -> Set[str]:
+    """Names of the tables of a model, table, join or cte"""
+    selectable = getattr(selectable, "__table__", selectable)
+    if selectable is None:
+        return set()
+
+    return {
+        table.fullname
+        for table in find_tables(selectable, include_joins=True)
+        if hasattr(table, "fullname")
+    }
+
+
+def iter_related(
+    resource: "BaseResource", paths: Optional[List[str]] = None
+) -> Iterator[Tuple[Any, "BaseResource"]]:
+    """Relation fields of ``paths`` with the resources they lead to"""
+    for path in paths or []:
+        related = resource
+        for relation in path.split("."):
+            field = related.fields.get(relation)
+            if not isinstance(field, (ToOne, ToMany)):
+                break
+
+            related = related.RESOURCES[field.metadata["resource"]]()
+            yield field, related
+
+
+def get_read_tables(
+    resource: "BaseResource", include: Optional[List[str]] = None
+) -> Set[str]:
+    """
+    Names of the tables read responses of the resource depend on:
+    tables of the model and ``select_from``, of included resources
+    and of the relation fields.
+    """
+    tables = get_tables(resource.Meta.model) | get_tables(
+        getattr(resource.Meta, "select_from", None)
+    )
+
+    for field, related in iter_related(resource, include):
+        column = get_column(field.metadata.get("model_field"))
+        if column is not None:
+            tables |= get_tables(column.table)
+
+        tables |= get_tables(related.Meta.model) | get_tables(
+            getattr(related.Meta, "select_from", None)
+        )
+
+    return tables
+
+
+def is_user_scoped(
+    resource: "BaseResource", include: Optional[List[str]] = None
+) -> bool:
+    """
+    Checks if read responses of the resource depend on the user:
+    the resource or any of the included (or filtered) ones has auth,
+    their records are read with ``can_read`` of the user.
+    """
+    if resource.Meta.auth:
+        return True
+
+    return any(
+        related.Meta.auth for _, related in iter_related(resource, include)
+    )
+
+
+def get_write_tables(resource: "BaseResource") -> Set[str]:
+    """Names of the tables writes of the resource change"""
+    tables = get_tables(resource.Meta.model)
+    for _, m2m in resource._to_many_fields:
+        if m2m.secondary is not None:
+            tables |= get_tables(m2m.secondary)
+
+    return tables
+
+
+class ReadCache:
+    """
+    Read-through cache of serialized read responses of resources with
+    ``cache_ttl`` in ``ResourceMeta``.
+
+    Responses are cached by resource, object id, normalized query params,
+    user (when the resource or included ones have auth, see
+    `is_user_scoped`) and versions of the tables they are
+    read from (see `get_read_tables`), including tables of filtered
+    relations. Create, update and delete requests
+    bump versions of the tables they change after commit.
+    """
+
+    def __init__(self, backend: BaseCacheBackend):
+        self.backend = backend
+        self.hits = 0
+        self.misses = 0
+
+    def make_key(
+        self,
+        resource: "BaseResource",
+        req: falcon.Request,
+        user_id: Optional[int],
+        resource_id: Any = None,
+    ) -> str:
+        params = tuple(
+            sorted(
+                (name, tuple(value) if isinstance(value, list) else (value,))
+                for name, value in req.params.items()
+            )
+        )
+        filters = FilterGrammar.get(type(resource)).parse(req.params)
+        paths = req.get_param_as_list("include") or []
+        paths += get_relation_paths(filters)
+        tables = sorted(get_read_tables(resource, paths))
+        versions = self.backend.get_versions(tables)
+        user_scope = user_id if is_user_scoped(resource, paths) else None
+
+        key = repr(
+            (
+                resource.Meta.name,
+                resource_id,
+                params,
+                user_scope,
+                list(zip(tables, versions)),
+            )
+        )
+        digest = hashlib.blake2b(key.encode(), digest_size=20).hexdigest()
+        return f"awokado:{resource.Meta.name}:{digest}"
+
+    def get(self, key: str) -> Optional[bytes]:
+        value = self.backend.get(key)
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+
+        return value
+
+    def set(self, key: str, value: bytes, ttl: Optional[float]) -> None:
+        self.backend.set(key, value, ttl)
+
+    def invalidate(self, tables: Iterable[str]) -> None:
+        self.backend.bump_versions(tables)
+
+    def invalidate_resource(self, resource: "BaseResource") -> None:
+        """Invalidates responses read from tables the resource writes"""
+        self.invalidate(get_write_tables(resource))
+
+    def stats(self) -> Dict[str, Any]:
+        return {"hits": self.hits, "misses": self.misses}
+
+    def clear(self) -> None:
+        self.backend.clear()
+        self.hits = self.misses = 0
+
+
+read_cache = ReadCache(
+    MemoryCacheBackend(int(settings.get("AWOKADO_READ_CACHE_SIZE", 1000)))
+)
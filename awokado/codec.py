@@ -0,0 +1,109 @@
+import json
+from typing import Any, Dict, IO, Type, Union
+
+from dynaconf import settings
+
+try:
+    import orjson
+except ImportError:
+    orjson = None  # type: ignore
+
+
+class BaseCodec:
+    """
+    JSON encoder/decoder used for request and response bodies.
+
+    ``dumps`` returns bytes and serializes values JSON doesn't support
+    (``Decimal``, ``datetime``, ``UUID`` and so on) with ``str``,
+    like ``json.dumps(obj, default=str)``.
+
+    The codec is chosen by ``AWOKADO_JSON_CODEC`` setting:
+    ``orjson``, ``json`` or ``auto`` (default) - orjson if it's installed.
+    """
+
+    NAME = ""
+
+    @classmethod
+    def is_available(cls) -> bool:
+        return True
+
+    @classmethod
+    def dumps(cls, obj: Any) -> bytes:
+        raise NotImplementedError()
+
+    @classmethod
+    def loads(cls, data: Union[bytes, str]) -> Any:
+        raise NotImplementedError()
+
+    @classmethod
+    def load(cls, stream: IO) -> Any:
+        return cls.loads(stream.read())
+
+
+class JsonCodec(BaseCodec):
+    NAME = "json"
+
+    @classmethod
+    def dumps(cls, obj: Any) -> bytes:
+        return json.dumps(obj, default=str).encode()
+
+    @classmethod
+    def loads(cls, data: Union[bytes, str]) -> Any:
+        return json.loads(data)
+
+
+class OrjsonCodec(BaseCodec):
+    NAME = "orjson"
+
+    @classmethod
+    def is_available(cls) -> bool:
+        return orjson is not None
+
+    # orjson serializes dates and dataclasses by itself,
+    # pass them to str as stdlib json does
+    OPTIONS = (
+        orjson.OPT_NON_STR_KEYS
+        | orjson.OPT_PASSTHROUGH_DATETIME
+        | orjson.OPT_PASSTHROUGH_DATACLASS
+        if orjson is not None
+        else 0
+    )
+
+    @classmethod
+    def dumps(cls, obj: Any) -> bytes:
+        result: bytes = orjson.dumps(obj, default=str, option=cls.OPTIONS)
+        return result
+
+    @classmethod
+    def loads(cls, data: Union[bytes, str]) -> Any:
+        return orjson.loads(data)
+
+
+CODECS: Dict[str, Type[BaseCodec]] = {
+    c.NAME: c for c in (OrjsonCodec, JsonCodec)
+}
+
+
+def get_codec(name: str = None) -> Type[BaseCodec]:
+    if name is None:
+        name = settings.get("AWOKADO_JSON_CODEC", "auto")
+
+    if name == "auto":
+        for codec in CODECS.values():
+            if codec.is_available():
+                return codec
+
+    if name not in CODECS:
+        raise Exception(
+            f"Unknown JSON codec {name}, use one of: "
+            f"auto, {', '.join(CODECS)}"
+        )
+
+    codec = CODECS[name]
+    if not codec.is_available():
+        raise Exception(f"JSON codec {name} is not installed")
+
+    return codec
+
+
+codec = get_codec()
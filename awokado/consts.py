@@ -22,6 +22,18 @@ OP_CONTAINS = "contains"
 OP_LT = "lt"
 OP_GT = "gt"
 
+# Text search operators, allowed for fields declaring them in text_ops
+OP_SEARCH = "search"
+OP_STARTSWITH = "startswith"
+OP_SIMILAR = "similar"
+TEXT_OPERATORS = (OP_SEARCH, OP_STARTSWITH, OP_SIMILAR)
+
+# Kinds of total in list responses
+TOTAL_KIND_EXACT = "exact"
+TOTAL_KIND_ESTIMATED = "estimated"
+TOTAL_KIND_CAPPED = "capped"
+TOTAL_KIND_HAS_MORE = "has_more"
+
 DEFAULT_ACCESS_CONTROL_HEADERS = [
     [
         "Access-Control-Allow-Headers",
@@ -1,10 +1,12 @@
 import sqlalchemy as sa
-from sqlalchemy.pool import QueuePool
+from sqlalchemy.engine import Engine
 
 import clavis
 from dynaconf import settings
 
-from awokado.db_helper import Database
+from awokado.db_helper import Database, ReplicaRouter
+from awokado.metrics import MeteredQueuePool
+from awokado.query_stats import instrument_engine
 
 
 database = Database.from_config(settings)
@@ -18,11 +20,31 @@ DATABASE_DB = database.DATABASE_DB
 
 clavis.configure(DATABASE_URL)
 
-persistent_engine = sa.create_engine(
-    DATABASE_URL,
-    encoding="utf-8",
-    echo=settings.get("DB_ECHO", False),
-    poolclass=QueuePool,
-    pool_size=settings.get("DB_CONN_POOL_SIZE", 10),
-    max_overflow=settings.get("DB_CONN_MAX_OVERFLOW", 5),
+
+def create_persistent_engine(url: str) -> Engine:
+    engine = sa.create_engine(
+        url,
+        encoding="utf-8",
+        echo=settings.get("DB_ECHO", False),
+        poolclass=MeteredQueuePool,
+        pool_size=settings.get("DB_CONN_POOL_SIZE", 10),
+        max_overflow=settings.get("DB_CONN_MAX_OVERFLOW", 5),
+    )
+    if settings.get("AWOKADO_QUERY_STATS", True):
+        instrument_engine(engine)
+
+    return engine
+
+
+persistent_engine = create_persistent_engine(DATABASE_URL)
+
+DATABASE_REPLICA_URLS = settings.get("DATABASE_REPLICA_URLS", None) or []
+
+replica_router = ReplicaRouter(
+    (DATABASE_URL, persistent_engine),
+    [(url, create_persistent_engine(url)) for url in DATABASE_REPLICA_URLS],
+    max_lag=float(settings.get("AWOKADO_REPLICA_MAX_LAG", 10)),
+    lag_check_interval=float(
+        settings.get("AWOKADO_REPLICA_LAG_CHECK_INTERVAL", 5)
+    ),
 )
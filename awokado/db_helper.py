@@ -1,9 +1,16 @@
+import itertools
+import math
+import threading
+import time
 from contextlib import contextmanager
 from dataclasses import dataclass
 from logging import getLogger
+from typing import Dict, List, Optional, Tuple
 from urllib.parse import urlparse
 
+import sqlalchemy as sa
 from sqlalchemy import create_engine, MetaData
+from sqlalchemy.engine import Engine
 
 log = getLogger("db_helper")
 
@@ -115,3 +122,70 @@ class Database:
 
     def __str__(self):
         return self.db_url
+
+
+class ReplicaRouter:
+    """
+    Chooses the database of read transactions: replicas round-robin,
+    skipping ones which lag behind the primary more than ``max_lag``
+    seconds (checked once in ``lag_check_interval`` seconds),
+    the primary if there are no replicas in sync or the reads
+    are pinned to it (read-your-writes).
+    """
+
+    LAG_QUERY = (
+        "SELECT CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() "
+        "THEN 0 "
+        "ELSE extract(epoch FROM now() - pg_last_xact_replay_timestamp()) END"
+    )
+
+    def __init__(
+        self,
+        primary: Tuple[str, Engine],
+        replicas: List[Tuple[str, Engine]],
+        max_lag: float = 10,
+        lag_check_interval: float = 5,
+    ):
+        self.primary = primary
+        self.replicas = replicas
+        self.max_lag = max_lag
+        self.lag_check_interval = lag_check_interval
+        self.lags: Dict[str, Tuple[Optional[float], float]] = {}
+        self.counter = itertools.count()
+        self.lock = threading.Lock()
+
+    def get_lag(self, url: str, engine: Engine) -> Optional[float]:
+        """Replication lag of the replica in seconds, None if it's down"""
+        with self.lock:
+            lag, checked_at = self.lags.get(url, (None, -math.inf))
+
+        now = time.monotonic()
+        if now - checked_at < self.lag_check_interval:
+            return lag
+
+        try:
+            with engine.connect() as conn:
+                lag = conn.execute(sa.text(self.LAG_QUERY)).scalar()
+            lag = float(lag or 0)
+        except sa.exc.DBAPIError:
+            log.warning("Replica %s is unavailable", engine.url, exc_info=True)
+            lag = None
+
+        with self.lock:
+            self.lags[url] = (lag, now)
+
+        return lag
+
+    def choose(self, pinned: bool = False) -> Tuple[str, Engine]:
+        """(url, engine) of the database to read from"""
+        if pinned or not self.replicas:
+            return self.primary
+
+        start = next(self.counter)
+        for i in range(len(self.replicas)):
+            url, engine = self.replicas[(start + i) % len(self.replicas)]
+            lag = self.get_lag(url, engine)
+            if lag is not None and lag <= self.max_lag:
+                return url, engine
+
+        return self.primary
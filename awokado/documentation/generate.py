@@ -137,6 +137,35 @@ class APIDocs:
                         "starting to collect the result set",
                         "integer",
                     ),
+                    (
+                        "after",
+                        "Cursor from meta.next, returns the page "
+                        "following it",
+                        "string",
+                    ),
+                    (
+                        "before",
+                        "Cursor from meta.prev, returns the page "
+                        "preceding it",
+                        "string",
+                    ),
+                    (
+                        "total",
+                        "Set false to skip counting of the total",
+                        "boolean",
+                    ),
+                    (
+                        "stream",
+                        "Set true to stream the list response "
+                        "from a server-side cursor",
+                        "boolean",
+                    ),
+                    (
+                        "fields",
+                        "Comma separated names of the fields to return, "
+                        "use fields[resource_name] for included resources",
+                        "string",
+                    ),
                     (
                         "sort",
                         "Sorting fields. Use '-' before field name "
@@ -3,9 +3,11 @@ from .base import BaseApiException
 from .not_found import NotFound, RelationNotFound, ResourceNotFound
 
 from .bad_request import (
+    BadCursor,
     BadFilter,
     BadLimitOffset,
     BadRequest,
+    BadSort,
     MethodNotAllowed,
     IdFieldMissingError,
 )
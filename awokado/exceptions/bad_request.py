@@ -19,6 +19,11 @@ class BadLimitOffset(BadRequest):
         BadRequest.__init__(self, code="bad-limit-offset", details=details)
 
 
+class BadCursor(BadRequest):
+    def __init__(self, details="Cursor is invalid or expired"):
+        BadRequest.__init__(self, code="bad-cursor", details=details)
+
+
 class BadFilter(BadRequest):
     def __init__(self, filter=None, details=None):
         if not details:
@@ -29,6 +34,16 @@ class BadFilter(BadRequest):
         BadRequest.__init__(self, code="bad-filter", details=details)
 
 
+class BadSort(BadRequest):
+    def __init__(self, sort=None, details=None):
+        if not details:
+            if sort:
+                details = f"Sorting by {sort} is not supported"
+            else:
+                details = "Sorting is not supported"
+        BadRequest.__init__(self, code="bad-sort", details=details)
+
+
 class MethodNotAllowed(BaseApiException):
     def __init__(self, details="", code="method-not-allowed"):
         BaseApiException.__init__(
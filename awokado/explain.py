@@ -0,0 +1,134 @@
+import json
+import re
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar, Token
+from typing import Any, Dict, Iterator, List, Optional, Sequence
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.base import Executable
+from sqlalchemy.sql.elements import ClauseElement
+
+
+class Explain(Executable, ClauseElement):
+    """
+    ``EXPLAIN (<options>) <statement>`` construct,
+    keeps bind parameters of the explained statement.
+    """
+
+    def __init__(self, statement, options: Sequence[str] = ("FORMAT JSON",)):
+        self.statement = statement
+        self.options = tuple(options)
+
+
+@compiles(Explain, "postgresql")
+def compile_explain(element: Explain, compiler, **kw):
+    statement = compiler.process(element.statement, **kw)
+    return f"EXPLAIN ({', '.join(element.options)}) {statement}"
+
+
+def get_plan(
+    session,
+    statement,
+    options: Sequence[str] = ("FORMAT JSON",),
+    params: Optional[dict] = None,
+):
+    """Returns the JSON plan of the statement executed with ``params``"""
+    plan = session.execute(Explain(statement, options), params).scalar()
+
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+
+    return plan
+
+
+EXPLAIN_OPTIONS = ("FORMAT JSON",)
+EXPLAIN_ANALYZE_OPTIONS = ("ANALYZE", "BUFFERS", "FORMAT JSON")
+READ_STATEMENT_RE = re.compile(r"\s*(SELECT|WITH)\b", re.IGNORECASE)
+
+
+class PlanCapture:
+    """
+    Plans of the read statements executed while the capture is active
+    (see `capture_plans`), each is ``{"statement": ..., "plan": ...}``.
+    """
+
+    def __init__(self, options: Sequence[str] = EXPLAIN_OPTIONS):
+        self.options = tuple(options)
+        self.plans: List[Dict[str, Any]] = []
+
+    def explain(self, connection, statement: str, parameters) -> None:
+        # raw DBAPI cursor: the EXPLAIN isn't captured itself
+        cursor = connection.connection.cursor()
+        try:
+            cursor.execute(
+                f"EXPLAIN ({', '.join(self.options)}) {statement}", parameters
+            )
+            plan = cursor.fetchone()[0]
+        finally:
+            cursor.close()
+
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+
+        self.plans.append({"statement": statement, "plan": plan})
+
+
+_capture: ContextVar[Optional[PlanCapture]] = ContextVar(
+    "awokado_plan_capture", default=None
+)
+_listener_lock = threading.Lock()
+_listening = False
+
+
+def _before_cursor_execute(
+    connection, cursor, statement, parameters, context, executemany
+):
+    capture = _capture.get()
+    if (
+        capture is not None
+        and not executemany
+        and READ_STATEMENT_RE.match(statement)
+    ):
+        capture.explain(connection, statement, parameters)
+
+
+def get_capture() -> Optional[PlanCapture]:
+    """Active plan capture of the current context, if there is one"""
+    return _capture.get()
+
+
+def start_capture(options: Sequence[str] = EXPLAIN_OPTIONS) -> Token:
+    """
+    Starts capturing plans of the read statements executed in the current
+    context, include loaders running in other threads with a copy of it
+    are captured too. The engine listener is added on the first capture,
+    so statements aren't intercepted until it's used.
+    """
+    global _listening
+
+    with _listener_lock:
+        if not _listening:
+            event.listen(
+                Engine, "before_cursor_execute", _before_cursor_execute
+            )
+            _listening = True
+
+    return _capture.set(PlanCapture(options))
+
+
+def stop_capture(token: Token) -> None:
+    _capture.reset(token)
+
+
+@contextmanager
+def capture_plans(
+    options: Sequence[str] = EXPLAIN_OPTIONS,
+) -> Iterator[PlanCapture]:
+    token = start_capture(options)
+    try:
+        yield _capture.get()  # type: ignore
+    finally:
+        stop_capture(token)
@@ -1,6 +1,21 @@
 import re
-from dataclasses import dataclass
-from typing import Type, List, Any, Callable, Dict, Tuple
+from dataclasses import dataclass, field, replace
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+    Type,
+    Union,
+)
+
+import sqlalchemy as sa
+from marshmallow.fields import List as ListField
+from sqlalchemy.sql import ClauseElement
+from sqlalchemy.sql.util import ClauseAdapter, find_tables
 
 from awokado.consts import (
     OP_LTE,
@@ -12,12 +27,29 @@ from awokado.consts import (
     OP_CONTAINS,
     OP_LT,
     OP_GT,
+    OP_SEARCH,
+    OP_SIMILAR,
+    OP_STARTSWITH,
+    TEXT_OPERATORS,
 )
+from awokado.custom_fields import ToMany, ToOne
 from awokado.exceptions.bad_request import BadFilter
 
 if False:
     from awokado.resource import BaseResource
 
+FILTER_GROUP_PARAM = "filter"
+FILTER_GROUP_OPS = ("and", "or", "not")
+FILTER_SEGMENT_RE = re.compile(r"\[([^\[\]]*)\]")
+LIKE_ESCAPE_RE = re.compile(r"([\\%_])")
+DEFAULT_SEARCH_CONFIG = "simple"
+
+
+def like_prefix(value: str) -> str:
+    """LIKE pattern of strings starting with ``value``"""
+    return LIKE_ESCAPE_RE.sub(r"\\\1", value) + "%"
+
+
 OPERATORS_MAPPING: Dict[str, Tuple[str, Callable]] = {
     OP_LTE: ("__le__", lambda v: v),
     OP_EQ: ("__eq__", lambda v: v),
@@ -28,6 +60,9 @@ OPERATORS_MAPPING: Dict[str, Tuple[str, Callable]] = {
     OP_CONTAINS: ("contains", lambda v: v),
     OP_LT: ("__lt__", lambda v: v),
     OP_GT: ("__gt__", lambda v: v),
+    OP_SEARCH: ("search", lambda v: v),
+    OP_STARTSWITH: ("like", like_prefix),
+    OP_SIMILAR: ("similar", lambda v: v),
 }
 
 
@@ -39,7 +74,7 @@ class FilterItem:
     value: Any
 
     @classmethod
-    def create(cls, field_name: str, op_name: str, value: Any):
+    def create(cls, field_name: str, op_name: str, value: Any) -> "FilterItem":
         op = OPERATORS_MAPPING.get(op_name)
 
         if not op:
@@ -56,31 +91,492 @@ class FilterItem:
     @classmethod
     def parse(
         cls, req_params: dict, resource: Type["BaseResource"]
-    ) -> List["FilterItem"]:
-        result = []
-        filter_expr = r"(?P<field_name>(%s))\[(?P<op_name>[a-z]+)\]" % "|".join(
-            resource().fields.keys()
+    ) -> List["Filter"]:
+        """
+        Filters of the request: ``field[op]=value`` params and
+        ``filter[or|and|not]...`` groups (see `FilterGrammar.parse`)
+        """
+        return FilterGrammar.get(resource).parse(req_params)
+
+    @classmethod
+    def id_in(cls, ids: List[int], field_name="id"):
+        op = OPERATORS_MAPPING[OP_IN]
+        return cls(field_name, op[0], op[1], ids)
+
+
+@dataclass
+class FilterGroup:
+    """
+    Boolean group of filters: ``and`` / ``or`` of its items,
+    ``not`` of ``and`` of its items
+    """
+
+    op: str
+    items: List["Filter"] = field(default_factory=list)
+
+
+@dataclass
+class IncludeFilter:
+    """
+    Filters of included records of the relation ``path``
+    (``filter[books.title][ilike]=x``), applied by the include loader
+    """
+
+    path: str
+    items: List["Filter"] = field(default_factory=list)
+
+
+Filter = Union[FilterItem, FilterGroup, IncludeFilter]
+
+
+def iter_filter_items(filters: Optional[List[Filter]]) -> Iterator[FilterItem]:
+    """Filter items of filters and nested groups, without include filters"""
+    for f in filters or []:
+        if isinstance(f, FilterGroup):
+            yield from iter_filter_items(f.items)
+        elif isinstance(f, FilterItem):
+            yield f
+
+
+def get_relation_paths(filters: Optional[List[Filter]]) -> List[str]:
+    """Relation paths of filters of related fields, ``books.store`` -> books"""
+    return [
+        f.field.rpartition(".")[0]
+        for f in iter_filter_items(filters)
+        if "." in f.field
+    ]
+
+
+def get_include_filters(
+    filters: Optional[List[Filter]],
+) -> Dict[str, List[Filter]]:
+    """Filters of included records by relation path"""
+    return {
+        f.path: f.items for f in filters or [] if isinstance(f, IncludeFilter)
+    }
+
+
+class FilterGrammar:
+    """
+    Filter params of a resource class, compiled once per class:
+    ``field[op]`` params of all fields and operators and
+    deserializers of the fields.
+    """
+
+    GRAMMARS: Dict[type, "FilterGrammar"] = {}
+
+    def __init__(self, resource_cls: Type["BaseResource"]):
+        self.resource = resource = resource_cls()
+        self.fields: Dict[str, Tuple[Any, Callable, bool]] = {
+            name: (
+                resource_field.metadata.get("model_field"),
+                resource_field.deserialize,
+                isinstance(resource_field, ListField),
+            )
+            for name, resource_field in resource.fields.items()
+        }
+        self.params: Dict[str, Tuple[str, str]] = {}
+        self.search_vectors: Dict[str, Tuple[Any, str]] = {}
+
+        filterable = resource.Meta.filterable
+        self.filterable = set(
+            resource.fields if filterable is None else filterable
+        )
+
+        for name, resource_field in resource.fields.items():
+            if name not in self.filterable:
+                continue
+
+            text_ops = resource_field.metadata.get("text_ops", ())
+            for op_name in OPERATORS_MAPPING:
+                if op_name in TEXT_OPERATORS and op_name not in text_ops:
+                    continue
+                self.params[f"{name}[{op_name}]"] = (name, op_name)
+
+            model_field = self.fields[name][0]
+            if OP_SEARCH in text_ops and model_field is not None:
+                config = resource_field.metadata.get(
+                    "search_config", DEFAULT_SEARCH_CONFIG
+                )
+                vector = resource_field.metadata.get("search_vector")
+                if vector is None:
+                    vector = sa.func.to_tsvector(config, model_field)
+                self.search_vectors[name] = (vector, config)
+
+    @classmethod
+    def get(cls, resource: Any) -> "FilterGrammar":
+        resource_cls = (
+            resource if isinstance(resource, type) else type(resource)
+        )
+        grammar = cls.GRAMMARS.get(resource_cls)
+        if grammar is None:
+            grammar = cls.GRAMMARS[resource_cls] = cls(resource_cls)
+
+        return grammar
+
+    def related(
+        self, relation: str
+    ) -> Optional[Tuple[Union[ToOne, ToMany], "FilterGrammar"]]:
+        """Relation field and grammar of the related resource"""
+        relation_field = self.resource.fields.get(relation)
+        if not isinstance(relation_field, (ToOne, ToMany)):
+            return None
+
+        related_res = self.resource.RESOURCES[
+            relation_field.metadata["resource"]
+        ]
+        return relation_field, FilterGrammar.get(related_res)
+
+    def parse_item(self, param: str, value: Any) -> Optional[FilterItem]:
+        """
+        FilterItem of ``field[op]`` param, None if it isn't a filter.
+        Fields of related resources are referenced by relation
+        fields: ``books.store[eq]``, ``books.tags.name[eq]``.
+        """
+        field_op = self.params.get(param)
+
+        if field_op is None:
+            name, bracket, op_name = param.partition("[")
+            if not bracket:
+                return None
+
+            relation, dot, related_name = name.partition(".")
+            field_name = relation if dot else name
+            if (
+                value
+                and field_name in self.fields
+                and field_name not in self.filterable
+            ):
+                raise BadFilter(details=f"Field {field_name} isn't filterable")
+
+            related = self.related(relation) if dot else None
+            if related is not None:
+                item = related[1].parse_item(f"{related_name}[{op_name}", value)
+                if item is None:
+                    if value:
+                        raise BadFilter(filter=name)
+                    return None
+
+                return replace(item, field=f"{relation}.{item.field}")
+
+            if value and name in self.fields and op_name.endswith("]"):
+                op_name = op_name[:-1]
+                if op_name in TEXT_OPERATORS:
+                    raise BadFilter(
+                        details=f"Operator {op_name} isn't supported "
+                        f"by field {name}"
+                    )
+                # operator check
+                FilterItem.create(name, op_name, value)
+            return None
+
+        if not value:
+            return None
+
+        return FilterItem.create(*field_op, value)
+
+    def parse_include_filter(
+        self, name: str, op_name: str, value: Any
+    ) -> Tuple[str, FilterItem]:
+        """Relation path and FilterItem of ``filter[path.field][op]``"""
+        path, _, field_name = name.rpartition(".")
+        grammar: Optional[FilterGrammar] = self
+        for relation in path.split("."):
+            related = grammar.related(relation) if grammar else None
+            grammar = related[1] if related else None
+
+        item = (
+            grammar.parse_item(f"{field_name}[{op_name}]", value)
+            if grammar
+            else None
         )
+        if item is None:
+            raise BadFilter(filter=name)
 
-        for p, value in req_params.items():
-            re_result = re.match(filter_expr, p)
-            if not re_result:
+        return path, item
+
+    def parse(self, req_params: dict) -> List[Filter]:
+        """
+        Filters of ``field[op]=value`` params, combined with AND,
+        and of boolean groups, e.g.
+        ``filter[or][0][title][ilike]=x&filter[or][1][id][in]=1,2``
+        (``title ILIKE '%x%' OR id IN (1, 2)``),
+        ``filter[not][title][ilike]=x``. Params with the same index of
+        ``or`` / ``and`` group are combined with AND, groups can be nested:
+        ``filter[or][0][not][title][eq]=x``.
+
+        ``filter[books.title][ilike]=x`` filters included records
+        of the relation (see `IncludeFilter`).
+        """
+        result: List[Filter] = []
+        groups: Dict[Tuple[str, ...], FilterGroup] = {}
+        include_filters: Dict[str, IncludeFilter] = {}
+
+        for param, value in req_params.items():
+            if not param.startswith(f"{FILTER_GROUP_PARAM}["):
+                item = self.parse_item(param, value)
+                if item is not None:
+                    result.append(item)
                 continue
 
-            field_name = re_result.group("field_name")
-            op_name = re_result.group("op_name")
+            groups_expr = param[len(FILTER_GROUP_PARAM) :]
+            segments = FILTER_SEGMENT_RE.findall(groups_expr)
+            if "".join(f"[{s}]" for s in segments) != groups_expr:
+                raise BadFilter(details=f"Invalid filter {param}")
 
-            if not all([field_name, op_name, value]):
+            if len(segments) == 2 and "." in segments[0]:
+                include_path, item = self.parse_include_filter(
+                    segments[0], segments[1], value
+                )
+                include_filter = include_filters.get(include_path)
+                if include_filter is None:
+                    include_filter = IncludeFilter(include_path)
+                    include_filters[include_path] = include_filter
+                    result.append(include_filter)
+                include_filter.items.append(item)
                 continue
 
-            result.append(cls.create(field_name, op_name, value))
+            items = result
+            path: Tuple[str, ...] = ()
+            while len(segments) > 2:
+                group_op, *segments = segments
+                if group_op not in FILTER_GROUP_OPS:
+                    raise BadFilter(details=f"Invalid filter {param}")
+
+                path += (group_op,)
+                group = groups.get(path)
+                if group is None:
+                    group = groups[path] = FilterGroup(group_op)
+                    items.append(group)
+                items = group.items
+
+                if group_op != "not":
+                    # terms of or / and groups are and groups of their items
+                    index, *segments = segments
+                    if not index.isdigit():
+                        raise BadFilter(details=f"Invalid filter {param}")
+
+                    path += (index,)
+                    term = groups.get(path)
+                    if term is None:
+                        term = groups[path] = FilterGroup("and")
+                        items.append(term)
+                    items = term.items
+
+            if len(segments) != 2:
+                raise BadFilter(details=f"Invalid filter {param}")
+
+            item = self.parse_item("{}[{}]".format(*segments), value)
+            if item is None:
+                raise BadFilter(details=f"Invalid filter {param}")
+
+            items.append(item)
 
         return result
 
-    @classmethod
-    def id_in(cls, ids: List[int], field_name="id"):
-        op = OPERATORS_MAPPING[OP_IN]
-        return cls(field_name, op[0], op[1], ids)
+    def to_clause(
+        self, filters: List[Filter], params: Optional[Dict] = None
+    ) -> ClauseElement:
+        """
+        SQL condition of the filters, combined with AND.
+        With ``params`` the values are ``filter_<n>`` bind parameters
+        added to it, so conditions of the filters of the same `shape`
+        are the same statement
+        """
+        return sa.and_(
+            *[
+                self.filter_clause(f, params)
+                for f in filters
+                if not isinstance(f, IncludeFilter)
+            ]
+        )
+
+    def shape(self, filters: Optional[List[Filter]]) -> Tuple:
+        """
+        Fields and operators of the filters and which of them are
+        NULL checks, all that their condition built with bind
+        parameters depends on
+        """
+        return tuple(
+            (f.op, self.shape(f.items))
+            if isinstance(f, FilterGroup)
+            else (f.field, f.op, self.filter_value(f) is None)
+            for f in filters or []
+            if not isinstance(f, IncludeFilter)
+        )
+
+    def filter_value(self, f: FilterItem) -> Any:
+        """Deserialized value of the filter item"""
+        relation, dot, related_name = f.field.partition(".")
+        if dot:
+            related = self.related(relation)
+            if related is None:
+                raise BadFilter(filter=relation)
+
+            return related[1].filter_value(replace(f, field=related_name))
+
+        field_info = self.fields.get(f.field)
+        if field_info is None or field_info[0] is None:
+            raise BadFilter(filter=f.field)
+
+        _, deserialize, is_list_field = field_info
+
+        value = f.wrapper(f.value)
+        value = filter_value_to_python(value)
+
+        if value is not None:
+            if isinstance(value, list) and not is_list_field:
+                value = [deserialize(item) for item in value]
+            else:
+                value = deserialize(value)
+
+        return value
+
+    def filter_clause(
+        self, f: Filter, params: Optional[Dict] = None
+    ) -> ClauseElement:
+        if isinstance(f, FilterGroup):
+            clauses = [self.filter_clause(item, params) for item in f.items]
+            if f.op == "or":
+                return sa.or_(*clauses)
+            if f.op == "not":
+                return sa.not_(sa.and_(*clauses))
+            return sa.and_(*clauses)
+
+        if isinstance(f, IncludeFilter):
+            raise BadFilter(details=f"Invalid filter {f.path}")
+
+        relation, dot, related_name = f.field.partition(".")
+        if dot:
+            return self.relation_clause(
+                relation, replace(f, field=related_name), params
+            )
+
+        value = self.filter_value(f)
+        model_field = self.fields[f.field][0]
+
+        if params is not None and value is not None:
+            name = f"filter_{len(params)}"
+            params[name] = value
+            value = sa.bindparam(
+                name,
+                type_=None if f.op == "search" else model_field.type,
+                expanding=f.op == "in_",
+            )
+
+        if f.op == "search":
+            if f.field not in self.search_vectors:
+                raise BadFilter(filter=f.field)
+
+            vector, config = self.search_vectors[f.field]
+            return vector.op("@@", is_comparison=True)(
+                sa.func.plainto_tsquery(config, value)
+            )
+
+        if f.op == "similar":
+            # pg_trgm similarity operator, uses GIN / GiST trigram indexes.
+            # Rendered by the modulo operator, so it's escaped for drivers
+            # with percent placeholders
+            return sa.type_coerce(model_field % value, sa.Boolean)
+
+        return getattr(model_field, f.op)(value)
+
+    def referenced_fields(self, filters: Optional[List[Filter]]) -> List[str]:
+        """
+        Fields of the resource the filters reference: filtered fields,
+        relation fields and id field for filters of related fields
+        """
+        id_field = self.resource.Meta.id_field
+        names = []
+        for f in iter_filter_items(filters):
+            relation, dot, _ = f.field.partition(".")
+            if dot and isinstance(self.resource.fields.get(relation), ToMany):
+                names.append(id_field)
+            else:
+                names.append(relation)
+
+        return names
+
+    def relation_clause(
+        self, relation: str, f: FilterItem, params: Optional[Dict] = None
+    ) -> ClauseElement:
+        """
+        ``EXISTS`` subquery of the related records matching the filter,
+        correlated by the relation field like include loaders.
+        Related tables are aliased, so the subquery doesn't correlate
+        to the same tables of the outer query.
+        """
+        related = self.related(relation)
+        if related is None:
+            raise BadFilter(filter=relation)
+
+        relation_field, grammar = related
+        condition = grammar.filter_clause(f, params)
+
+        related_meta = grammar.resource.Meta
+        related_table = related_meta.model.__table__
+        related_from = getattr(related_meta, "select_from", None)
+
+        # joins of the related resource are needed by filtered fields only
+        condition_tables = set()
+        for name in grammar.referenced_fields([f]):
+            column = grammar.fields[name][0]
+            if column is not None:
+                condition_tables.update(
+                    find_tables(column.label(None), check_columns=True)
+                )
+
+        if related_from is None or condition_tables <= {related_table}:
+            related_from = related_table
+
+        related_alias = related_from.alias()
+        adapter = ClauseAdapter(related_alias)
+        subquery = sa.exists().select_from(related_alias)
+
+        model_field = relation_field.metadata.get("model_field")
+        if model_field is None:
+            raise BadFilter(filter=relation)
+
+        if isinstance(relation_field, ToOne):
+            model_column = getattr(
+                model_field.parent.persist_selectable.c, model_field.key
+            )
+            related_column = grammar.fields[related_meta.id_field][0]
+            for fk in model_column.foreign_keys:
+                if fk.column.table is related_table:
+                    related_column = fk.column
+
+            correlation = adapter.traverse(related_column) == model_field
+        else:
+            m2m = self.resource._process_to_many_field(relation_field)
+            if m2m.left_fk_field is None or (
+                m2m.secondary is not None and m2m.right_fk_field is None
+            ):
+                raise BadFilter(filter=relation)
+
+            model_id = self.fields[self.resource.Meta.id_field][0]
+            if m2m.secondary is None:
+                correlation = adapter.traverse(m2m.left_fk_field) == model_id
+            else:
+                secondary = m2m.secondary.alias()
+                secondary_adapter = ClauseAdapter(secondary)
+                related_column = next(
+                    fk.column
+                    for fk in m2m.right_fk_field.foreign_keys  # type: ignore
+                    if fk.column.table is related_table
+                )
+                subquery = sa.exists().select_from(
+                    related_alias.join(
+                        secondary,
+                        secondary_adapter.traverse(m2m.right_fk_field)
+                        == adapter.traverse(related_column),
+                    )
+                )
+                correlation = (
+                    secondary_adapter.traverse(m2m.left_fk_field) == model_id
+                )
+
+        return subquery.where(sa.and_(correlation, adapter.traverse(condition)))
 
 
 def filter_value_to_python(value):
@@ -0,0 +1,395 @@
+"""
+Index advisor: compares indexes read requests of resources need
+(filtered and sorted fields, joins of ``select_from``, relations)
+with indexes of the database and suggests ``CREATE INDEX`` statements.
+
+    python -m awokado.index_advisor myapp.resources [--url postgresql://...]
+
+Resources are found among subclasses of ``BaseResource`` defined in the
+imported modules. Fields are limited by ``filterable`` / ``sortable``
+of ``ResourceMeta``, when they are declared.
+"""
+import argparse
+import importlib
+import re
+import sys
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple, Type
+
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.sql import Join, visitors
+from sqlalchemy.sql.util import find_tables
+
+from awokado.consts import OP_SEARCH, OP_SIMILAR, OP_STARTSWITH
+from awokado.custom_fields import ToMany
+from awokado.db import DATABASE_URL
+from awokado.filter_parser import FilterGrammar
+from awokado.meta import ResourceMeta
+from awokado.pagination import is_nullable
+from awokado.resource import BaseResource
+from awokado.utils import get_column
+
+INDEXES_QUERY = sa.text(
+    "SELECT schemaname, tablename, indexname, indexdef FROM pg_indexes "
+    "WHERE schemaname NOT IN ('pg_catalog', 'information_schema')"
+)
+
+CAST_RE = re.compile(r"::[\w ]+(\[\])?")
+# parentheses PostgreSQL adds around cast columns, (title)::text
+PARENTHESES_RE = re.compile(r"(?<![\w)])\((\w+)\)")
+ASC_RE = re.compile(r" asc\b")
+ORDER_RE = re.compile(r" (asc|desc|nulls first|nulls last)\b")
+DIALECT = postgresql.dialect()
+
+STATUS_MISSING = "missing"
+STATUS_MISMATCHED = "mismatched"
+
+
+def normalize_key(key: str) -> str:
+    """Index key without casts, quotes and default ordering"""
+    key = CAST_RE.sub("", key).replace('"', "").lower()
+    key = PARENTHESES_RE.sub(r"\1", " ".join(key.split()))
+    key = ASC_RE.sub("", key)
+    if key.endswith(" desc nulls first"):
+        key = key[: -len(" nulls first")]
+    return key.replace(" nulls last", "") if " desc" not in key else key
+
+
+def strip_order(key: str) -> str:
+    return ORDER_RE.sub("", key)
+
+
+@dataclass
+class DatabaseIndex:
+    name: str
+    method: str
+    keys: List[str]
+    partial: bool = False
+
+
+def parse_index_def(name: str, indexdef: str) -> Optional[DatabaseIndex]:
+    """DatabaseIndex of ``pg_indexes.indexdef``, None if it can't be parsed"""
+    match = re.search(r" USING (\w+) \(", indexdef)
+    if match is None:
+        return None
+
+    keys, depth, start = [], 0, match.end()
+    for position in range(start, len(indexdef)):
+        char = indexdef[position]
+        if char == "(":
+            depth += 1
+        elif char == ")" and depth:
+            depth -= 1
+        elif char in ",)" and not depth:
+            keys.append(normalize_key(indexdef[start:position].strip()))
+            start = position + 1
+            if char == ")":
+                break
+
+    return DatabaseIndex(
+        name,
+        match.group(1).lower(),
+        keys,
+        partial=" WHERE " in indexdef[start:],
+    )
+
+
+def get_database_indexes(
+    connection: Any,
+) -> Dict[Tuple[str, str], List[DatabaseIndex]]:
+    """Indexes of the database by schema and table name"""
+    indexes: Dict[Tuple[str, str], List[DatabaseIndex]] = {}
+    for schema, table, name, indexdef in connection.execute(INDEXES_QUERY):
+        index = parse_index_def(name, indexdef)
+        if index is not None:
+            indexes.setdefault((schema, table), []).append(index)
+
+    return indexes
+
+
+@dataclass
+class IndexSpec:
+    """
+    Index a read query needs: ``method`` index of ``table`` with
+    ``key`` as the first key. Existing indexes with one of ``accepts``
+    first keys (ordering ignored, if ``ordered`` is false) serve it.
+    """
+
+    table: sa.Table
+    key: str
+    method: str = "btree"
+    accepts: Tuple[str, ...] = ()
+    ordered: bool = False
+    column: Optional[str] = None
+    reasons: List[str] = field(default_factory=list)
+
+    @property
+    def ddl(self) -> str:
+        table = DIALECT.identifier_preparer.format_table(self.table)
+        using = f" USING {self.method}" if self.method != "btree" else ""
+        return f"CREATE INDEX CONCURRENTLY ON {table}{using} ({self.key});"
+
+    def is_served_by(self, index: DatabaseIndex) -> bool:
+        if index.partial or index.method != self.method or not index.keys:
+            return False
+
+        first_key = index.keys[0]
+        if not self.ordered:
+            first_key = strip_order(first_key)
+
+        return first_key in (self.accepts or (normalize_key(self.key),))
+
+
+@dataclass
+class Advice:
+    spec: IndexSpec
+    status: str
+    index: Optional[str] = None
+
+    def __str__(self) -> str:
+        table = self.spec.table.fullname
+        if self.status == STATUS_MISMATCHED:
+            problem = (
+                f"index {self.index} doesn't serve "
+                f"{self.spec.method} ({self.spec.key})"
+            )
+        else:
+            problem = f"missing {self.spec.method} index ({self.spec.key})"
+
+        return (
+            f"{table}: {problem}, used by {', '.join(self.spec.reasons)}\n"
+            f"    {self.spec.ddl}"
+        )
+
+
+def render(expression: Any) -> str:
+    """SQL of an index key expression, without table names"""
+    return str(
+        expression.compile(
+            dialect=DIALECT,
+            compile_kwargs={"literal_binds": True, "include_table": False},
+        )
+    )
+
+
+def get_table(expression: Any) -> Optional[sa.Table]:
+    tables = find_tables(expression, check_columns=True)
+    if len(tables) != 1 or not isinstance(tables[0], sa.Table):
+        return None
+
+    table: sa.Table = tables[0]
+    return table
+
+
+def column_spec(
+    column: sa.Column, ordered: bool = False, select_from: Any = None
+) -> IndexSpec:
+    """Btree index of the column, NULLS FIRST one for nullable sorting"""
+    name = render(column)
+    if ordered and is_nullable(column, select_from):
+        return IndexSpec(
+            column.table,
+            f"{name} NULLS FIRST",
+            accepts=(f"{name} nulls first", f"{name} desc nulls last"),
+            ordered=True,
+            column=name,
+        )
+
+    return IndexSpec(column.table, name, column=name)
+
+
+def text_specs(resource_field: Any, column: Any) -> Iterator[IndexSpec]:
+    text_ops = resource_field.metadata.get("text_ops", ())
+    table = get_table(column)
+    if table is None:
+        return
+
+    name = render(column)
+    if OP_STARTSWITH in text_ops:
+        opclass = (
+            "varchar_pattern_ops"
+            if isinstance(column.type, sa.String)
+            and not isinstance(column.type, sa.Text)
+            and column.type.length
+            else "text_pattern_ops"
+        )
+        yield IndexSpec(
+            table,
+            f"{name} {opclass}",
+            accepts=(f"{name} text_pattern_ops", f"{name} varchar_pattern_ops"),
+        )
+
+    if OP_SIMILAR in text_ops:
+        yield IndexSpec(table, f"{name} gin_trgm_ops", method="gin")
+
+    if OP_SEARCH in text_ops:
+        grammar = FilterGrammar.get(type(resource_field.parent))
+        vector, _ = grammar.search_vectors[resource_field.name]
+        vector_table = get_table(vector)
+        if vector_table is not None:
+            yield IndexSpec(vector_table, render(vector), method="gin")
+
+
+def join_columns(joins: Any) -> Iterator[sa.Column]:
+    """Columns of the join conditions of ``select_from``"""
+    while isinstance(joins, Join):
+        for element in visitors.iterate(joins.onclause, {}):
+            if isinstance(element, sa.Column) and isinstance(
+                element.table, sa.Table
+            ):
+                yield element
+        yield from join_columns(joins.right)
+        joins = joins.left
+
+
+def required_indexes(resource: BaseResource) -> List[IndexSpec]:
+    """Indexes read requests of the resource need"""
+    meta = resource.Meta
+    specs: List[Tuple[IndexSpec, str]] = []
+
+    filterable = FilterGrammar.get(type(resource)).filterable
+    sortable = resource.fields if meta.sortable is None else meta.sortable
+
+    for name, resource_field in resource.fields.items():
+        model_field = resource_field.metadata.get("model_field")
+        column = get_column(model_field)
+        usage = f"{meta.name}.{name}"
+
+        if column is not None and isinstance(column.table, sa.Table):
+            if name in filterable:
+                specs.append((column_spec(column), f"filter {usage}"))
+            if name in sortable:
+                specs.append(
+                    (
+                        column_spec(
+                            column,
+                            ordered=True,
+                            select_from=getattr(meta, "select_from", None),
+                        ),
+                        f"sort {usage}",
+                    )
+                )
+
+        if name in filterable and model_field is not None:
+            for spec in text_specs(resource_field, model_field):
+                specs.append((spec, f"text filter {usage}"))
+
+        if isinstance(resource_field, ToMany) and column is not None:
+            m2m = resource._process_to_many_field(resource_field)
+            for fk in (m2m.left_fk_field, m2m.right_fk_field):
+                if fk is not None:
+                    specs.append((column_spec(fk), f"relation {usage}"))
+
+    for column in join_columns(getattr(meta, "select_from", None)):
+        specs.append((column_spec(column), f"select_from of {meta.name}"))
+
+    return merge_specs(specs)
+
+
+def merge_specs(specs: Sequence[Tuple[IndexSpec, str]]) -> List[IndexSpec]:
+    merged: Dict[Tuple[str, str, str], IndexSpec] = {}
+    for spec, reason in specs:
+        spec = merged.setdefault(
+            (spec.table.fullname, spec.method, spec.key), spec
+        )
+        if reason not in spec.reasons:
+            spec.reasons.append(reason)
+
+    return list(merged.values())
+
+
+def advise_spec(
+    spec: IndexSpec, indexes: List[DatabaseIndex]
+) -> Optional[Advice]:
+    if any(spec.is_served_by(index) for index in indexes):
+        return None
+
+    for index in indexes:
+        if (
+            spec.column is not None
+            and index.keys
+            and strip_order(index.keys[0]) == normalize_key(spec.column)
+        ):
+            return Advice(spec, STATUS_MISMATCHED, index.name)
+
+    return Advice(spec, STATUS_MISSING)
+
+
+def advise(
+    resources: Sequence[BaseResource],
+    indexes: Dict[Tuple[str, str], List[DatabaseIndex]],
+    default_schema: str = "public",
+) -> List[Advice]:
+    """Advices on indexes of the resources missing in ``indexes``"""
+    specs = merge_specs(
+        [
+            (spec, reason)
+            for resource in resources
+            for spec in required_indexes(resource)
+            for reason in spec.reasons
+        ]
+    )
+
+    advices = []
+    for spec in specs:
+        schema = spec.table.schema or default_schema
+        advice = advise_spec(spec, indexes.get((schema, spec.table.name), []))
+        if advice is not None:
+            advices.append(advice)
+
+    return advices
+
+
+def get_resources(
+    base: Type[BaseResource] = BaseResource,
+) -> List[BaseResource]:
+    """Instances of the defined resources with models"""
+    resources = []
+    subclasses: List[Type[BaseResource]] = base.__subclasses__()
+    for resource_cls in subclasses:
+        meta: ResourceMeta = resource_cls.Meta  # type: ignore
+        if (
+            meta.name not in ("base_resource", "_resource")
+            and meta.model is not None
+        ):
+            resources.append(resource_cls())
+        resources.extend(get_resources(resource_cls))
+
+    return resources
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="python -m awokado.index_advisor",
+        description="Suggests indexes for filtered and sorted resource fields",
+    )
+    parser.add_argument(
+        "modules", nargs="+", help="modules defining the resources"
+    )
+    parser.add_argument(
+        "--url",
+        default=None,
+        help="database URL, DATABASE_* settings by default",
+    )
+    args = parser.parse_args(argv)
+
+    for module in args.modules:
+        importlib.import_module(module)
+
+    engine = sa.create_engine(args.url or DATABASE_URL)
+    with engine.connect() as connection:
+        default_schema = connection.execute(
+            sa.text("SELECT current_schema()")
+        ).scalar()
+        indexes = get_database_indexes(connection)
+
+    advices = advise(get_resources(), indexes, default_schema)
+    for advice in advices:
+        print(advice)
+
+    return 1 if advices else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
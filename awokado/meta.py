@@ -4,6 +4,7 @@ from typing import Union, Tuple, Any, Type, Optional
 from sqlalchemy.sql import Join
 
 from awokado.auth import BaseAuth
+from awokado.total import BaseTotal, WindowTotal
 
 
 @dataclass
@@ -15,8 +16,18 @@ class ResourceMeta:
     :param auth: awokado `BaseAuth <#awokado.auth.BaseAuth>`_  class for embedding authentication logic
     :param skip_doc:  set true if you don't need to add the resource to documentation
     :param disable_total: set false, if you don't need to know returning objects amount in read-requests
+    :param total: awokado `BaseTotal <#awokado.total.BaseTotal>`_ class, strategy of counting objects in list read-requests (WindowTotal, ExactTotal, EstimatedTotal, CappedTotal, HasMoreTotal)
     :param id_field: you can specify your own primary key if it's different from the 'id' field. Used in reading requests (GET)
     :param select_from: provide data source here if your resource use another's model fields (for example sa.outerjoin(FirstModel, SecondModel, FirstModel.id == SecondModel.first_model_id))
+    :param two_phase_read: set true to paginate list requests of a resource with select_from in two steps: select the page of ids from the model, then join and aggregate only rows of that page. Applied when filters and sorting use the model's columns only and select_from is a chain of outer joins
+    :param concurrent_includes: set true to load included relations of the same level (e.g. include=author,store,tags) concurrently, each on its own connection (of a separate pool of loaders) in the snapshot of the request transaction. Number of loader threads is set by AWOKADO_INCLUDE_WORKERS setting
+    :param conditional_get: set true to send ETag (and Last-Modified of single objects) headers in read responses and respond with 304 Not Modified to requests with matching If-None-Match / If-Modified-Since headers
+    :param last_modified_column: column (or expression) of the modification time of the resource rows, e.g. Model.record_modified. With it conditional requests without includes and joined tables of select_from are validated by max of the column and count of the filtered rows, without reading and serializing the response. Otherwise the ETag is a hash of the response body
+    :param filterable: names of the fields allowed in filters, all fields by default. Filters of other fields are rejected with 400 Bad Request
+    :param sortable: names of the fields allowed in sorting, all fields by default. Sorting by other fields is rejected with 400 Bad Request
+    :param max_queries: in AWOKADO_DEBUG mode, max number of SQL statements of a request of the resource (see `query budget <#awokado.query_stats.QueryBudget>`_)
+    :param max_rows: in AWOKADO_DEBUG mode, max number of rows returned by SQL statements of a request of the resource
+    :param cache_ttl: set to cache read responses for cache_ttl seconds (see `read cache <#awokado.cache.ReadCache>`_). Cached responses are invalidated by create, update and delete requests of resources writing to the tables they are read from
     """
 
     name: str = "base_resource"
@@ -25,8 +36,18 @@ class ResourceMeta:
     auth: Optional[Type[BaseAuth]] = None
     skip_doc: bool = False
     disable_total: bool = False
+    total: Type[BaseTotal] = WindowTotal
     id_field: str = "id"
     select_from: Optional[Join] = None
+    two_phase_read: bool = False
+    concurrent_includes: bool = False
+    conditional_get: bool = False
+    last_modified_column: Any = None
+    cache_ttl: Optional[float] = None
+    filterable: Optional[Tuple[str, ...]] = None
+    sortable: Optional[Tuple[str, ...]] = None
+    max_queries: Optional[int] = None
+    max_rows: Optional[int] = None
 
     def __post_init__(self):
         if not self.methods and self.name not in ("base_resource", "_resource"):
@@ -0,0 +1,396 @@
+import threading
+from bisect import bisect_left
+from time import perf_counter
+from typing import Dict, Iterator, List, Mapping, Optional, Sequence, Tuple
+
+import falcon
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import QueuePool
+
+from awokado.query_stats import QueryStats
+
+LATENCY_BUCKETS = (
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+POOL_WAIT_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 30.0)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+Labels = Tuple[str, ...]
+ConstLabels = Tuple[Tuple[str, str], ...]
+
+
+class ThreadShardedMetric:
+    """
+    Metric values by label values, each thread updates its own shard
+    without locks, shards are summed up on collect. Shards of finished
+    threads are kept, so counters never decrease.
+    """
+
+    TYPE = ""
+
+    def __init__(self, name: str, help: str, label_names: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.label_names = tuple(label_names)
+        self.local = threading.local()
+        self.shards: List[Dict[Labels, List[float]]] = []
+        self.lock = threading.Lock()
+
+    def shard(self) -> Dict[Labels, List[float]]:
+        shard = getattr(self.local, "shard", None)
+        if shard is None:
+            shard = self.local.shard = {}
+            with self.lock:
+                self.shards.append(shard)
+
+        return shard
+
+    def collect(self) -> Dict[Labels, List[float]]:
+        with self.lock:
+            shards = list(self.shards)
+
+        merged: Dict[Labels, List[float]] = {}
+        for shard in shards:
+            # dict copy is atomic, the owner thread may be updating it
+            for labels, values in shard.copy().items():
+                total = merged.get(labels)
+                if total is None:
+                    merged[labels] = list(values)
+                else:
+                    for i, value in enumerate(values):
+                        total[i] += value
+
+        return merged
+
+    def header(self) -> Iterator[str]:
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} {self.TYPE}"
+
+    def render(
+        self, const_labels: ConstLabels = (), header: bool = True
+    ) -> Iterator[str]:
+        """
+        Lines of the metric, ``const_labels`` are added to labels
+        of all the values, e.g. to render metrics of several pools
+        as one, with header once
+        """
+        raise NotImplementedError()
+
+    def format_labels(
+        self, labels: Labels, const_labels: ConstLabels = (), extra: str = ""
+    ) -> str:
+        pairs = [
+            f'{name}="{escape(value)}"'
+            for name, value in const_labels
+            + tuple(zip(self.label_names, labels))
+        ]
+        if extra:
+            pairs.append(extra)
+
+        return "{%s}" % ",".join(pairs) if pairs else ""
+
+
+class Counter(ThreadShardedMetric):
+    TYPE = "counter"
+
+    def inc(self, labels: Labels = (), value: float = 1) -> None:
+        shard = self.shard()
+        values = shard.get(labels)
+        if values is None:
+            shard[labels] = [value]
+        else:
+            values[0] += value
+
+    def render(
+        self, const_labels: ConstLabels = (), header: bool = True
+    ) -> Iterator[str]:
+        if header:
+            yield from self.header()
+
+        for labels, (value,) in sorted(self.collect().items()):
+            label_str = self.format_labels(labels, const_labels)
+            yield f"{self.name}{label_str} {format_value(value)}"
+
+
+class Histogram(ThreadShardedMetric):
+    """
+    Histogram with ``buckets`` upper bounds, shards keep counts of values
+    per bucket (not cumulative) and the sum of values
+    """
+
+    TYPE = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        label_names: Sequence[str] = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS,
+    ):
+        super().__init__(name, help, label_names)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, labels: Labels = ()) -> None:
+        shard = self.shard()
+        values = shard.get(labels)
+        if values is None:
+            # bucket counts, +Inf bucket count, sum
+            values = shard[labels] = [0] * (len(self.buckets) + 2)
+
+        values[bisect_left(self.buckets, value)] += 1
+        values[-1] += value
+
+    def render(
+        self, const_labels: ConstLabels = (), header: bool = True
+    ) -> Iterator[str]:
+        if header:
+            yield from self.header()
+
+        bounds = [str(bound) for bound in self.buckets] + ["+Inf"]
+        for labels, values in sorted(self.collect().items()):
+            count = 0.0
+            for bound, bucket_count in zip(bounds, values):
+                count += bucket_count
+                label_str = self.format_labels(
+                    labels, const_labels, f'le="{bound}"'
+                )
+                yield f"{self.name}_bucket{label_str} {format_value(count)}"
+
+            label_str = self.format_labels(labels, const_labels)
+            yield f"{self.name}_sum{label_str} {format_value(values[-1])}"
+            yield f"{self.name}_count{label_str} {format_value(count)}"
+
+
+def escape(value: str) -> str:
+    return (
+        str(value)
+        .replace("\\", "\\\\")
+        .replace('"', '\\"')
+        .replace("\n", "\\n")
+    )
+
+
+def format_value(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(value)
+
+
+class MeteredQueuePool(QueuePool):
+    """
+    ``QueuePool`` measuring time of getting a connection:
+    waiting for a free one or opening a new one
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.wait_time = Histogram(
+            "awokado_db_pool_wait_seconds",
+            "Time of waiting for a pool connection",
+            buckets=POOL_WAIT_BUCKETS,
+        )
+
+    def _do_get(self):
+        started = perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            self.wait_time.observe(perf_counter() - started)
+
+
+class Metrics:
+    """
+    Request and connection pool metrics in Prometheus text format.
+    Requests are recorded by `MetricsMiddleware`,
+    exported by `MetricsResource`.
+    """
+
+    def __init__(self):
+        labels = ("resource", "method", "status")
+        self.requests = Counter(
+            "awokado_requests_total", "Requests count", labels
+        )
+        self.latency = Histogram(
+            "awokado_request_duration_seconds",
+            "Request duration",
+            labels,
+            LATENCY_BUCKETS,
+        )
+        self.response_size = Histogram(
+            "awokado_response_size_bytes",
+            "Response body size",
+            labels,
+            SIZE_BUCKETS,
+        )
+        self.queries = Counter(
+            "awokado_db_queries_total",
+            "SQL statements executed by requests",
+            ("resource", "method"),
+        )
+        self.rows = Counter(
+            "awokado_db_rows_total",
+            "Rows returned (or changed) by SQL statements of requests",
+            ("resource", "method"),
+        )
+
+    def observe_request(
+        self,
+        resource: str,
+        method: str,
+        status: str,
+        duration: float,
+        size: Optional[int] = None,
+        query_stats: Optional[QueryStats] = None,
+    ) -> None:
+        labels = (resource, method, status)
+        self.requests.inc(labels)
+        self.latency.observe(duration, labels)
+        if size is not None:
+            self.response_size.observe(size, labels)
+
+        if query_stats is not None:
+            self.queries.inc((resource, method), query_stats.count)
+            self.rows.inc((resource, method), query_stats.rows)
+
+    def render(self, engines: Mapping[str, Engine]) -> str:
+        lines: List[str] = []
+        for metric in (
+            self.requests,
+            self.latency,
+            self.response_size,
+            self.queries,
+            self.rows,
+        ):
+            lines.extend(metric.render())
+
+        lines.extend(render_pools(engines))
+        return "\n".join(lines) + "\n"
+
+
+def render_pools(engines: Mapping[str, Engine]) -> Iterator[str]:
+    """Stats of ``QueuePool`` pools of the engines, labeled by name"""
+    pools = [
+        (name, engine.pool)
+        for name, engine in engines.items()
+        if isinstance(engine.pool, QueuePool)
+    ]
+    if not pools:
+        return
+
+    gauges = (
+        ("size", "Pool size", QueuePool.size),
+        ("checked_out", "Connections in use", QueuePool.checkedout),
+        ("checked_in", "Idle connections", QueuePool.checkedin),
+        ("overflow", "Connections over the pool size", QueuePool.overflow),
+    )
+    for suffix, help, getter in gauges:
+        name = f"awokado_db_pool_{suffix}"
+        yield f"# HELP {name} {help}"
+        yield f"# TYPE {name} gauge"
+        for pool_name, pool in pools:
+            yield f'{name}{{pool="{escape(pool_name)}"}} {getter(pool)}'
+
+    metered = [
+        (pool_name, pool.wait_time)
+        for pool_name, pool in pools
+        if isinstance(pool, MeteredQueuePool)
+    ]
+    for i, (pool_name, wait_time) in enumerate(metered):
+        yield from wait_time.render((("pool", pool_name),), header=i == 0)
+
+
+metrics = Metrics()
+
+
+class MetricsMiddleware:
+    """
+    Records count, duration, response size and SQL stats
+    (with `HttpMiddleware` query stats on) of requests to `metrics`
+    """
+
+    def __init__(self, registry: Metrics = metrics):
+        self.registry = registry
+
+    def process_request(self, req: falcon.Request, resp: falcon.Response):
+        req.context.metrics_started = perf_counter()
+
+    def process_response(
+        self,
+        req: falcon.Request,
+        resp: falcon.Response,
+        resource,
+        req_succeeded,
+    ):
+        started = getattr(req.context, "metrics_started", None)
+        if started is None:
+            return
+
+        meta = getattr(resource, "Meta", None)
+        if meta is not None and getattr(meta, "name", None):
+            resource_name = meta.name
+        elif resource is not None:
+            resource_name = type(resource).__name__
+        else:
+            resource_name = ""
+
+        size: Optional[int] = None
+        if resp.data is not None:
+            size = len(resp.data)
+        elif resp.body is not None:
+            size = len(resp.body.encode())
+
+        self.registry.observe_request(
+            resource_name,
+            req.method,
+            resp.status.split(" ", 1)[0],
+            perf_counter() - started,
+            size,
+            getattr(req.context, "query_stats", None),
+        )
+
+
+class MetricsResource:
+    """
+    Resource for '/metrics' in Prometheus text format
+
+    :param engines: engines with pools to export stats of by name,
+        ``persistent_engine`` ("primary") and replica ones by default
+    :param registry: metrics to export
+    """
+
+    def __init__(
+        self,
+        engines: Optional[Mapping[str, Engine]] = None,
+        registry: Metrics = metrics,
+    ):
+        self.engines = engines
+        self.registry = registry
+
+    def get_engines(self) -> Mapping[str, Engine]:
+        if self.engines is not None:
+            return self.engines
+
+        from awokado.db import persistent_engine, replica_router
+
+        engines = {"primary": persistent_engine}
+        for i, (_, engine) in enumerate(replica_router.replicas):
+            engines[f"replica{i}"] = engine
+
+        return engines
+
+    def on_get(
+        self, req: falcon.Request, resp: falcon.Response, resource_id=None
+    ):
+        resp.body = self.registry.render(self.get_engines())
+        resp.content_type = CONTENT_TYPE
+        resp.status = falcon.HTTP_200
@@ -4,15 +4,48 @@ import marshal
 import pstats
 import random
 import string
+from typing import Callable, Optional
 
 import boto3
+import falcon
 from dynaconf import settings
 
 from awokado.consts import DEFAULT_ACCESS_CONTROL_HEADERS
+from awokado.explain import (
+    EXPLAIN_ANALYZE_OPTIONS,
+    EXPLAIN_OPTIONS,
+    start_capture,
+    stop_capture,
+)
+from awokado.query_stats import (
+    get_query_stats,
+    QueryBudget,
+    QueryStats,
+    start_query_stats,
+    stop_query_stats,
+)
 from awokado.utils import rand_string
 
 
 class HttpMiddleware:
+    """
+    Sets CORS headers, collects SQL stats of requests
+    (``AWOKADO_QUERY_STATS`` setting, on by default): they are
+    ``req.context.query_stats``, ``Server-Timing`` response header
+    and are passed to ``query_stats_hook(req, stats)``, e.g. a logger.
+    In ``AWOKADO_DEBUG`` mode checks the query budget of requests
+    (see `QueryBudget`), profiles (``?profiling=1``) and
+    explains (``?explain=1``) them.
+    """
+
+    def __init__(
+        self,
+        query_stats_hook: Optional[
+            Callable[[falcon.Request, QueryStats], None]
+        ] = None,
+    ):
+        self.query_stats_hook = query_stats_hook
+
     def process_request(self, req, resp):
         """Process the request before routing it.
 
@@ -63,6 +96,13 @@ class HttpMiddleware:
                 resource's responder method as keyword
                 arguments.
         """
+        if settings.get("AWOKADO_QUERY_STATS", True):
+            req.context.query_stats_token = start_query_stats()
+            stats = req.context.query_stats = get_query_stats()
+
+            if settings.get("AWOKADO_DEBUG"):
+                stats.budget = QueryBudget.from_resource(resource)
+
         if not settings.get("AWOKADO_DEBUG"):
             return
 
@@ -72,6 +112,12 @@ class HttpMiddleware:
             profile.enable()
             req.profile = profile
 
+        explain = req.get_param("explain")
+        if explain and explain.lower() == "analyze":
+            req.context.explain_token = start_capture(EXPLAIN_ANALYZE_OPTIONS)
+        elif explain and req.get_param_as_bool("explain"):
+            req.context.explain_token = start_capture(EXPLAIN_OPTIONS)
+
         debugger_enabled = req.get_param_as_bool("debug")
         if debugger_enabled:
             from pudb.remote import set_trace
@@ -91,6 +137,15 @@ class HttpMiddleware:
                 while the awokado processed and routed the
                 request; otherwise False.
         """
+        stats_token = getattr(req.context, "query_stats_token", None)
+        if stats_token is not None:
+            stop_query_stats(stats_token)
+
+            stats = req.context.query_stats
+            resp.set_header("Server-Timing", stats.server_timing())
+            if self.query_stats_hook is not None:
+                self.query_stats_hook(req, stats)
+
         if not settings.get("AWOKADO_DEBUG"):
             return
 
@@ -99,6 +154,10 @@ class HttpMiddleware:
             req.profile.disable()
             save_debug_proiling(req.profile)
 
+        explain_token = getattr(req.context, "explain_token", None)
+        if explain_token is not None:
+            stop_capture(explain_token)
+
 
 def save_debug_proiling(profile):
     if settings.AWOKADO_ENABLE_UPLOAD_DEBUG_PROFILING_TO_S3:
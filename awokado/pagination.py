@@ -0,0 +1,224 @@
+import base64
+import hashlib
+import hmac
+import json
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+import sqlalchemy as sa
+from dynaconf import settings
+from sqlalchemy.sql import ClauseElement, visitors
+from sqlalchemy.sql.functions import FunctionElement
+from sqlalchemy.sql.selectable import Join
+
+from awokado.exceptions import BadCursor
+
+# (resource field name, sql expression, descending)
+SortKey = Tuple[str, Any, bool]
+
+AGGREGATE_FUNCTIONS = frozenset(
+    (
+        "array_agg",
+        "avg",
+        "bool_and",
+        "bool_or",
+        "count",
+        "json_agg",
+        "jsonb_agg",
+        "max",
+        "min",
+        "string_agg",
+        "sum",
+    )
+)
+
+
+def _b64encode(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode()
+
+
+def _b64decode(data: str) -> bytes:
+    return base64.urlsafe_b64decode(data + "=" * (-len(data) % 4))
+
+
+def _sign(data: bytes) -> bytes:
+    secret = str(settings.get("AWOKADO_CURSOR_SECRET", "")).encode()
+    return hmac.new(secret, data, hashlib.sha256).digest()
+
+
+def encode_cursor(sort: List[str], values: List[Any]) -> str:
+    """
+    Pack the sort keys of a row into an opaque signed token.
+
+    ``sort`` is the sorting specification the page was read with
+    (e.g. ``["-title", "id"]``), so a cursor can't be reused
+    with another ordering.
+    """
+    data = json.dumps(
+        {"s": sort, "v": values}, default=str, separators=(",", ":")
+    ).encode()
+    return f"{_b64encode(data)}.{_b64encode(_sign(data))}"
+
+
+def decode_cursor(cursor: str, sort: List[str]) -> List[Any]:
+    try:
+        data, signature = cursor.split(".")
+        data_bytes = _b64decode(data)
+        valid = hmac.compare_digest(_b64decode(signature), _sign(data_bytes))
+    except (ValueError, TypeError):
+        raise BadCursor()
+
+    if not valid:
+        raise BadCursor()
+
+    try:
+        payload = json.loads(data_bytes)
+    except ValueError:
+        raise BadCursor()
+
+    if payload.get("s") != sort or len(payload.get("v", ())) != len(sort):
+        raise BadCursor(
+            details="Cursor doesn't match the sorting of the request"
+        )
+
+    values: List[Any] = payload["v"]
+    return values
+
+
+def is_aggregate(expression: ClauseElement) -> bool:
+    for element in visitors.iterate(expression, {}):
+        if (
+            isinstance(element, FunctionElement)
+            and getattr(element, "name", "").lower() in AGGREGATE_FUNCTIONS
+        ):
+            return True
+
+    return False
+
+
+def outer_joined_tables(joins: Any) -> Set[Any]:
+    """
+    Tables of ``joins`` on the optional side of OUTER joins,
+    their columns are NULL for not matched rows however they are declared
+    """
+    if not isinstance(joins, Join):
+        return set()
+
+    tables = outer_joined_tables(joins.left) | outer_joined_tables(joins.right)
+    if joins.isouter:
+        tables |= _join_tables(joins.right)
+    if joins.full:
+        tables |= _join_tables(joins.left)
+
+    return tables
+
+
+def _join_tables(joins: Any) -> Set[Any]:
+    if isinstance(joins, Join):
+        return _join_tables(joins.left) | _join_tables(joins.right)
+
+    return {joins}
+
+
+def is_nullable(expression: ClauseElement, select_from: Any = None) -> bool:
+    """
+    Checks if ``expression`` may be NULL in rows selected from
+    ``select_from`` (resource model table by default): only not nullable
+    columns of tables which aren't outer joined are never NULL
+    """
+    column = expression
+    if hasattr(column, "property"):
+        column = column.property.columns[0]
+
+    if isinstance(column, sa.Column):
+        if column.table in outer_joined_tables(select_from):
+            return True
+
+        return bool(column.nullable) and not column.primary_key
+
+    return True
+
+
+def _equals(expression, value):
+    if value is None:
+        return expression.is_(None)
+    return expression == value
+
+
+def _follows(expression, descending: bool, value, select_from=None):
+    """
+    Rows placed after ``value`` in awokado ordering:
+    ascending NULLS FIRST or descending NULLS LAST.
+    """
+    if descending:
+        if value is None:
+            return sa.false()
+        if not is_nullable(expression, select_from):
+            return expression < value
+        return sa.or_(expression < value, expression.is_(None))
+
+    if value is None:
+        return expression.isnot(None)
+    return expression > value
+
+
+def keyset_predicate(
+    keys: List[SortKey],
+    values: List[Any],
+    select_from: Any = None,
+    params: Optional[Dict] = None,
+):
+    """
+    Build ``WHERE`` clause selecting rows that follow ``values``
+    in the order described by ``keys``, ``select_from`` is
+    the joins of the query to tell nullable keys.
+    With ``params`` not NULL values are ``cursor_<n>`` bind parameters
+    added to it, so the clause depends only on which values are NULL.
+
+    Uses row-value comparison ``(a, b) > (x, y)`` when it's equivalent
+    (same direction for every key and no NULLs involved),
+    otherwise falls back to the expanded
+    ``a > x OR (a = x AND b > y)`` form.
+    """
+    directions = {descending for _, _, descending in keys}
+    row_comparison = len(directions) == 1 and None not in values
+
+    if row_comparison and directions == {True}:
+        row_comparison = not any(
+            is_nullable(e, select_from) for _, e, _ in keys
+        )
+
+    bound_values: List[Any] = []
+    for i, ((_, expression, _), value) in enumerate(zip(keys, values)):
+        if value is not None and params is not None:
+            params[f"cursor_{i}"] = value
+            value = sa.bindparam(f"cursor_{i}", type_=expression.type)
+        elif value is not None:
+            value = sa.literal(value, expression.type)
+        bound_values.append(value)
+    values = bound_values
+
+    if row_comparison:
+        columns = sa.tuple_(*[expression for _, expression, _ in keys])
+        bounds = sa.tuple_(*values)
+        return columns < bounds if directions == {True} else columns > bounds
+
+    clauses = []
+    for i, (_, expression, descending) in enumerate(keys):
+        conditions = [
+            _equals(prev_expression, prev_value)
+            for (_, prev_expression, _), prev_value in zip(keys[:i], values)
+        ]
+        conditions.append(
+            _follows(expression, descending, values[i], select_from)
+        )
+        clauses.append(sa.and_(*conditions))
+
+    return sa.or_(*clauses)
+
+
+def reverse_keys(keys: List[SortKey]) -> List[SortKey]:
+    return [(name, expr, not descending) for name, expr, descending in keys]
+
+
+def sort_spec(keys: List[SortKey]) -> List[str]:
+    return [f"-{name}" if descending else name for name, _, descending in keys]
@@ -0,0 +1,193 @@
+import datetime
+import os
+import random
+import sys
+import threading
+from collections import Counter
+from time import perf_counter, sleep
+from typing import Dict, List, Optional
+
+import falcon
+from dynaconf import settings
+
+from awokado.utils import rand_string
+
+
+def collapse_stack(frame, root: str = "") -> str:
+    """
+    Stack of the frame in collapsed format (``root;module.func;...``),
+    outermost frame first
+    """
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f"{frame.f_globals.get('__name__', '?')}.{code.co_name}")
+        frame = frame.f_back
+
+    if root:
+        names.append(root)
+
+    return ";".join(reversed(names))
+
+
+class SamplingProfiler:
+    """
+    Statistical profiler of requests: a background thread takes
+    stacks of the threads handling profiled requests once in ``interval``
+    seconds (``sys._current_frames``), so profiled code isn't slowed down
+    by tracing, unlike cProfile.
+
+    Samples of a request are kept (aggregated by stack) or dropped when
+    the request ends, see `SamplingProfilerMiddleware`. Aggregated stacks
+    are exported in collapsed format of flamegraph.pl / speedscope.
+    Requests of a thread are profiled one at a time (WSGI workers).
+    """
+
+    def __init__(self, interval: float = 0.01):
+        self.interval = interval
+        self.stacks: "Counter[str]" = Counter()
+        self.samples: Dict[int, List[str]] = {}
+        self.roots: Dict[int, str] = {}
+        self.lock = threading.Lock()
+        self.wakeup = threading.Event()
+        self.thread: Optional[threading.Thread] = None
+
+    def start_request(self, root: str = "") -> None:
+        """Starts sampling the current thread, ``root`` is the stack root"""
+        ident = threading.get_ident()
+        with self.lock:
+            self.samples[ident] = []
+            self.roots[ident] = root
+            if self.thread is None:
+                self.thread = threading.Thread(
+                    target=self.run, name="awokado-profiler", daemon=True
+                )
+                self.thread.start()
+
+        self.wakeup.set()
+
+    def stop_request(self, keep: bool) -> None:
+        """Stops sampling the current thread, keeps its samples if ``keep``"""
+        ident = threading.get_ident()
+        with self.lock:
+            samples = self.samples.pop(ident, None)
+            self.roots.pop(ident, None)
+            if keep and samples:
+                self.stacks.update(samples)
+
+    def sample(self) -> None:
+        frames = sys._current_frames()
+        with self.lock:
+            for ident, samples in self.samples.items():
+                frame = frames.get(ident)
+                if frame is not None:
+                    samples.append(collapse_stack(frame, self.roots[ident]))
+
+    def run(self) -> None:
+        while True:
+            # sleeps until a request is started when there are none
+            with self.lock:
+                if not self.samples:
+                    self.wakeup.clear()
+
+            self.wakeup.wait()
+            sleep(self.interval)
+            self.sample()
+
+    def collapsed(self, reset: bool = False) -> str:
+        """Aggregated stacks in collapsed format, ``stack count`` lines"""
+        with self.lock:
+            stacks = self.stacks.most_common()
+            if reset:
+                self.stacks = Counter()
+
+        return "".join(f"{stack} {count}\n" for stack, count in stacks)
+
+    def save(self, directory: str = ".", reset: bool = False) -> str:
+        """Saves aggregated stacks to a ``.collapsed`` file, returns the path"""
+        now = datetime.datetime.now()
+        path = os.path.join(
+            directory,
+            f"{now.strftime('%Y-%m-%dT%H-%M-%S')}-{rand_string()}.collapsed",
+        )
+        with open(path, "w") as f:
+            f.write(self.collapsed(reset=reset))
+
+        return path
+
+
+sampling_profiler = SamplingProfiler(
+    float(settings.get("AWOKADO_SAMPLING_PROFILER_INTERVAL", 0.01))
+)
+
+
+class SamplingProfilerMiddleware:
+    """
+    Profiles ``rate`` fraction of requests and requests slower than
+    ``slow_threshold`` seconds with `SamplingProfiler`.
+    With ``slow_threshold`` all requests are sampled, samples of fast
+    ones not chosen by ``rate`` are dropped when they end.
+
+    Defaults are ``AWOKADO_SAMPLING_PROFILER_RATE`` (0) and
+    ``AWOKADO_SAMPLING_PROFILER_SLOW_THRESHOLD`` (off) settings.
+    """
+
+    def __init__(
+        self,
+        profiler: SamplingProfiler = sampling_profiler,
+        rate: Optional[float] = None,
+        slow_threshold: Optional[float] = None,
+    ):
+        self.profiler = profiler
+        self.rate = (
+            float(settings.get("AWOKADO_SAMPLING_PROFILER_RATE", 0))
+            if rate is None
+            else rate
+        )
+        if slow_threshold is None:
+            slow_threshold = settings.get(
+                "AWOKADO_SAMPLING_PROFILER_SLOW_THRESHOLD", None
+            )
+        self.slow_threshold = (
+            float(slow_threshold) if slow_threshold is not None else None
+        )
+
+    def process_resource(self, req: falcon.Request, resp, resource, params):
+        chosen = self.rate > 0 and random.random() < self.rate
+        if not chosen and self.slow_threshold is None:
+            return
+
+        meta = getattr(resource, "Meta", None)
+        name = getattr(meta, "name", None) or type(resource).__name__
+        self.profiler.start_request(f"{req.method} {name}")
+        req.context.sampling_profiler = (chosen, perf_counter())
+
+    def process_response(self, req: falcon.Request, resp, resource, succeeded):
+        sampling = getattr(req.context, "sampling_profiler", None)
+        if sampling is None:
+            return
+
+        chosen, started = sampling
+        slow = (
+            self.slow_threshold is not None
+            and perf_counter() - started >= self.slow_threshold
+        )
+        self.profiler.stop_request(keep=chosen or slow)
+
+
+class SamplingProfileResource:
+    """
+    Resource exporting aggregated stacks of the profiler in collapsed
+    format, ``?reset=true`` clears them after reading
+    """
+
+    def __init__(self, profiler: SamplingProfiler = sampling_profiler):
+        self.profiler = profiler
+
+    def on_get(
+        self, req: falcon.Request, resp: falcon.Response, resource_id=None
+    ):
+        reset = req.get_param_as_bool("reset") or False
+        resp.body = self.profiler.collapsed(reset=reset)
+        resp.content_type = falcon.MEDIA_TEXT
+        resp.status = falcon.HTTP_200
@@ -0,0 +1,96 @@
+from typing import Any, Dict, Hashable, Optional
+
+from dynaconf import settings
+from sqlalchemy.sql.selectable import Select
+from sqlalchemy.util import LRUCache
+
+
+class CompiledCache(LRUCache):
+    """
+    LRU cache of compiled statements, passed to SQLAlchemy with
+    ``compiled_cache`` execution option, counts its lookups.
+    """
+
+    def __init__(self, size: int):
+        super().__init__(size)
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, default=None):
+        compiled = super().get(key, default)
+        if compiled is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+
+        return compiled
+
+
+class QueryCache:
+    """
+    LRU cache of read query templates: selects built by
+    ``ReadContext.read__query``, and of compiled read statements.
+
+    Templates are shared between requests, so they must never be
+    modified in place, only with generative methods (``where``,
+    ``order_by`` and so on). Values which differ between requests
+    are bind parameters passed on execution.
+
+    Filters, cursors, limit and offset are bind parameters too, so
+    statements of requests of the same shape (see ``ReadContext.execute``)
+    are the same SQL: the first one is kept by the shape and compiled
+    once, SQLAlchemy keeps compiled statements by their objects.
+    """
+
+    def __init__(self, size: int):
+        self.size = size
+        self.templates = LRUCache(max(size, 1))
+        self.statements = LRUCache(max(size, 1))
+        self.compiled = CompiledCache(max(size, 1))
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.size > 0
+
+    def get(self, key: Hashable) -> Optional[Select]:
+        template: Optional[Select] = self.templates.get(key)
+        if template is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+
+        return template
+
+    def set(self, key: Hashable, select: Select) -> Select:
+        self.templates[key] = select
+        return select
+
+    def statement(self, key: Hashable, select: Select) -> Select:
+        """Statement of the shape ``key``, ``select`` if it's the first one"""
+        statement: Optional[Select] = self.statements.get(key)
+        if statement is None:
+            statement = self.statements[key] = select
+
+        return statement
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "size": len(self.templates),
+            "hits": self.hits,
+            "misses": self.misses,
+            "compiled_size": len(self.compiled),
+            "compiled_hits": self.compiled.hits,
+            "compiled_misses": self.compiled.misses,
+        }
+
+    def clear(self):
+        self.templates.clear()
+        self.statements.clear()
+        self.compiled.clear()
+        self.hits = self.misses = 0
+        self.compiled.hits = self.compiled.misses = 0
+
+
+query_cache = QueryCache(int(settings.get("AWOKADO_QUERY_CACHE_SIZE", 500)))
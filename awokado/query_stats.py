@@ -0,0 +1,373 @@
+"""
+Per-request SQL statistics: count, duration and rows of the executed
+statements, in total and by the stage they were executed in
+(``ReadContext`` stages, resource methods, see `track_stage`),
+and timings of the stages for subscribers (see `subscribe_stages`).
+
+Engines are instrumented with ``before_cursor_execute`` /
+``after_cursor_execute`` listeners (`instrument_engine`), statements
+are recorded only while stats of the request are collected
+(`start_query_stats`), the listeners do nothing otherwise.
+"""
+import threading
+import traceback
+from contextvars import ContextVar, Token
+from dataclasses import dataclass
+from time import perf_counter
+from logging import getLogger
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Set, Tuple
+
+from dynaconf import settings
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+log = getLogger("awokado.query_stats")
+
+DEFAULT_STAGE = "request"
+
+
+@dataclass
+class StageQueryStats:
+    count: int = 0
+    duration: float = 0.0
+    rows: int = 0
+
+
+class QueryStats:
+    """
+    Statistics of the statements of a request, ``duration`` is in seconds,
+    ``rows`` are rows returned (or changed) by the statements.
+    Statements of include loaders running in other threads
+    are recorded too, so updates are locked.
+    """
+
+    def __init__(self) -> None:
+        self.count = 0
+        self.duration = 0.0
+        self.rows = 0
+        self.stages: Dict[str, StageQueryStats] = {}
+        self.stage_times: Dict[str, float] = {}
+        self.started = perf_counter()
+        self.lock = threading.Lock()
+        self.budget: Optional[QueryBudget] = None
+
+    def add(self, stage: str, duration: float, rows: int) -> None:
+        with self.lock:
+            self.count += 1
+            self.duration += duration
+            self.rows += rows
+
+            stage_stats = self.stages.get(stage)
+            if stage_stats is None:
+                stage_stats = self.stages[stage] = StageQueryStats()
+
+            stage_stats.count += 1
+            stage_stats.duration += duration
+            stage_stats.rows += rows
+
+    def add_stage_time(self, stage: str, duration: float) -> None:
+        with self.lock:
+            self.stage_times[stage] = self.stage_times.get(stage, 0) + duration
+
+    @property
+    def elapsed(self) -> float:
+        """Seconds since the stats were started"""
+        return perf_counter() - self.started
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "count": self.count,
+            "duration": self.duration,
+            "rows": self.rows,
+            "stages": {
+                name: {
+                    "count": stage.count,
+                    "duration": stage.duration,
+                    "rows": stage.rows,
+                }
+                for name, stage in self.stages.items()
+            },
+            "stage_times": dict(self.stage_times),
+        }
+
+    def server_timing(self) -> str:
+        """
+        ``Server-Timing`` header value: time of the statements in total
+        and by stage, time of the stages (nested ones are
+        included in outer ones) and of the whole request (``app``),
+        in milliseconds
+        """
+        metrics = [
+            f'db;dur={self.duration * 1000:.2f};desc="{self.count} queries/'
+            f'{self.rows} rows"'
+        ]
+        for name, stage in self.stages.items():
+            metrics.append(
+                f"db-{name};dur={stage.duration * 1000:.2f};"
+                f'desc="{stage.count} queries"'
+            )
+        for name, duration in self.stage_times.items():
+            metrics.append(f"stage-{name};dur={duration * 1000:.2f}")
+        metrics.append(f"app;dur={self.elapsed * 1000:.2f}")
+
+        return ", ".join(metrics)
+
+
+class QueryBudgetExceeded(Exception):
+    """
+    Request exceeded its `QueryBudget`, ``stack`` is the stack
+    of the offending statement
+    """
+
+    def __init__(self, message: str, statement: str, stack: List[str]):
+        super().__init__(message)
+        self.message = message
+        self.statement = statement
+        self.stack = stack
+
+    def __str__(self) -> str:
+        return (
+            f"{self.message}\n{self.statement}\n"
+            f"Statement stack:\n{''.join(self.stack)}"
+        )
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "message": self.message,
+            "statement": self.statement,
+            "stack": self.stack,
+        }
+
+
+class QueryBudget:
+    """
+    Limits of the statements of a request: ``max_queries`` statements,
+    ``max_rows`` rows returned by them, ``max_repeats`` statements
+    of the same shape (SQL without parameter values), the last one
+    catches N+1 queries of loaders and hooks, e.g. statements per row.
+
+    Each violation is reported once per request: logged as a warning
+    or raised as `QueryBudgetExceeded` with ``raise_exc``.
+    """
+
+    def __init__(
+        self,
+        max_queries: Optional[int] = None,
+        max_rows: Optional[int] = None,
+        max_repeats: Optional[int] = None,
+        raise_exc: bool = False,
+        name: str = "request",
+    ):
+        self.max_queries = max_queries
+        self.max_rows = max_rows
+        self.max_repeats = max_repeats
+        self.raise_exc = raise_exc
+        self.name = name
+        self.shapes: Dict[str, int] = {}
+        self.reported: Set[str] = set()
+        self.lock = threading.Lock()
+
+    @classmethod
+    def from_resource(cls, resource: Any) -> "QueryBudget":
+        """
+        Budget of requests of the resource: ``max_queries`` and ``max_rows``
+        of its ``ResourceMeta``, ``AWOKADO_QUERY_MAX_REPEATS`` setting
+        (5 by default), raises with ``AWOKADO_QUERY_BUDGET_RAISE`` setting
+        """
+        meta = getattr(resource, "Meta", None)
+        max_repeats = settings.get("AWOKADO_QUERY_MAX_REPEATS", 5)
+        return cls(
+            max_queries=getattr(meta, "max_queries", None),
+            max_rows=getattr(meta, "max_rows", None),
+            max_repeats=int(max_repeats) if max_repeats is not None else None,
+            raise_exc=bool(settings.get("AWOKADO_QUERY_BUDGET_RAISE", False)),
+            name=getattr(meta, "name", None) or type(resource).__name__,
+        )
+
+    def check(self, stats: QueryStats, statement: str) -> None:
+        violations = []
+        with self.lock:
+            repeats = self.shapes[statement] = self.shapes.get(statement, 0) + 1
+
+            if self.max_queries is not None and stats.count > self.max_queries:
+                violations.append(
+                    ("queries", f"more than {self.max_queries} statements")
+                )
+            if self.max_rows is not None and stats.rows > self.max_rows:
+                violations.append(
+                    ("rows", f"more than {self.max_rows} rows ({stats.rows})")
+                )
+            if self.max_repeats is not None and repeats > self.max_repeats:
+                violations.append(
+                    (
+                        f"repeats:{statement}",
+                        f"statement repeated more than "
+                        f"{self.max_repeats} times",
+                    )
+                )
+
+            violations = [
+                (key, problem)
+                for key, problem in violations
+                if key not in self.reported
+            ]
+            self.reported.update(key for key, _ in violations)
+
+        for _, problem in violations:
+            self.report(
+                f"Query budget of {self.name} exceeded: {problem}", statement
+            )
+
+    def report(self, message: str, statement: str) -> None:
+        stack = traceback.format_list(
+            [
+                frame
+                for frame in traceback.extract_stack()
+                if frame.filename != __file__
+                and "/sqlalchemy/" not in frame.filename
+            ]
+        )
+        exc = QueryBudgetExceeded(message, statement, stack)
+        if self.raise_exc:
+            raise exc
+
+        log.warning("%s", exc)
+
+
+_stats: ContextVar[Optional[QueryStats]] = ContextVar(
+    "awokado_query_stats", default=None
+)
+_stage: ContextVar[str] = ContextVar("awokado_stage", default=DEFAULT_STAGE)
+
+
+class StageTiming(NamedTuple):
+    """Timing of a stage passed to stage subscribers"""
+
+    resource: Optional[str]
+    stage: str
+    duration: float
+    failed: bool
+
+
+StageSubscriber = Callable[[StageTiming], None]
+
+_subscribers: Tuple[StageSubscriber, ...] = ()
+_subscribers_lock = threading.Lock()
+
+
+def subscribe_stages(subscriber: StageSubscriber) -> None:
+    """
+    Adds a subscriber called with `StageTiming` of each finished stage,
+    e.g. to feed latency histograms by resource and stage.
+    Subscribers are called in the request thread, so they must be fast.
+    """
+    global _subscribers
+
+    with _subscribers_lock:
+        if subscriber not in _subscribers:
+            _subscribers = _subscribers + (subscriber,)
+
+
+def unsubscribe_stages(subscriber: StageSubscriber) -> None:
+    global _subscribers
+
+    with _subscribers_lock:
+        _subscribers = tuple(s for s in _subscribers if s != subscriber)
+
+
+class track_stage:
+    """
+    Context manager timing the ``name`` stage of the ``resource``
+    and attributing statements executed inside it
+    to the stage, the innermost stage wins::
+
+        with track_stage("read__execute_query", self.Meta.name):
+            self.read__execute_query(ctx)
+
+    The time is added to `QueryStats` of the request and
+    passed to the stage subscribers (see `subscribe_stages`).
+    """
+
+    __slots__ = ("name", "resource", "token", "started")
+
+    def __init__(self, name: str, resource: Optional[str] = None):
+        self.name = name
+        self.resource = resource
+        self.token: Optional[Token] = None
+        self.started = 0.0
+
+    def __enter__(self) -> "track_stage":
+        self.token = _stage.set(self.name)
+        self.started = perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        duration = perf_counter() - self.started
+        if self.token is not None:
+            _stage.reset(self.token)
+
+        stats = _stats.get()
+        if stats is not None:
+            stats.add_stage_time(self.name, duration)
+
+        if _subscribers:
+            timing = StageTiming(
+                self.resource, self.name, duration, exc_type is not None
+            )
+            for subscriber in _subscribers:
+                subscriber(timing)
+
+
+def get_stage() -> str:
+    return _stage.get()
+
+
+def get_query_stats() -> Optional[QueryStats]:
+    """Stats of the current request, if they are collected"""
+    return _stats.get()
+
+
+def start_query_stats() -> Token:
+    """
+    Starts collecting stats of the statements executed in the current
+    context (and in threads running a copy of it)
+    """
+    return _stats.set(QueryStats())
+
+
+def stop_query_stats(token: Token) -> None:
+    _stats.reset(token)
+
+
+def _before_cursor_execute(
+    connection, cursor, statement, parameters, context, executemany
+):
+    if context is not None and _stats.get() is not None:
+        context._awokado_query_started = perf_counter()
+
+
+def _after_cursor_execute(
+    connection, cursor, statement, parameters, context, executemany
+):
+    started = getattr(context, "_awokado_query_started", None)
+    stats = _stats.get()
+    if started is None or stats is None:
+        return
+
+    # server-side cursors have no rowcount until rows are fetched
+    rows = max(cursor.rowcount, 0)
+    stats.add(_stage.get(), perf_counter() - started, rows)
+
+    if stats.budget is not None:
+        stats.budget.check(stats, statement)
+
+
+def instrument_engine(engine: Engine) -> Engine:
+    """Adds query stats listeners to the engine, once"""
+    if not event.contains(
+        engine, "before_cursor_execute", _before_cursor_execute
+    ):
+        event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+    return engine
@@ -1,20 +1,119 @@
-from dataclasses import dataclass, field
-from typing import Dict, List, Optional
+import contextvars
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+from dataclasses import dataclass, field, replace
+from typing import (
+    Any,
+    Dict,
+    Hashable,
+    Iterator,
+    List,
+    Optional,
+    Set,
+    Tuple,
+    Type,
+    Union,
+)
 
 import sqlalchemy as sa
-from marshmallow.fields import List as ListField
+from dynaconf import settings
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.engine import Engine, ResultProxy
 from sqlalchemy.orm import Session
 from sqlalchemy.orm.attributes import InstrumentedAttribute
+from sqlalchemy.sql import ClauseElement, Join
 from sqlalchemy.sql.selectable import Select
+from sqlalchemy.sql.util import find_tables
+
+from marshmallow import ValidationError
 
 from awokado.custom_fields import ToMany, ToOne
-from awokado.exceptions import BadFilter, BadRequest, RelationNotFound
-from awokado.filter_parser import filter_value_to_python, FilterItem
-from awokado.utils import get_id_field, get_sort_way
+from awokado.exceptions import (
+    BadCursor,
+    BadFilter,
+    BadRequest,
+    BadSort,
+    RelationNotFound,
+)
+from awokado.explain import get_capture
+from awokado.filter_parser import (
+    Filter,
+    FilterGrammar,
+    get_include_filters,
+    get_relation_paths,
+)
+from awokado.pagination import (
+    decode_cursor,
+    encode_cursor,
+    is_aggregate,
+    keyset_predicate,
+    reverse_keys,
+    sort_spec,
+    SortKey,
+)
+from awokado.query_cache import query_cache
+from awokado.query_stats import instrument_engine
+from awokado.total import BaseTotal
+from awokado.utils import (
+    get_column,
+    get_id_field,
+    ids_bindparam,
+    get_sort_way,
+    is_outer_join_of,
+    prune_outer_joins,
+)
 
 if False:
     from awokado.resource import BaseResource
 
+_include_executor: Optional[ThreadPoolExecutor] = None
+_include_executor_lock = threading.Lock()
+
+
+def get_include_executor() -> ThreadPoolExecutor:
+    """
+    Thread pool of concurrent include loaders,
+    ``AWOKADO_INCLUDE_WORKERS`` threads (4 by default)
+    """
+    global _include_executor
+
+    with _include_executor_lock:
+        if _include_executor is None:
+            _include_executor = ThreadPoolExecutor(
+                max_workers=int(settings.get("AWOKADO_INCLUDE_WORKERS", 4)),
+                thread_name_prefix="awokado-include",
+            )
+
+    return _include_executor
+
+
+_loader_engines: Dict[str, Engine] = {}
+_loader_engines_lock = threading.Lock()
+
+
+def get_loader_engine(engine: Engine) -> Engine:
+    """
+    Engine of concurrent include loaders connecting to the database
+    of ``engine``, with a connection per loader thread in its pool.
+    Loaders don't take connections of the ``engine`` pool, which are held
+    by requests waiting for them, so they never wait for each other.
+    """
+    url = str(engine.url)
+
+    with _loader_engines_lock:
+        loader_engine = _loader_engines.get(url)
+        if loader_engine is None:
+            loader_engine = _loader_engines[url] = sa.create_engine(
+                engine.url,
+                echo=engine.echo,
+                pool_size=int(settings.get("AWOKADO_INCLUDE_WORKERS", 4)),
+                max_overflow=0,
+            )
+            if settings.get("AWOKADO_QUERY_STATS", True):
+                instrument_engine(loader_engine)
+
+    return loader_engine
+
 
 @dataclass
 class ReadContext:
@@ -24,18 +123,35 @@ class ReadContext:
 
     # request vars
     include: Optional[List]
-    query: Optional[List[FilterItem]]
+    query: Optional[List[Filter]]
     sort: Optional[list]
     resource_id: Optional[int]
     limit: Optional[int]
     offset: Optional[int]
+    after: Optional[str] = None
+    before: Optional[str] = None
+    with_total: Optional[bool] = None
+    fieldsets: Optional[Dict[str, List[str]]] = None
 
     # runtime vars
     q: Select = field(default_factory=Select)
     obj_ids: List[int] = field(default_factory=list)
     parent_payload: List = field(default_factory=list)
     related_payload: Dict = field(default_factory=dict)
-    total: int = 0
+    include_filters: Dict[str, List[Filter]] = field(default_factory=dict)
+    total_q: Optional[Select] = None
+    total: Optional[int] = 0
+    total_kind: Optional[str] = None
+    has_more: Optional[bool] = None
+    sort_keys: List[SortKey] = field(default_factory=list)
+    bind_params: Dict = field(default_factory=dict)
+    # shape of the statement ``shaped_q`` built by the stages,
+    # the values of its bind params aside (see `execute`)
+    query_shape: Optional[Tuple] = None
+    shaped_q: Optional[Select] = None
+    stream_result: Optional[ResultProxy] = None
+    next_cursor: Optional[str] = None
+    prev_cursor: Optional[str] = None
 
     # for Aggregation Resources
     time_scale = None
@@ -48,57 +164,304 @@ class ReadContext:
         if not self.query:
             return
 
-        filters_to_apply = []
-
-        for f in self.query:
-            resource_field = self.resource.fields.get(f.field)
-
-            model_field = resource_field.metadata.get("model_field")
-
-            if model_field is None:
-                raise BadFilter(filter=f.field)
-
-            value = f.wrapper(f.value)
-            value = filter_value_to_python(value)
-
-            list_deserialization = isinstance(value, list) and not isinstance(
-                resource_field, ListField
-            )
-
-            if value is not None:
-                if list_deserialization:
-                    value = [resource_field.deserialize(item) for item in value]
-                else:
-                    value = resource_field.deserialize(value)
-
-            field_expr = getattr(model_field, f.op)(value)
-            filters_to_apply.append(field_expr)
-
-        self.q = self.q.where(sa.and_(*filters_to_apply))
+        q = self.q
+        grammar = FilterGrammar.get(type(self.resource))
+        self.q = self.q.where(grammar.to_clause(self.query, self.bind_params))
+        self.__reshape(q, "filter", grammar.shape(self.query))
 
     def read__sorting(self):
+        q = self.q
         if self.sort:
+            sortable = self.resource.Meta.sortable
             # TODO: add support for routes
             # example: (xxx.names.display_name)
             for sort_item in self.sort:
-                sort_route, sort_way = get_sort_way(sort_item)
+                sort_route, sort_way = get_sort_way(
+                    sort_item, self.resource.Meta.select_from
+                )
+
+                if sortable is not None and sort_route not in sortable:
+                    raise BadSort(sort=sort_route)
 
                 if sort_route in self.resource.fields:
-                    self.q = self.q.order_by(
-                        sort_way(
-                            self.resource.fields[sort_route].metadata.get(
-                                "model_field"
-                            )
-                        )
+                    model_field = self.resource.fields[sort_route].metadata.get(
+                        "model_field"
+                    )
+                    self.q = self.q.order_by(sort_way(model_field))
+                    self.sort_keys.append(
+                        (sort_route, model_field, sort_item.startswith("-"))
                     )
 
+        tie_breaker = bool(self.limit or self.after or self.before)
+        if tie_breaker:
+            self.__add_sort_tie_breaker()
+
+        self.__reshape(q, "sort", tuple(self.sort or ()), tie_breaker)
+
+    def __add_sort_tie_breaker(self):
+        """
+        Pages must have a stable order to be addressed by a cursor,
+        so resource id is always the last sort key.
+        """
+        id_field = get_id_field(self.resource, name_only=True, skip_exc=True)
+
+        if not id_field:
+            self.sort_keys = []
+            return
+
+        if id_field in [name for name, _, _ in self.sort_keys]:
+            return
+
+        model_id = get_id_field(self.resource)
+        _, sort_way = get_sort_way(id_field, self.resource.Meta.select_from)
+        self.q = self.q.order_by(sort_way(model_id))
+        self.sort_keys.append((id_field, model_id, False))
+
     def read__pagination(self):
+        q = self.total_q = self.q
+
+        cursor = self.after or self.before
+        cursor_nulls = self.__apply_cursor(cursor) if cursor else None
+
         if self.limit:
-            self.q = self.q.limit(self.limit)
+            self.q = self.q.limit(sa.bindparam("limit", type_=sa.Integer))
+            self.bind_params["limit"] = self.limit
+        if self.offset:
+            self.q = self.q.offset(sa.bindparam("offset", type_=sa.Integer))
+            self.bind_params["offset"] = self.offset
+
+        self.__reshape(
+            q,
+            "page",
+            bool(self.after),
+            bool(self.before),
+            cursor_nulls,
+            bool(self.limit),
+            bool(self.offset),
+        )
+
+    def __apply_cursor(self, cursor: str) -> Tuple[bool, ...]:
+        """
+        Applies keyset predicate of the cursor values,
+        returns which of them are NULL
+        """
+        if self.after and self.before:
+            raise BadCursor(details="Use either after or before cursor")
+
         if self.offset:
-            self.q = self.q.offset(self.offset)
+            raise BadCursor(details="Cursor can't be combined with offset")
+
+        if not self.sort_keys:
+            raise BadCursor(
+                details=f"Resource {self.resource.Meta.name} "
+                f"doesn't support cursor pagination"
+            )
+
+        values = decode_cursor(cursor, sort_spec(self.sort_keys))
+
+        try:
+            values = [
+                self.resource.fields[name].deserialize(value)
+                if value is not None
+                else None
+                for (name, _, _), value in zip(self.sort_keys, values)
+            ]
+        except ValidationError:
+            raise BadCursor()
+
+        keys = self.sort_keys
+        select_from = self.resource.Meta.select_from
+        if self.before:
+            # read the page backwards, rows are reversed after fetching
+            keys = reverse_keys(keys)
+            self.q = self.q.order_by(None).order_by(
+                *[
+                    get_sort_way(sort_item, select_from)[1](expression)
+                    for sort_item, (_, expression, _) in zip(
+                        sort_spec(keys), keys
+                    )
+                ]
+            )
+
+        predicate = keyset_predicate(
+            keys, values, select_from, self.bind_params
+        )
+
+        if any(is_aggregate(expression) for _, expression, _ in keys):
+            self.q = self.q.having(predicate)
+        else:
+            self.q = self.q.where(predicate)
+
+        return tuple(value is None for value in values)
+
+    def __set_cursors(self, first: dict, last: dict, rows_count: int):
+        if not self.limit or not self.sort_keys or not rows_count:
+            return
+
+        names = [name for name, _, _ in self.sort_keys]
+        if any(name not in first for name in names):
+            return
+
+        spec = sort_spec(self.sort_keys)
+
+        def cursor(record: dict) -> str:
+            return encode_cursor(spec, [record[name] for name in names])
+
+        full_page = rows_count >= self.limit
+        if self.has_more is not None:
+            full_page = self.has_more
+
+        if self.before:
+            self.prev_cursor = cursor(first) if full_page else None
+            self.next_cursor = cursor(last)
+        else:
+            self.next_cursor = cursor(last) if full_page else None
+            if self.after or self.offset:
+                self.prev_cursor = cursor(first)
+
+    def get_fieldset(self, resource: "BaseResource") -> Optional[Set[str]]:
+        """
+        Names of the fields of ``resource`` requested by the client,
+        None if all of them should be returned.
+        The id field is always returned.
+        """
+        requested = (self.fieldsets or {}).get(resource.Meta.name)
+        if not requested:
+            return None
+
+        for name in requested:
+            field = resource.fields.get(name)
+            if field is None or field.load_only:
+                raise BadRequest(
+                    details=f"Field {name} not found "
+                    f"in {resource.Meta.name} resource"
+                )
+
+        fieldset = set(requested)
+        id_field = get_id_field(resource, name_only=True, skip_exc=True)
+        if id_field:
+            fieldset.add(id_field)
+
+        return fieldset
+
+    def __referenced_tables(self, fields_to_select: dict) -> Optional[set]:
+        """
+        Tables referenced by the selected fields, filters and sorting,
+        None if joins can't be pruned.
+        """
+        grammar = FilterGrammar.get(type(self.resource))
+        names = grammar.referenced_fields(self.query)
+        names.extend(get_sort_way(s)[0] for s in self.sort or [])
+
+        expressions = list(fields_to_select.values())
+        for name in names:
+            resource_field = self.resource.fields.get(name)
+            if resource_field is not None:
+                expressions.append(resource_field.metadata.get("model_field"))
+
+        tables: set = set()
+        for expression in expressions:
+            if expression is None:
+                continue
+
+            expression_tables = find_tables(
+                expression.label(None), check_columns=True
+            )
+            if not expression_tables and is_aggregate(expression.label(None)):
+                # e.g. count(*) depends on every joined row
+                return None
+
+            tables.update(expression_tables)
+
+        return tables
+
+    def __build_query(self, fields_to_select: dict, joins, group_by):
+        q = sa.select([clm.label(lbl) for lbl, clm in fields_to_select.items()])
+
+        if joins is not None:
+            q = q.select_from(joins)
+
+        if not self.is_list:
+            model_id = get_id_field(self.resource)
+            q = q.where(model_id == sa.bindparam("resource_id"))
+
+        if self.resource.Meta.auth:
+            q = self.resource.Meta.auth.can_read(self, q)
+
+        if group_by is not None:
+            model_id = get_id_field(self.resource)
+            q = q.group_by(model_id, *group_by)
+
+        return q
 
     def read__query(self):
+        fieldset = self.get_fieldset(self.resource)
+
+        if fieldset is not None:
+            # sorting fields are grouped by and needed to build cursors
+            fieldset.update(
+                name
+                for name, _ in map(get_sort_way, self.sort or [])
+                if name in self.resource.fields
+            )
+
+        if not self.is_list:
+            self.bind_params["resource_id"] = self.resource_id
+
+        cache_key = self.__query_cache_key(fieldset)
+        if cache_key is None:
+            self.q = self.shaped_q = self.__make_query(fieldset)
+            self.query_shape = None
+            return
+
+        q = query_cache.get(cache_key)
+        if q is None:
+            q = query_cache.set(cache_key, self.__make_query(fieldset))
+
+        self.q = self.shaped_q = q
+        self.query_shape = cache_key
+
+    def __reshape(self, q: Select, *shape: Hashable):
+        """
+        Adds ``shape`` of the changes of a stage to the shape of the
+        query, the stage built ``self.q`` from ``q``. The shape is unknown
+        if ``q`` isn't the query built by the stages.
+        """
+        if self.query_shape is not None and q is self.shaped_q:
+            self.query_shape += shape
+        else:
+            self.query_shape = None
+
+        self.shaped_q = self.q
+
+    def __query_cache_key(self, fieldset: Optional[Set[str]]):
+        if not query_cache.enabled:
+            return None
+
+        auth_key = None
+        if self.resource.Meta.auth:
+            auth_key = self.resource.Meta.auth.read_cache_key(self)
+            if auth_key is None:
+                return None
+
+        if fieldset is None:
+            return type(self.resource), self.is_list, None, None, auth_key
+
+        # joins are pruned depending on filtered and sorted fields
+        grammar = FilterGrammar.get(type(self.resource))
+        pruning_fields = frozenset(
+            grammar.referenced_fields(self.query)
+            + [get_sort_way(s)[0] for s in self.sort or []]
+        )
+        return (
+            type(self.resource),
+            self.is_list,
+            frozenset(fieldset),
+            pruning_fields,
+            auth_key,
+        )
+
+    def __make_query(self, fieldset: Optional[Set[str]]) -> Select:
         fields_to_select = {}
         to_group_by = []
 
@@ -107,6 +470,9 @@ class ReadContext:
             if field.load_only:
                 continue
 
+            if fieldset is not None and field_name not in fieldset:
+                continue
+
             if model_field is None:
                 raise Exception(
                     f"{self.resource.Meta.name}.{field_name} field must have "
@@ -127,84 +493,590 @@ class ReadContext:
                 ):
                     to_group_by.append(model_field)
 
-        q = sa.select([clm.label(lbl) for lbl, clm in fields_to_select.items()])
-
         joins = getattr(self.resource.Meta, "select_from", None)
-        if joins is not None:
-            q = q.select_from(joins)
+        group_by = to_group_by if joins is not None else None
 
-        if not self.is_list:
-            model_id = get_id_field(self.resource)
-            q = q.where(model_id == self.resource_id)
+        tables = None
+        if fieldset is not None and joins is not None:
+            tables = self.__referenced_tables(fields_to_select)
 
-        if self.resource.Meta.auth:
-            q = self.resource.Meta.auth.can_read(self, q)
+        if tables is not None:
+            pruned_joins = prune_outer_joins(joins, tables)
 
-        if joins is not None:
-            model_id = get_id_field(self.resource)
-            q = q.group_by(model_id, *to_group_by)
+            if pruned_joins is not joins:
+                if not isinstance(pruned_joins, Join) and not any(
+                    is_aggregate(clm.label(None))
+                    for clm in fields_to_select.values()
+                ):
+                    # no joined rows left to aggregate
+                    group_by = None
+
+                q = self.__build_query(fields_to_select, pruned_joins, group_by)
 
-        self.q = q
+                # auth may refer to pruned tables, read with all joins then
+                if q.froms == [pruned_joins]:
+                    return q
+
+        return self.__build_query(fields_to_select, joins, group_by)
 
     def __add_related_payload(self, related_res, related_data: list):
+        fieldset = self.get_fieldset(related_res())
+        if fieldset is not None:
+            related_data = [
+                {k: v for k, v in rec.items() if k in fieldset}
+                for rec in related_data
+            ]
+
         if related_res.Meta.name in self.related_payload:
             related_res = related_res()
             related_res_id_field = get_id_field(related_res, name_only=True)
-            existing_record_ids = [
-                rec[related_res_id_field]
-                for rec in self.related_payload[related_res.Meta.name]
-            ]
+            existing_records = self.related_payload[related_res.Meta.name]
+            existing_record_ids = {
+                rec[related_res_id_field] for rec in existing_records
+            }
             for rec in related_data:
                 if rec[related_res_id_field] not in existing_record_ids:
-                    self.related_payload[related_res.Meta.name].append(rec)
+                    existing_record_ids.add(rec[related_res_id_field])
+                    existing_records.append(rec)
         else:
             self.related_payload[related_res.Meta.name] = related_data
 
-    def read__includes(self):
-        for i in self.include or []:
-            if "." in i:
-                raise BadRequest()
+    def __include_tree(self) -> Dict[str, Dict]:
+        """
+        Includes as a tree of relations,
+        ``books.tags,books.store`` -> ``{"books": {"tags": {}, "store": {}}}``
+        """
+        tree: Dict[str, Dict] = {}
+        for include in self.include or []:
+            node = tree
+            for relation in include.split("."):
+                if not relation:
+                    raise BadRequest(f"Invalid include <{include}>")
+                node = node.setdefault(relation, {})
+
+        self.__check_include_tree(self.resource, tree, "")
+        return tree
+
+    @staticmethod
+    def __relation_field(resource: "BaseResource", relation: str, path: str):
+        field = resource.fields.get(relation)
+        if not isinstance(field, (ToOne, ToMany)):
+            raise RelationNotFound(f"Relation <{path}> not found")
+
+        return field
+
+    def __check_include_tree(
+        self, resource: "BaseResource", tree: Dict[str, Dict], prefix: str
+    ):
+        for relation, subtree in tree.items():
+            path = f"{prefix}{relation}"
+            field = self.__relation_field(resource, relation, path)
+            related_res = resource.RESOURCES[field.metadata["resource"]]
+            self.get_fieldset(related_res())
+
+            ctx = self.__related_context(type(resource))
+            ctx.__loader_clause(relation, field, related_res, path)
 
-            elif not isinstance(self.resource.fields.get(i), (ToOne, ToMany)):
-                raise RelationNotFound(f"Relation <{i}> not found")
+            if subtree:
+                self.__check_include_tree(related_res(), subtree, f"{path}.")
 
-            related_resource_name = self.resource.fields[i].metadata["resource"]
-            related_res = self.resource.RESOURCES[related_resource_name]
-            related_field = self.resource.fields[i].metadata.get("model_field")
+    def check_includes(self) -> Dict[str, Dict]:
+        """
+        Validates includes without reading anything: relations of
+        the include tree, include filters and fieldsets of the included
+        resources. Returns the include tree.
+        """
+        self.include_filters = get_include_filters(self.query)
+        tree = self.__include_tree()
+
+        for path in self.include_filters:
+            node = tree
+            for relation in path.split("."):
+                if relation not in node:
+                    raise BadFilter(
+                        details=f"Filtered relation <{path}> isn't included"
+                    )
+                node = node[relation]
+
+        return tree
+
+    def __load_relation(self, relation: str, path: str):
+        """
+        Loads records of the relation for ``self.obj_ids`` in one query,
+        with ``get_by_<resource>_ids`` method of the related resource
+        if it has one, otherwise with the loader derived from the field.
+        Filtered includes are loaded by the derived loader,
+        so include filters are applied by the database.
+        """
+        field = self.__relation_field(self.resource, relation, path)
+        related_res = self.resource.RESOURCES[field.metadata["resource"]]
+
+        include_clause = self.__loader_clause(
+            relation, field, related_res, path
+        )
+        if include_clause is None:
             method_name = f"get_by_{self.resource.Meta.name.lower()}_ids"
+            related_data = getattr(related_res(), method_name)(
+                self.session, self, field.metadata.get("model_field")
+            )
+            return related_res, related_data
 
-            if not hasattr(related_res, method_name):
-                raise BadRequest(
-                    f"Relation {related_resource_name} doesn't ready yet. "
-                    f"Ask developers to add {method_name} method "
-                    f"to {related_resource_name} resource"
+        ctx = self.__related_context(related_res)
+        ctx.query = self.include_filters.get(path)
+        ctx.resource.read__query(ctx)
+        ctx.resource.read__filtering(ctx)
+        ctx.q = ctx.q.where(include_clause)
+        result = ctx.execute(ctx.q).fetchall()
+
+        return related_res, ctx.resource.dump(result, many=True)
+
+    def __loader_clause(
+        self, relation: str, field: Union[ToOne, ToMany], related_res, path: str
+    ) -> Optional[ClauseElement]:
+        """
+        Where clause of the derived loader of the relation,
+        None if it's loaded by ``get_by_<resource>_ids`` method
+        of the related resource
+        """
+        method_name = f"get_by_{self.resource.Meta.name.lower()}_ids"
+        include_filters = self.include_filters.get(path)
+
+        if hasattr(related_res, method_name) and not include_filters:
+            return None
+
+        include_clause = self.__include_clause(relation, field, related_res)
+        if include_clause is None and include_filters:
+            raise BadFilter(details=f"Include <{path}> can't be filtered")
+
+        if include_clause is None:
+            related_resource_name = related_res.Meta.name
+            raise BadRequest(
+                f"Relation {related_resource_name} doesn't ready yet. "
+                f"Ask developers to add {method_name} method "
+                f"to {related_resource_name} resource"
+            )
+
+        return include_clause
+
+    def __include_clause(
+        self, relation: str, field: Union[ToOne, ToMany], related_res
+    ) -> Optional[ClauseElement]:
+        """
+        Where clause of the related resource read query selecting
+        records of the relation, derived from ``model_field``
+        of the field and foreign keys, None if it can't be derived
+        """
+        model_field = get_column(field.metadata.get("model_field"))
+        related_table = getattr(related_res.Meta.model, "__table__", None)
+        if model_field is None or related_table is None:
+            return None
+
+        if isinstance(field, ToOne):
+            related_column = get_id_field(related_res(), skip_exc=True)
+            for fk in model_field.foreign_keys:
+                if fk.column.table is related_table:
+                    related_column = fk.column
+
+            if related_column is False:
+                return None
+
+            data_key = field.data_key or relation
+            if self.parent_payload and all(
+                data_key in rec for rec in self.parent_payload
+            ):
+                # foreign keys are in the payload already
+                fk_values = {
+                    rec[data_key]
+                    for rec in self.parent_payload
+                    if rec[data_key] is not None
+                }
+                return related_column == sa.any_(
+                    ids_bindparam(list(fk_values), related_column)
                 )
 
-            related_res_obj = related_res()
-            related_data = getattr(related_res_obj, method_name)(
-                self.session, self, related_field
+            model_id = get_id_field(self.resource)
+            fk_q = sa.select([model_field]).where(
+                model_id == sa.any_(ids_bindparam(self.obj_ids, model_id))
+            )
+            model_table = getattr(self.resource.Meta.model, "__table__", None)
+            select_from = getattr(self.resource.Meta, "select_from", None)
+            if select_from is not None and model_field.table is not model_table:
+                # foreign key is in a joined table
+                fk_q = fk_q.select_from(select_from)
+
+            return related_column.in_(fk_q)
+
+        m2m = self.resource._process_to_many_field(field)
+        if m2m.left_fk_field is None:
+            return None
+
+        left_ids = sa.any_(ids_bindparam(self.obj_ids, m2m.left_fk_field))
+
+        if m2m.secondary is None:
+            # foreign key to the resource is in the related table
+            return m2m.left_fk_field == left_ids
+
+        if m2m.right_fk_field is None:
+            return None
+
+        related_column = next(
+            fk.column
+            for fk in m2m.right_fk_field.foreign_keys
+            if fk.column.table is related_table
+        )
+        return related_column.in_(
+            sa.select([m2m.right_fk_field]).where(m2m.left_fk_field == left_ids)
+        )
+
+    def __related_context(self, related_res) -> "ReadContext":
+        return ReadContext(
+            self.session,
+            related_res(),
+            self.uid,
+            include=None,
+            query=None,
+            sort=None,
+            resource_id=None,
+            limit=None,
+            offset=None,
+            fieldsets=self.fieldsets,
+            include_filters=self.include_filters,
+        )
+
+    def __nested_context(self, related_res, related_data: list):
+        """Context of the included records to load the next level from"""
+        ctx = self.__related_context(related_res)
+        id_field = get_id_field(ctx.resource, name_only=True)
+        ctx.obj_ids = [rec[id_field] for rec in related_data]
+        ctx.parent_payload = related_data
+        return ctx
+
+    def read__validator(self) -> Optional[Tuple[Any, int]]:
+        """
+        Max of ``last_modified_column`` and count of the filtered rows,
+        cheap validator of the response for conditional GET.
+        None if the resource has no ``last_modified_column``,
+        the response depends on included or filtered related resources,
+        is read from joined tables (``select_from`` joins which
+        aren't pruned by the fieldset) or there are no rows.
+        """
+        column = self.resource.Meta.last_modified_column
+        model = self.resource.Meta.model
+        if (
+            column is None
+            or self.include
+            or get_relation_paths(self.query)
+            or self.q._having is not None
+            # joined rows change without changing the column
+            or self.q.froms != [getattr(model, "__table__", model)]
+        ):
+            return None
+
+        q = (
+            self.q.limit(None)
+            .offset(None)
+            .order_by(None)
+            .group_by(None)
+            .with_only_columns([sa.func.max(column), sa.func.count()])
+        )
+        last_modified, count = self.execute(q, "validator").first()
+        if not count:
+            return None
+
+        return last_modified, count
+
+    def read__includes(self):
+        """
+        Loads included relations level by level, one query per relation
+        of the include tree. Nested relations (``include=books.tags``)
+        are loaded by ids of the records included at the previous level.
+        """
+        tree = self.check_includes()
+        level = [(self, "", tree)]
+
+        while level:
+            edges = [
+                (ctx, relation, f"{prefix}{relation}", subtree)
+                for ctx, prefix, tree in level
+                for relation, subtree in tree.items()
+            ]
+            results = self.__load_relations(
+                [(ctx, relation, path) for ctx, relation, path, _ in edges]
+            )
+
+            next_level = []
+            for (ctx, _, path, subtree), (related_res, related_data) in zip(
+                edges, results
+            ):
+                self.__add_related_payload(related_res, related_data)
+
+                if subtree and related_data:
+                    next_level.append(
+                        (
+                            ctx.__nested_context(related_res, related_data),
+                            f"{path}.",
+                            subtree,
+                        )
+                    )
+
+            level = next_level
+
+    def __load_relations(self, edges: List[Tuple["ReadContext", str, str]]):
+        """
+        Loads relations of an include tree level, concurrently if
+        the resource has ``concurrent_includes``. Results are in order
+        of ``edges`` anyway, so they are merged the same way.
+        """
+        if len(edges) < 2 or not self.resource.Meta.concurrent_includes:
+            return [
+                ctx.__load_relation(relation, path)
+                for ctx, relation, path in edges
+            ]
+
+        # loaders read the data the request transaction sees
+        snapshot = self.session.execute(
+            sa.text("SELECT pg_export_snapshot()")
+        ).scalar()
+        engine = get_loader_engine(self.session.get_bind().engine)
+        executor = get_include_executor()
+
+        futures = [
+            executor.submit(
+                contextvars.copy_context().run,
+                ctx.__load_relation_in_snapshot,
+                engine,
+                snapshot,
+                relation,
+                path,
             )
-            self.__add_related_payload(related_res, related_data)
+            for ctx, relation, path in edges
+        ]
+        wait(futures)
+
+        return [future.result() for future in futures]
+
+    def __load_relation_in_snapshot(
+        self, engine: Engine, snapshot: str, relation: str, path: str
+    ):
+        """
+        Loads the relation on a connection of the loader engine
+        (see `get_loader_engine`) in a transaction importing the ``snapshot``
+        """
+        with engine.connect() as connection:
+            with connection.begin():
+                connection.execute(
+                    sa.text(
+                        "SET TRANSACTION ISOLATION LEVEL REPEATABLE READ, "
+                        "READ ONLY"
+                    )
+                )
+                connection.execute(
+                    sa.text("SET TRANSACTION SNAPSHOT :snapshot"),
+                    snapshot=snapshot,
+                )
+
+                session = Session(bind=connection)
+                try:
+                    ctx = replace(self, session=session)
+                    return ctx.__load_relation(relation, path)
+                finally:
+                    session.close()
 
     def read__serializing(self) -> dict:
         response = self.resource.Response(self.resource, self.is_list)
         response.set_parent_payload(self.parent_payload)
         response.set_related_payload(self.related_payload)
-        response.set_total(self.total)
+        if self.total_kind:
+            response.set_total(self.total, self.total_kind)
+            response.set_has_more(self.has_more)
+        else:
+            response.include_total = False
+
+        if self.limit and self.sort_keys:
+            response.set_cursors(self.next_cursor, self.prev_cursor)
+
+        capture = get_capture()
+        if capture is not None:
+            response.set_debug({"explain": capture.plans})
+
         serialized_response = response.serialize()
         return serialized_response
 
+    @property
+    def total_strategy(self) -> Optional[Type[BaseTotal]]:
+        if (
+            not self.is_list
+            or self.resource.Meta.disable_total
+            or self.with_total is False
+        ):
+            return None
+
+        return self.resource.Meta.total
+
+    def __page_ids_query(self) -> Optional[Select]:
+        """
+        Query of the page ids for two-phase read,
+        None if the request can't be read in two phases.
+        """
+        meta = self.resource.Meta
+        if not (self.is_list and meta.two_phase_read):
+            return None
+
+        q = self.q
+        if q._limit_clause is None and q._offset_clause is None:
+            return None
+
+        table = getattr(meta.model, "__table__", None)
+        model_id = get_id_field(self.resource, skip_exc=True)
+        if (
+            table is None
+            or model_id is False
+            or q._having is not None
+            or not is_outer_join_of(meta.select_from, table)
+        ):
+            return None
+
+        clauses = list(q._order_by_clause)
+        if q._whereclause is not None:
+            clauses.append(q._whereclause)
+
+        for clause in clauses:
+            if set(find_tables(clause, check_columns=True)) - {table}:
+                return None
+            if is_aggregate(clause):
+                return None
+
+        ids_q = sa.select([model_id.label("id")])
+        if q._whereclause is not None:
+            ids_q = ids_q.where(q._whereclause)
+
+        return (
+            ids_q.order_by(*q._order_by_clause)
+            .limit(q._limit_clause)
+            .offset(q._offset_clause)
+        )
+
+    def __execute_two_phase(self, ids_q: Select, total) -> list:
+        ids_q = total.prepare(self, ids_q) if total else ids_q
+        ids_result = self.execute(ids_q, ("ids", total)).fetchall()
+
+        if total:
+            ids_result = total.process(self, ids_result)
+
+        if not ids_result:
+            return []
+
+        model_id = get_id_field(self.resource)
+        q = self.q.limit(None).offset(None)
+        q = q.where(
+            model_id
+            == sa.any_(
+                sa.bindparam("page_ids", type_=postgresql.ARRAY(model_id.type))
+            )
+        )
+        self.bind_params["page_ids"] = [row["id"] for row in ids_result]
+        result: list = self.execute(q, "page").fetchall()
+        return result
+
+    def execute(self, q: Select, shape: Hashable = None):
+        """
+        Executes a query built from ``self.q`` with the request bind params.
+
+        Queries of a ``shape`` (e.g. ``"validator"``) are built from
+        ``self.q`` by the shape only, the values are bind params. So they
+        are the same statement for requests of the same shape of
+        ``self.q``, it's compiled once (see `QueryCache`).
+        """
+        if (
+            shape is None
+            or self.query_shape is None
+            or self.q is not self.shaped_q
+        ):
+            return self.session.execute(q, self.bind_params)
+
+        q = query_cache.statement(self.query_shape + (shape,), q)
+        connection = self.session.connection(clause=q).execution_options(
+            compiled_cache=query_cache.compiled
+        )
+        return connection.execute(q, self.bind_params)
+
+    def read__execute_stream(self):
+        """
+        Executes the query with a server-side cursor,
+        rows are fetched in chunks by ``stream_rows``.
+        """
+        if self.before:
+            raise BadRequest(
+                details="Streamed read can't be paginated backwards, "
+                "use after cursor"
+            )
+
+        q = self.q.execution_options(stream_results=True)
+        self.stream_result = self.execute(q, "stream")
+
+    def stream_rows(self) -> Iterator[List[dict]]:
+        """
+        Yields serialized rows of the streamed read
+        by ``AWOKADO_STREAM_CHUNK_SIZE``,
+        sets total and cursors after the last one.
+        Ids of the rows are kept only to load includes.
+        """
+        result = self.stream_result
+        if result is None:
+            raise Exception("Streamed query must be executed before reading")
+
+        chunk_size = int(settings.get("AWOKADO_STREAM_CHUNK_SIZE", 1000))
+        id_field = get_id_field(self.resource, name_only=True)
+        rows_count = 0
+        first = last = None
+
+        try:
+            while True:
+                rows = result.fetchmany(chunk_size)
+                if not rows:
+                    break
+
+                serialized_data = self.resource.dump(rows, many=True)
+                if first is None:
+                    first = serialized_data[0]
+                last = serialized_data[-1]
+                rows_count += len(serialized_data)
+                if self.include:
+                    self.obj_ids.extend(_i[id_field] for _i in serialized_data)
+
+                yield serialized_data
+        finally:
+            result.close()
+
+        total = self.total_strategy
+        if total:
+            total.process_streamed(self, rows_count)
+
+        if first is not None and last is not None:
+            self.__set_cursors(first, last, rows_count)
+
     def read__execute_query(self):
-        if not self.resource.Meta.disable_total:
-            self.q.append_column(sa.func.count().over().label("total"))
+        total = self.total_strategy
+        ids_q = self.__page_ids_query()
+
+        if ids_q is not None:
+            result = self.__execute_two_phase(ids_q, total)
+        else:
+            q = total.prepare(self, self.q) if total else self.q
+            result = self.execute(q, ("rows", total)).fetchall()
 
-        result = self.session.execute(self.q).fetchall()
+            if total:
+                result = total.process(self, result)
+
+        if self.before:
+            result.reverse()
 
         serialized_data = self.resource.dump(result, many=True)
 
         id_field = get_id_field(self.resource, name_only=True)
         self.obj_ids.extend([_i[id_field] for _i in serialized_data])
         self.parent_payload = serialized_data
-
-        if serialized_data and not self.resource.Meta.disable_total:
-            self.total = result[0].total
+        if serialized_data:
+            self.__set_cursors(
+                serialized_data[0], serialized_data[-1], len(serialized_data)
+            )
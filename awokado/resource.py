@@ -1,6 +1,7 @@
-import json
 import sys
-from typing import Dict, List, Optional, Tuple, Union, Type
+from contextlib import ExitStack
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional, Tuple, Union, Type
 
 import bulky
 import falcon
@@ -10,6 +11,8 @@ from clavis import Transaction
 from marshmallow import utils, Schema, ValidationError
 from sqlalchemy.orm import Session
 
+from awokado.cache import read_cache
+from awokado.codec import codec
 from awokado.consts import (
     AUDIT_DEBUG,
     BULK_CREATE,
@@ -20,23 +23,33 @@ from awokado.consts import (
     UPDATE,
 )
 from awokado.custom_fields import ToMany, ToOne
-from awokado.db import DATABASE_URL, persistent_engine
+from awokado.db import DATABASE_URL, persistent_engine, replica_router
 from awokado.exceptions import BadRequest, MethodNotAllowed
-from awokado.filter_parser import FilterItem
+from awokado.explain import get_capture
+from awokado.filter_parser import Filter, FilterItem
 from awokado.meta import ResourceMeta
+from awokado.query_stats import track_stage
 from awokado.request import ReadContext
 from awokado.response import Response
+from awokado.serializer import is_mapping_row, RowSerializer
 from awokado.utils import (
+    ClosingStream,
     get_ids_from_payload,
     get_read_params,
     get_id_field,
+    http_last_modified,
+    is_not_modified,
+    is_pinned_to_primary,
+    make_etag,
     M2MMapping,
     AuthBundle,
+    pin_reads_to_primary,
 )
 
 
 class BaseResource(Schema):
     RESOURCES: Dict[str, Type["BaseResource"]] = {}
+    ROW_SERIALIZERS: Dict[Type["BaseResource"], Optional[RowSerializer]] = {}
     Response = Response
     Meta: ResourceMeta
 
@@ -85,7 +98,7 @@ class BaseResource(Schema):
 
     def validate_create_request(self, req: falcon.Request, is_bulk=False):
         methods = self.Meta.methods
-        payload = json.load(req.bounded_stream)
+        payload = codec.load(req.bounded_stream)
 
         if isinstance(payload.get(self.Meta.name), list):
             request_method = BULK_CREATE
@@ -118,7 +131,7 @@ class BaseResource(Schema):
         if UPDATE not in methods and BULK_UPDATE not in methods:
             raise MethodNotAllowed()
 
-        payload = json.load(req.bounded_stream)
+        payload = codec.load(req.bounded_stream)
         data = payload.get(self.Meta.name)
         try:
             deserialized = self.load(data, partial=True, many=True)
@@ -127,6 +140,36 @@ class BaseResource(Schema):
 
         req.stream = {self.Meta.name: deserialized}
 
+    def dump(self, obj, *, many: Optional[bool] = None):
+        """
+        Rows of read queries are serialized by
+        `RowSerializer <#awokado.serializer.RowSerializer>`_
+        compiled from resource fields, other objects by marshmallow.
+        """
+        many = self.many if many is None else bool(many)
+        rows = obj if many else [obj]
+        serializer = self.row_serializer
+
+        if (
+            serializer is None
+            or self.only
+            or self.exclude
+            or not isinstance(rows, (list, tuple))
+            or not all(is_mapping_row(row) for row in rows)
+        ):
+            return super().dump(obj, many=many)
+
+        result = serializer.dump(rows)
+        return result if many else result[0]
+
+    @property
+    def row_serializer(self) -> Optional[RowSerializer]:
+        cls = self.__class__
+        if cls not in self.ROW_SERIALIZERS:
+            self.ROW_SERIALIZERS[cls] = RowSerializer.compile(self)
+
+        return self.ROW_SERIALIZERS[cls]
+
     ###########################################################################
     # Falcon methods
     ###########################################################################
@@ -144,7 +187,8 @@ class BaseResource(Schema):
         """
         with Transaction(DATABASE_URL, engine=persistent_engine) as t:
             session = t.session
-            user_id, _ = self.auth(session, req, resp)
+            with track_stage("auth", self.Meta.name):
+                user_id, _ = self.auth(session, req, resp)
 
             self.validate_update_request(req)
 
@@ -161,9 +205,13 @@ class BaseResource(Schema):
                 f"Update: {self.Meta.name}", payload, user_id, AUDIT_DEBUG
             )
 
-            result = self.update(session, payload, user_id)
+            with track_stage("update", self.Meta.name):
+                result = self.update(session, payload, user_id)
 
-        resp.body = json.dumps(result, default=str)
+        read_cache.invalidate_resource(self)
+        if replica_router.replicas:
+            pin_reads_to_primary(req, resp)
+        resp.data = codec.dumps(result)
 
     def on_post(self, req: falcon.Request, resp: falcon.Response):
         """
@@ -176,7 +224,8 @@ class BaseResource(Schema):
         """
         with Transaction(DATABASE_URL, engine=persistent_engine) as t:
             session = t.session
-            user_id, token = self.auth(session, req, resp)
+            with track_stage("auth", self.Meta.name):
+                user_id, token = self.auth(session, req, resp)
 
             self.validate_create_request(req)
 
@@ -191,9 +240,13 @@ class BaseResource(Schema):
                 f"Create: {self.Meta.name}", payload, user_id, AUDIT_DEBUG
             )
 
-            result = self.create(session, payload, user_id)
+            with track_stage("create", self.Meta.name):
+                result = self.create(session, payload, user_id)
 
-        resp.body = json.dumps(result, default=str)
+        read_cache.invalidate_resource(self)
+        if replica_router.replicas:
+            pin_reads_to_primary(req, resp)
+        resp.data = codec.dumps(result)
 
     def on_get(
         self,
@@ -204,21 +257,101 @@ class BaseResource(Schema):
         """
         Falcon method. GET-request entry point.
 
-        Here is a database transaction opening.
+        Here is a database transaction opening,
+        on a replica if there are ones (see ``DATABASE_REPLICA_URLS``).
         This is where authentication takes place
         (if auth class is pointed in `resource <#awokado.meta.ResourceMeta>`_)
         Then read_handler method is run.
         It's responsible for the whole read workflow.
+        List requests with ``stream=true`` are read by read_stream_handler.
         """
-        with Transaction(DATABASE_URL, engine=persistent_engine) as t:
+        # reads go to replicas, if there are ones in sync
+        url, engine = replica_router.choose(is_pinned_to_primary(req))
+
+        with ExitStack() as stack:
+            t = stack.enter_context(Transaction(url, engine=engine))
             session = t.session
-            user_id, token = self.auth(session, req, resp)
+            with track_stage("auth", self.Meta.name):
+                user_id, token = self.auth(session, req, resp)
             params = get_read_params(req, self.__class__)
+            stream = params.pop("stream")
+
+            if stream and resource_id is None:
+                # the transaction is closed when the stream is read
+                resp.stream = ClosingStream(
+                    self.read_stream_handler(session, user_id, **params),
+                    stack.pop_all(),
+                )
+                return
+
             params["resource_id"] = resource_id
 
-            result = self.read_handler(session, user_id, **params)
+            if self.Meta.conditional_get:
+                validator = self.read_validator_handler(
+                    session, user_id, **params
+                )
+                if validator is not None:
+                    last_modified, count = validator
+                    # the count is in the ETag only, If-Modified-Since
+                    # can't tell rows deleted from or leaving a list
+                    object_modified = (
+                        None if resource_id is None else last_modified
+                    )
+                    etag = make_etag(
+                        self.Meta.name,
+                        resource_id,
+                        req.query_string,
+                        user_id,
+                        last_modified,
+                        count,
+                        weak=True,
+                    )
+                    if self._set_validators(req, resp, etag, object_modified):
+                        return
+
+            cache_key = None
+            data = None
+            # plans are captured only when the response is read
+            if self.Meta.cache_ttl is not None and get_capture() is None:
+                cache_key = read_cache.make_key(self, req, user_id, resource_id)
+                data = read_cache.get(cache_key)
+
+            if data is None:
+                result = self.read_handler(session, user_id, **params)
+                data = codec.dumps(result)
 
-        resp.body = json.dumps(result, default=str)
+                # replicas may lag behind writes which bumped
+                # table versions already, only primary reads are cached
+                if cache_key is not None and url == replica_router.primary[0]:
+                    read_cache.set(cache_key, data, self.Meta.cache_ttl)
+
+        if self.Meta.conditional_get and resp.etag is None:
+            if self._set_validators(req, resp, make_etag(data)):
+                return
+
+        resp.data = data
+
+    @staticmethod
+    def _set_validators(
+        req: falcon.Request,
+        resp: falcon.Response,
+        etag: str,
+        last_modified: Optional[datetime] = None,
+    ) -> bool:
+        """
+        Sets ETag and Last-Modified headers,
+        responds with 304 Not Modified if the request has matching ones
+        """
+        resp.etag = etag
+        last_modified = http_last_modified(last_modified)
+        if last_modified is not None:
+            resp.last_modified = last_modified
+
+        if is_not_modified(req, etag, last_modified):
+            resp.status = falcon.HTTP_NOT_MODIFIED
+            return True
+
+        return False
 
     def on_delete(
         self,
@@ -237,7 +370,8 @@ class BaseResource(Schema):
 
         with Transaction(DATABASE_URL, engine=persistent_engine) as t:
             session = t.session
-            user_id, token = self.auth(session, req, resp)
+            with track_stage("auth", self.Meta.name):
+                user_id, token = self.auth(session, req, resp)
 
             if DELETE not in self.Meta.methods:
                 raise MethodNotAllowed()
@@ -259,9 +393,13 @@ class BaseResource(Schema):
             if self.Meta.auth:
                 self.Meta.auth.can_delete(session, user_id, ids_to_delete)
 
-            result = self.delete(session, user_id, ids_to_delete)
+            with track_stage("delete", self.Meta.name):
+                result = self.delete(session, user_id, ids_to_delete)
 
-        resp.body = json.dumps(result, default=str)
+        read_cache.invalidate_resource(self)
+        if replica_router.replicas:
+            pin_reads_to_primary(req, resp)
+        resp.data = codec.dumps(result)
 
     def auth(self, *args, **kwargs) -> AuthBundle:
         """This method should return (user_id, token) tuple"""
@@ -331,7 +469,8 @@ class BaseResource(Schema):
         data = payload[self.Meta.name]
 
         if isinstance(data, list):
-            return self.bulk_create(session, user_id, data)
+            with track_stage("bulk_create", self.Meta.name):
+                return self.bulk_create(session, user_id, data)
 
         data_to_insert = self._to_create(data)
 
@@ -421,11 +560,15 @@ class BaseResource(Schema):
         session: Session,
         user_id: int,
         include: list = None,
-        filters: Optional[List[FilterItem]] = None,
+        filters: Optional[List[Filter]] = None,
         sort: list = None,
         resource_id: int = None,
         limit: int = None,
         offset: int = None,
+        after: str = None,
+        before: str = None,
+        with_total: bool = None,
+        fieldsets: Optional[Dict[str, List[str]]] = None,
     ) -> dict:
 
         ctx = ReadContext(
@@ -438,24 +581,178 @@ class BaseResource(Schema):
             resource_id,
             limit,
             offset,
+            after,
+            before,
+            with_total,
+            fieldsets,
         )
 
-        self.read__query(ctx)
-        self.read__filtering(ctx)
-        self.read__sorting(ctx)
+        with track_stage("read__query", self.Meta.name):
+            self.read__query(ctx)
+        with track_stage("read__filtering", self.Meta.name):
+            self.read__filtering(ctx)
+        with track_stage("read__sorting", self.Meta.name):
+            self.read__sorting(ctx)
 
-        self.read__pagination(ctx)
-        self.read__execute_query(ctx)
+        with track_stage("read__pagination", self.Meta.name):
+            self.read__pagination(ctx)
+        with track_stage("read__execute_query", self.Meta.name):
+            self.read__execute_query(ctx)
 
         if not ctx.obj_ids:
-            if ctx.is_list:
-                response = self.Response(self, is_list=ctx.is_list)
-                return response.serialize()
-            else:
+            if not ctx.is_list:
                 raise BadRequest("Object Not Found")
+        else:
+            with track_stage("read__includes", self.Meta.name):
+                self.read__includes(ctx)
 
-        self.read__includes(ctx)
-        return self.read__serializing(ctx)
+        with track_stage("read__serializing", self.Meta.name):
+            return self.read__serializing(ctx)
+
+    def read_validator_handler(
+        self,
+        session: Session,
+        user_id: int,
+        include: list = None,
+        filters: Optional[List[Filter]] = None,
+        sort: list = None,
+        resource_id: int = None,
+        limit: int = None,
+        offset: int = None,
+        after: str = None,
+        before: str = None,
+        with_total: bool = None,
+        fieldsets: Optional[Dict[str, List[str]]] = None,
+    ) -> Optional[Tuple[Any, int]]:
+        """
+        Validator of the read response for conditional GET
+        (see `ReadContext.read__validator`), computed without
+        reading the response itself
+        """
+        ctx = ReadContext(
+            session,
+            self,
+            user_id,
+            include,
+            filters,
+            sort,
+            resource_id,
+            limit,
+            offset,
+            after,
+            before,
+            with_total,
+            fieldsets,
+        )
+
+        with track_stage("read__query", self.Meta.name):
+            self.read__query(ctx)
+        with track_stage("read__filtering", self.Meta.name):
+            self.read__filtering(ctx)
+
+        with track_stage("read__validator", self.Meta.name):
+            return self.read__validator(ctx)
+
+    def read_stream_handler(
+        self,
+        session: Session,
+        user_id: int,
+        include: list = None,
+        filters: Optional[List[Filter]] = None,
+        sort: list = None,
+        limit: int = None,
+        offset: int = None,
+        after: str = None,
+        before: str = None,
+        with_total: bool = None,
+        fieldsets: Optional[Dict[str, List[str]]] = None,
+    ) -> Iterator[bytes]:
+        """
+        Streaming version of read_handler for list requests.
+
+        The query is executed with a server-side cursor, rows are serialized
+        and written by chunks, so memory doesn't depend on rows amount.
+        The response has the same structure as read_handler one,
+        includes and meta are written after the rows.
+
+        Errors can't be responded once the rows are written, so includes
+        are validated in advance. Statements executed while the response
+        is written (includes, total) are out of the request query stats.
+        """
+        ctx = ReadContext(
+            session,
+            self,
+            user_id,
+            include,
+            filters,
+            sort,
+            None,
+            limit,
+            offset,
+            after,
+            before,
+            with_total,
+            fieldsets,
+        )
+
+        with track_stage("read__query", self.Meta.name):
+            self.read__query(ctx)
+        with track_stage("read__filtering", self.Meta.name):
+            self.read__filtering(ctx)
+        with track_stage("read__sorting", self.Meta.name):
+            self.read__sorting(ctx)
+
+        with track_stage("read__pagination", self.Meta.name):
+            self.read__pagination(ctx)
+
+        ctx.check_includes()
+
+        with track_stage("read__execute_stream", self.Meta.name):
+            self.read__execute_stream(ctx)
+
+        return self._write_stream(ctx)
+
+    def _write_stream(self, ctx: ReadContext) -> Iterator[bytes]:
+        dumps = codec.dumps
+
+        yield b"{%s:{%s:[" % (
+            dumps(self.Response.PAYLOAD_KEYWORD),
+            dumps(self.Meta.name),
+        )
+
+        separator = b""
+        for serialized_data in ctx.stream_rows():
+            # strip brackets of the chunk array
+            yield separator + dumps(serialized_data)[1:-1]
+            separator = b","
+
+        if ctx.obj_ids:
+            with track_stage("read__includes", self.Meta.name):
+                self.read__includes(ctx)
+
+        # included records of this resource go after the streamed ones
+        related_data = ctx.related_payload.pop(self.Meta.name, None)
+        if related_data:
+            id_field = get_id_field(self, name_only=True)
+            page_ids = set(ctx.obj_ids)
+            related_data = [
+                rec for rec in related_data if rec[id_field] not in page_ids
+            ]
+            if related_data:
+                yield separator + dumps(related_data)[1:-1]
+
+        yield b"]"
+
+        for name, related_data in ctx.related_payload.items():
+            yield b",%s:%s" % (dumps(name), dumps(related_data))
+
+        ctx.related_payload = {}
+        with track_stage("read__serializing", self.Meta.name):
+            response = self.read__serializing(ctx)
+
+        meta = response.get(self.Response.META_KEYWORD)
+
+        yield b"},%s:%s}" % (dumps(self.Response.META_KEYWORD), dumps(meta))
 
     def read__query(self, ctx: ReadContext):
         return ctx.read__query()
@@ -472,6 +769,12 @@ class BaseResource(Schema):
     def read__execute_query(self, ctx: ReadContext):
         return ctx.read__execute_query()
 
+    def read__execute_stream(self, ctx: ReadContext):
+        return ctx.read__execute_stream()
+
+    def read__validator(self, ctx: ReadContext) -> Optional[Tuple[Any, int]]:
+        return ctx.read__validator()
+
     def read__includes(self, ctx: ReadContext):
         return ctx.read__includes()
 
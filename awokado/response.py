@@ -1,5 +1,7 @@
 from typing import Dict, Optional, List
 
+from awokado.utils import get_id_field
+
 if False:
     from awokado.resource import BaseResource
 
@@ -29,10 +31,36 @@ class Response:
             ]
           },
           "meta": {
-            "total": 1
+            "total": 1,
+            "total_kind": "exact"
+          }
+        }
+
+    In ``AWOKADO_DEBUG`` mode requests with ``explain`` param get
+    plans of the executed statements in ``meta`` (single object
+    responses too)::
+
+        "meta": {
+          "total": 1,
+          "debug": {
+            "explain": [{"statement": "SELECT ...", "plan": [...]}]
           }
         }
 
+    ``total_kind`` tells how the total was counted
+    (see `total strategies <#awokado.total.BaseTotal>`_):
+    ``exact``, ``estimated``, ``capped`` (there are at least ``total`` objects)
+    or ``has_more`` (no total, ``has_more`` flag instead).
+
+    List requests with ``limit`` also get cursors of the neighbour pages
+    in ``meta`` (``"next"`` for ``?after=``, ``"prev"`` for ``?before=``)::
+
+        "meta": {
+          "total": 40,
+          "next": "eyJzIjpbInRpdGxlIiwiaWQiXSwidiI6WyJNeSBCb29rIiwxXX0.c2ln",
+          "prev": null
+        }
+
     Default serialization for single object (``/v1/book/123``)::
 
         {
@@ -49,6 +77,11 @@ class Response:
     PAYLOAD_KEYWORD = "payload"
     META_KEYWORD = "meta"
     TOTAL_KEYWORD = "total"
+    TOTAL_KIND_KEYWORD = "total_kind"
+    HAS_MORE_KEYWORD = "has_more"
+    NEXT_KEYWORD = "next"
+    PREV_KEYWORD = "prev"
+    DEBUG_KEYWORD = "debug"
 
     def __init__(self, resource: "BaseResource", is_list: bool = False):
         self.is_list = is_list
@@ -57,20 +90,43 @@ class Response:
         self.payload: Dict = {}
         self.related_payload: Optional[Dict] = None
         self.include_total = False
-        self.total = 0
+        self.total: Optional[int] = 0
+        self.total_kind: Optional[str] = None
+        self.has_more: Optional[bool] = None
+        self.cursors: Optional[Dict] = None
+        self.debug: Optional[Dict] = None
 
         if resource:
             self.include_total = not resource.Meta.disable_total
 
     def serialize(self) -> dict:
         if self.related_payload and self.payload:
-            self.payload.update(self.related_payload)
+            for name, related_data in self.related_payload.items():
+                if name in self.payload:
+                    self._merge_payload(name, related_data)
+                else:
+                    self.payload[name] = related_data
 
         if self.is_list:
             return self._serialize_list()
         else:
             return self._serialize_single()
 
+    def _merge_payload(self, name: str, related_data: List) -> None:
+        """
+        Appends included records of the requested resource
+        (e.g. ``/v1/book/?include=author.books``) to its payload,
+        skipping records which are there already
+        """
+        id_field = get_id_field(self.resource, name_only=True)
+        records = self.payload[name]
+        ids = {rec.get(id_field) for rec in records}
+
+        for rec in related_data:
+            if rec.get(id_field) not in ids:
+                ids.add(rec.get(id_field))
+                records.append(rec)
+
     def set_parent_payload(self, parent_payload: Optional[List] = None) -> None:
         if not parent_payload:
             parent_payload = []
@@ -81,14 +137,34 @@ class Response:
     def set_related_payload(self, related_payload: Optional[Dict]) -> None:
         self.related_payload = related_payload
 
-    def set_total(self, total_objects_count: int):
+    def set_total(
+        self, total_objects_count: Optional[int], kind: Optional[str] = None
+    ):
         self.total = total_objects_count
+        self.total_kind = kind
+
+    def set_has_more(self, has_more: Optional[bool]) -> None:
+        self.has_more = has_more
+
+    def set_cursors(
+        self, next_cursor: Optional[str], prev_cursor: Optional[str]
+    ) -> None:
+        self.cursors = {
+            self.NEXT_KEYWORD: next_cursor,
+            self.PREV_KEYWORD: prev_cursor,
+        }
+
+    def set_debug(self, debug: Optional[Dict]) -> None:
+        self.debug = debug
 
     def _serialize_single(self) -> dict:
         if not self.payload:
             self.set_parent_payload()
 
         response: Dict = self.payload
+        if self.debug is not None:
+            response[self.META_KEYWORD] = {self.DEBUG_KEYWORD: self.debug}
+
         return response
 
     def _serialize_list(self) -> dict:
@@ -97,9 +173,22 @@ class Response:
 
         response = {self.PAYLOAD_KEYWORD: self.payload}
 
+        meta: Optional[Dict] = None
         if self.include_total:
-            response[self.META_KEYWORD] = {self.TOTAL_KEYWORD: self.total}
-        else:
-            response[self.META_KEYWORD] = None  # type: ignore
+            meta = {}
+            if self.total is not None:
+                meta[self.TOTAL_KEYWORD] = self.total
+            if self.total_kind:
+                meta[self.TOTAL_KIND_KEYWORD] = self.total_kind
+            if self.has_more is not None:
+                meta[self.HAS_MORE_KEYWORD] = self.has_more
+
+        if self.cursors is not None:
+            meta = {**(meta or {}), **self.cursors}
+
+        if self.debug is not None:
+            meta = {**(meta or {}), self.DEBUG_KEYWORD: self.debug}
+
+        response[self.META_KEYWORD] = meta  # type: ignore
 
         return response
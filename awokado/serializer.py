@@ -0,0 +1,199 @@
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from marshmallow import fields, missing, Schema, utils
+from marshmallow.decorators import POST_DUMP, PRE_DUMP
+
+# (row key, response key, converter, marshmallow field for fallback)
+PlanItem = Tuple[str, str, Optional[Callable], Optional[fields.Field]]
+
+# methods a field must inherit unchanged to be serialized without marshmallow
+FIELD_METHODS = ("serialize", "_serialize", "get_value", "_format_num")
+SCHEMA_METHODS = ("_serialize", "get_attribute")
+
+
+def _number_converter(field: fields.Number) -> Callable:
+    num_type = field.num_type
+    if field.as_string:
+        return lambda value: str(num_type(value))
+    return num_type
+
+
+def _string_converter(field: fields.String) -> Callable:
+    return utils.ensure_text_type
+
+
+def _boolean_converter(field: fields.Boolean) -> Callable:
+    truthy, falsy = field.truthy, field.falsy
+
+    def convert(value):
+        try:
+            if value in truthy:
+                return True
+            if value in falsy:
+                return False
+        except TypeError:
+            pass
+        return bool(value)
+
+    return convert
+
+
+def _datetime_converter(field: fields.DateTime) -> Callable:
+    data_format = field.format or field.DEFAULT_FORMAT
+    format_func = field.SERIALIZATION_FUNCS.get(data_format)
+    if format_func:
+        return format_func
+    return lambda value: value.strftime(data_format)
+
+
+def _raw_converter(field: fields.Raw) -> Callable:
+    return lambda value: value
+
+
+def _list_converter(field: fields.List) -> Optional[Callable]:
+    inner = get_converter(field.inner)
+    if inner is None:
+        return None
+
+    return lambda value: [
+        item if item is None else inner(item) for item in value
+    ]
+
+
+CONVERTERS: Dict[type, Callable[[Any], Optional[Callable]]] = {
+    fields.Integer: _number_converter,
+    fields.Float: _number_converter,
+    fields.String: _string_converter,
+    fields.Boolean: _boolean_converter,
+    fields.Date: _datetime_converter,
+    fields.Time: _datetime_converter,
+    fields.DateTime: _datetime_converter,
+    fields.List: _list_converter,
+    fields.Raw: _raw_converter,
+}
+
+
+def get_converter(field: fields.Field) -> Optional[Callable]:
+    """
+    Function doing the same as marshmallow serialization of a field
+    for not None values, None if the field has custom serialization.
+    """
+    field_cls = type(field)
+
+    for base in field_cls.__mro__:
+        if base not in CONVERTERS:
+            continue
+
+        for method in FIELD_METHODS:
+            if getattr(field_cls, method, None) is not getattr(
+                base, method, None
+            ):
+                return None
+
+        return CONVERTERS[base](field)
+
+    return None
+
+
+def _has_dump_hooks(schema: Schema) -> bool:
+    for tag, hooks in schema._hooks.items():
+        # hooks are keyed by (tag, pass_many) in older marshmallow versions
+        tag = tag[0] if isinstance(tag, tuple) else tag
+        if hooks and tag in (PRE_DUMP, POST_DUMP):
+            return True
+
+    return False
+
+
+class RowSerializer:
+    """
+    Serializer of mapping rows (e.g. result rows of read queries)
+    compiled from schema fields.
+
+    Gives the same result as ``Schema.dump``, fields with custom
+    serialization, missing keys and dotted attributes are serialized
+    by marshmallow.
+    """
+
+    def __init__(self, schema: Schema):
+        self.schema = schema
+        self.dict_class = schema.dict_class
+        self.fields: List[
+            Tuple[str, str, str, Optional[Callable], fields.Field]
+        ] = []
+        self.plans: Dict[Tuple, List[PlanItem]] = {}
+
+        for attr_name, field in schema.dump_fields.items():
+            key = field.attribute if field.attribute is not None else attr_name
+            data_key = (
+                field.data_key if field.data_key is not None else attr_name
+            )
+            converter = get_converter(field) if field._CHECK_ATTRIBUTE else None
+            self.fields.append((attr_name, key, data_key, converter, field))
+
+    @classmethod
+    def compile(cls, schema: Schema) -> Optional["RowSerializer"]:
+        """RowSerializer of the schema, None if it can't be compiled"""
+        schema_cls = type(schema)
+        for method in SCHEMA_METHODS:
+            if getattr(schema_cls, method) is not getattr(Schema, method):
+                return None
+
+        if _has_dump_hooks(schema):
+            return None
+
+        return cls(schema)
+
+    def get_plan(self, keys: Sequence[str]) -> List[PlanItem]:
+        keys = tuple(keys)
+        plan = self.plans.get(keys)
+
+        if plan is None:
+            plan = []
+            for attr_name, key, data_key, converter, field in self.fields:
+                if converter is None or key not in keys or "." in key:
+                    plan.append((attr_name, data_key, None, field))
+                else:
+                    plan.append((key, data_key, converter, None))
+
+            self.plans[keys] = plan
+
+        return plan
+
+    def dump_row(self, row, plan: List[PlanItem]) -> dict:
+        result = self.dict_class()
+
+        for key, data_key, converter, field in plan:
+            if field is not None:
+                value = field.serialize(
+                    key, row, accessor=self.schema.get_attribute
+                )
+                if value is missing:
+                    continue
+            else:
+                value = row[key]
+                if value is not None and converter is not None:
+                    value = converter(value)
+
+            result[data_key] = value
+
+        return result
+
+    def dump(self, rows) -> List[dict]:
+        result = []
+        plan: List[PlanItem] = []
+        last_keys = None
+
+        for row in rows:
+            keys = row.keys()
+            if keys is not last_keys:
+                plan = self.get_plan(keys)
+                last_keys = keys
+
+            result.append(self.dump_row(row, plan))
+
+        return result
+
+
+def is_mapping_row(row) -> bool:
+    return hasattr(row, "keys") and hasattr(row, "__getitem__")
@@ -0,0 +1,243 @@
+from typing import List, Optional
+
+import sqlalchemy as sa
+from sqlalchemy.sql.selectable import Select
+
+from awokado.consts import (
+    TOTAL_KIND_CAPPED,
+    TOTAL_KIND_ESTIMATED,
+    TOTAL_KIND_EXACT,
+    TOTAL_KIND_HAS_MORE,
+)
+from awokado.explain import get_plan
+from awokado.utils import get_id_field
+
+if False:
+    from awokado.request import ReadContext
+
+
+class BaseTotal:
+    """
+    Strategy of counting objects matched by a list read request.
+
+    Set it in `resource <#awokado.meta.ResourceMeta>`_ ``total`` param::
+
+        class CappedBookTotal(CappedTotal):
+            CAP = 5000
+
+        class BookResource(BaseResource):
+            Meta = ResourceMeta(..., total=CappedBookTotal)
+
+    ``prepare`` gets the paginated query before execution,
+    ``process`` gets fetched rows and sets
+    ``ctx.total``, ``ctx.total_kind`` and ``ctx.has_more``.
+    Prepared queries are compiled once per shape of the request
+    (see ``ReadContext.execute``), values which differ between requests
+    must be bind params of ``ctx.bind_params``.
+    """
+
+    KIND: Optional[str] = None
+
+    @classmethod
+    def prepare(cls, ctx: "ReadContext", q: Select) -> Select:
+        return q
+
+    @classmethod
+    def process(cls, ctx: "ReadContext", result: List) -> List:
+        ctx.total = cls.count(ctx, result)
+        ctx.total_kind = cls.KIND
+        return result
+
+    @classmethod
+    def process_streamed(cls, ctx: "ReadContext", rows_count: int) -> None:
+        """
+        Sets the total of a streamed read,
+        its rows aren't kept, only their amount is known.
+        """
+        ctx.total = rows_count + (ctx.offset or 0)
+        ctx.total_kind = TOTAL_KIND_EXACT
+
+        if not cls.is_last_page(ctx, rows_count):
+            ctx.total = cls.execute_count(ctx, cls.count_query(ctx))
+
+    @classmethod
+    def count(cls, ctx: "ReadContext", result: List) -> Optional[int]:
+        raise NotImplementedError()
+
+    @staticmethod
+    def is_last_page(ctx: "ReadContext", rows_count: int) -> bool:
+        """
+        If a page isn't full, the total is known without counting.
+        """
+        if ctx.after or ctx.before:
+            return False
+
+        return bool(rows_count or not ctx.offset) and (
+            not ctx.limit or rows_count < ctx.limit
+        )
+
+    @staticmethod
+    def count_query(ctx: "ReadContext") -> Select:
+        total_q = ctx.total_q if ctx.total_q is not None else ctx.q
+        total_q = total_q.limit(None).offset(None).order_by(None)
+
+        model_id = get_id_field(ctx.resource, skip_exc=True)
+        if model_id is not None and model_id is not False:
+            # there is no need to compute aggregated columns for counting
+            total_q = total_q.with_only_columns([model_id])
+
+        return total_q
+
+    @classmethod
+    def execute_count(cls, ctx: "ReadContext", q: Select) -> int:
+        q = sa.select([sa.func.count()]).select_from(q.alias("total_q"))
+        return int(ctx.execute(q).scalar())
+
+
+class WindowTotal(BaseTotal):
+    """
+    Counts objects with ``count(*) over()`` in the page query itself.
+    No extra round-trip, but the whole filtered result has to be
+    materialized before LIMIT is applied.
+    """
+
+    KIND = TOTAL_KIND_EXACT
+
+    @classmethod
+    def prepare(cls, ctx: "ReadContext", q: Select) -> Select:
+        if ctx.after or ctx.before:
+            return q
+
+        return q.column(sa.func.count().over().label("total"))
+
+    @classmethod
+    def count(cls, ctx: "ReadContext", result: List) -> Optional[int]:
+        if result and not (ctx.after or ctx.before):
+            return int(result[0]["total"])
+
+        if cls.is_last_page(ctx, len(result)):
+            return len(result) + (ctx.offset or 0)
+
+        return cls.execute_count(ctx, cls.count_query(ctx))
+
+
+class ExactTotal(BaseTotal):
+    """
+    Counts objects with a separate ``SELECT count(*)`` query,
+    which is skipped when the page shows the total by itself.
+    """
+
+    KIND = TOTAL_KIND_EXACT
+
+    @classmethod
+    def count(cls, ctx: "ReadContext", result: List) -> Optional[int]:
+        if cls.is_last_page(ctx, len(result)):
+            return len(result) + (ctx.offset or 0)
+
+        return cls.execute_count(ctx, cls.count_query(ctx))
+
+
+class EstimatedTotal(BaseTotal):
+    """
+    Takes the number of rows the PostgreSQL planner expects:
+    ``pg_class.reltuples`` for unfiltered reads of a plain table,
+    ``EXPLAIN`` of the filtered query otherwise.
+    """
+
+    KIND = TOTAL_KIND_ESTIMATED
+
+    @classmethod
+    def process(cls, ctx: "ReadContext", result: List) -> List:
+        cls.process_streamed(ctx, len(result))
+        return result
+
+    @classmethod
+    def process_streamed(cls, ctx: "ReadContext", rows_count: int) -> None:
+        if cls.is_last_page(ctx, rows_count):
+            ctx.total = rows_count + (ctx.offset or 0)
+            ctx.total_kind = TOTAL_KIND_EXACT
+        else:
+            ctx.total = cls.count(ctx, [])
+            ctx.total_kind = cls.KIND
+
+    @classmethod
+    def count(cls, ctx: "ReadContext", result: List) -> Optional[int]:
+        q = cls.count_query(ctx)
+        model = ctx.resource.Meta.model
+        table = getattr(model, "__table__", None)
+
+        if table is not None and q.froms == [table] and q._whereclause is None:
+            reltuples = ctx.session.execute(
+                sa.text(
+                    "SELECT reltuples FROM pg_class "
+                    "WHERE oid = CAST(:table_name AS regclass)"
+                ),
+                {"table_name": table.fullname},
+            ).scalar()
+
+            if reltuples and reltuples > 0:
+                return int(reltuples)
+
+        plan = get_plan(ctx.session, q, params=ctx.bind_params)
+        return int(plan[0]["Plan"]["Plan Rows"])
+
+
+class CappedTotal(BaseTotal):
+    """
+    Counts objects up to ``CAP``, beyond it reports
+    the ``CAP`` value as "at least" total.
+    """
+
+    KIND = TOTAL_KIND_CAPPED
+    CAP = 1000
+
+    @classmethod
+    def process(cls, ctx: "ReadContext", result: List) -> List:
+        cls.process_streamed(ctx, len(result))
+        return result
+
+    @classmethod
+    def process_streamed(cls, ctx: "ReadContext", rows_count: int) -> None:
+        if cls.is_last_page(ctx, rows_count):
+            total = rows_count + (ctx.offset or 0)
+        else:
+            total = cls.execute_count(
+                ctx, cls.count_query(ctx).limit(cls.CAP + 1)
+            )
+
+        ctx.total = min(total, cls.CAP)
+        ctx.total_kind = cls.KIND if total > cls.CAP else TOTAL_KIND_EXACT
+
+
+class HasMoreTotal(BaseTotal):
+    """
+    Doesn't count objects, fetches one extra row
+    to tell whether there is a next page.
+    """
+
+    KIND = TOTAL_KIND_HAS_MORE
+
+    @classmethod
+    def prepare(cls, ctx: "ReadContext", q: Select) -> Select:
+        if ctx.limit:
+            q = q.limit(sa.bindparam("limit", type_=sa.Integer) + 1)
+
+        return q
+
+    @classmethod
+    def process(cls, ctx: "ReadContext", result: List) -> List:
+        limit = ctx.limit or 0
+        ctx.has_more = bool(limit) and len(result) > limit
+        ctx.total = None
+        ctx.total_kind = cls.KIND
+        return result[:limit] if ctx.has_more else result
+
+    @classmethod
+    def process_streamed(cls, ctx: "ReadContext", rows_count: int) -> None:
+        ctx.has_more = False
+        if ctx.limit and rows_count >= ctx.limit:
+            next_q = ctx.q.offset((ctx.offset or 0) + ctx.limit).limit(1)
+            ctx.has_more = ctx.execute(next_q).first() is not None
+
+        ctx.total = None
+        ctx.total_kind = cls.KIND
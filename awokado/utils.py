@@ -1,20 +1,40 @@
-import json
+import hashlib
 import logging
+import math
 import random
+import re
 import string
 import sys
+import time
 import traceback
+from contextlib import ExitStack
 from dataclasses import dataclass
-from json import JSONDecodeError
-from typing import List, Dict, Any, Type, Tuple, Callable, Optional
+from datetime import datetime, timezone
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+    Type,
+)
 
 import falcon
 from dynaconf import settings
 from sqlalchemy import desc, asc
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.orm.attributes import InstrumentedAttribute
+from sqlalchemy.sql import Join
+from sqlalchemy.sql.util import find_tables
 
+from awokado.codec import codec
 from awokado.consts import DEFAULT_ACCESS_CONTROL_HEADERS
 from awokado.exceptions import BaseApiException, IdFieldMissingError, BadRequest
 from awokado.filter_parser import FilterItem
+from awokado.pagination import is_nullable
 import sqlalchemy as sa
 
 if False:
@@ -22,6 +42,11 @@ if False:
 
 log = logging.getLogger("awokado")
 
+FIELDSET_PARAM_RE = re.compile(r"^fields\[(\w+)\]$")
+
+PRIMARY_UNTIL_COOKIE = "awokado_primary_until"
+PRIMARY_UNTIL_HEADER = "X-Primary-Until"
+
 
 @dataclass
 class AuthBundle:
@@ -41,21 +66,74 @@ class M2MMapping:
     secondary: Optional[sa.Table] = None
 
 
+class ClosingStream:
+    """
+    Response stream which exits ``stack`` (e.g. closes the transaction
+    the stream is read in) when it's exhausted, fails or is closed
+    by WSGI server.
+    """
+
+    def __init__(self, iterable: Iterable[bytes], stack: ExitStack):
+        self.iterator = iter(iterable)
+        self.stack = stack
+
+    def __iter__(self) -> Iterator[bytes]:
+        return self
+
+    def __next__(self) -> bytes:
+        try:
+            return next(self.iterator)
+        except StopIteration:
+            self.stack.close()
+            raise
+        except BaseException:
+            if not self.stack.__exit__(*sys.exc_info()):
+                raise
+
+            raise StopIteration
+
+    def close(self):
+        close = getattr(self.iterator, "close", None)
+        try:
+            if close is not None:
+                close()
+        finally:
+            self.stack.close()
+
+
 def rand_string(size=8, chars=string.ascii_uppercase + string.digits):
     return "".join(random.choice(chars) for _ in range(size))
 
 
-def get_sort_way(sort_route: str) -> Tuple[str, Callable]:
+def get_sort_way(
+    sort_route: str, select_from: Any = None
+) -> Tuple[str, Callable]:
+    """
+    Field name and ordering function of a sort param: ascending
+    NULLS FIRST or descending NULLS LAST (``-field``). NULLS is omitted
+    for not nullable columns, so plain btree indexes serve the ordering,
+    unless they are outer joined in ``select_from``.
+    """
     if sort_route.startswith("-"):
         sort_route = sort_route[1:]
 
         def sort_way(sort_field):
-            return desc(sort_field).nullslast()
+            order = desc(sort_field)
+            return (
+                order.nullslast()
+                if is_nullable(sort_field, select_from)
+                else order
+            )
 
     else:
 
         def sort_way(sort_field):
-            return asc(sort_field).nullsfirst()
+            order = asc(sort_field)
+            return (
+                order.nullsfirst()
+                if is_nullable(sort_field, select_from)
+                else order
+            )
 
     return sort_route, sort_way
 
@@ -68,11 +146,148 @@ def get_read_params(
         "sort": req.get_param_as_list("sort"),
         "limit": req.get_param_as_int("limit"),
         "offset": req.get_param_as_int("offset"),
+        "after": req.get_param("after"),
+        "before": req.get_param("before"),
+        "with_total": req.get_param_as_bool("total"),
+        "fieldsets": get_fieldsets(req, resource),
+        "stream": req.get_param_as_bool("stream"),
         "filters": FilterItem.parse(req._params, resource),
     }
     return params
 
 
+def make_etag(*parts: Any, weak: bool = False) -> str:
+    """ETag header value of a hash of ``parts``"""
+    digest = hashlib.blake2b(digest_size=16)
+    for part in parts:
+        digest.update(part if isinstance(part, bytes) else str(part).encode())
+        digest.update(b"\0")
+
+    etag = falcon.ETag(digest.hexdigest())
+    etag.is_weak = weak
+    value: str = etag.dumps()
+    return value
+
+
+def http_last_modified(value: Any) -> Optional[datetime]:
+    """
+    Last-Modified header date of ``value``: naive UTC datetime, None if
+    it isn't a datetime or is in the current second, as the header has
+    no fractions of seconds and later updates of the second wouldn't
+    change it
+    """
+    if not isinstance(value, datetime):
+        return None
+
+    last_modified: datetime = value
+    if last_modified.tzinfo is not None:
+        last_modified = last_modified.astimezone(timezone.utc).replace(
+            tzinfo=None
+        )
+
+    if last_modified >= datetime.utcnow().replace(microsecond=0):
+        return None
+
+    return last_modified
+
+
+def is_not_modified(
+    req: falcon.Request, etag: str, last_modified: Optional[datetime] = None
+) -> bool:
+    """
+    Checks ``If-None-Match`` / ``If-Modified-Since`` request headers,
+    the latter is used only if there is no former one (RFC 7232).
+    ``last_modified`` is naive UTC datetime, like falcon's header dates.
+    """
+    if req.if_none_match is not None:
+        etag_value = falcon.ETag.loads(etag)
+        return any(tag == "*" or tag == etag_value for tag in req.if_none_match)
+
+    if last_modified is None:
+        return False
+
+    try:
+        modified_since = req.get_header_as_datetime("If-Modified-Since")
+    except falcon.HTTPBadRequest:
+        # invalid dates are ignored
+        return False
+
+    if modified_since is None:
+        return False
+
+    not_modified: bool = (
+        last_modified.replace(microsecond=0) <= modified_since
+    )
+    return not_modified
+
+
+def pin_reads_to_primary(req: falcon.Request, resp: falcon.Response) -> None:
+    """
+    Pins reads of the client to the primary database for
+    ``AWOKADO_READ_YOUR_WRITES_WINDOW`` seconds after a write,
+    so it reads its writes even if replicas lag behind.
+    The deadline is sent in a cookie and a header, clients without
+    cookies send the header back.
+    """
+    window = float(settings.get("AWOKADO_READ_YOUR_WRITES_WINDOW", 5))
+    if window <= 0:
+        return
+
+    until = f"{time.time() + window:.3f}"
+    resp.set_cookie(
+        PRIMARY_UNTIL_COOKIE,
+        until,
+        max_age=math.ceil(window),
+        path="/",
+        secure=req.scheme == "https",
+    )
+    resp.set_header(PRIMARY_UNTIL_HEADER, until)
+
+
+def is_pinned_to_primary(req: falcon.Request) -> bool:
+    """
+    Checks the deadline sent by `pin_reads_to_primary`. It comes from
+    the client, so deadlines later than the window from now are ignored.
+    """
+    value = req.get_header(PRIMARY_UNTIL_HEADER) or req.cookies.get(
+        PRIMARY_UNTIL_COOKIE
+    )
+    try:
+        until = float(value)
+    except (TypeError, ValueError):
+        return False
+
+    now = time.time()
+    window = float(settings.get("AWOKADO_READ_YOUR_WRITES_WINDOW", 5))
+    return now < until <= now + window
+
+
+def get_fieldsets(
+    req: falcon.Request, resource: Type["BaseResource"]
+) -> Optional[Dict[str, List[str]]]:
+    """
+    Parses sparse fieldsets: ``fields=title,store`` for the requested
+    resource and ``fields[author]=name`` for any (included) resource.
+    """
+    fieldsets = {}
+
+    own_fields = req.get_param_as_list("fields")
+    if own_fields:
+        fieldsets[resource().Meta.name] = own_fields
+
+    for param, value in req._params.items():
+        match = FIELDSET_PARAM_RE.match(param)
+        if not match:
+            continue
+
+        if isinstance(value, str):
+            value = value.split(",")
+
+        fieldsets[match.group(1)] = [v for v in value if v]
+
+    return fieldsets or None
+
+
 def json_error_serializer(
     req: falcon.Request, resp: falcon.Response, exception: BaseApiException
 ):
@@ -121,7 +336,7 @@ def api_exception_handler(error, req, resp, params):
     elif isinstance(error, falcon.HTTPNotFound):
         resp.status = "404 Not Found"
         resp.content_type = "application/json"
-        resp.body = json.dumps({"error": f"{req.path} not found"})
+        resp.data = codec.dumps({"error": f"{req.path} not found"})
         resp.append_header("Vary", "Accept")
 
     else:
@@ -132,24 +347,24 @@ def api_exception_handler(error, req, resp, params):
         if settings.get("AWOKADO_DEBUG"):
 
             if hasattr(error, "to_dict"):
-                resp.body = json.dumps({"error": error.to_dict()})
+                resp.data = codec.dumps({"error": error.to_dict()})
 
             elif hasattr(error, "to_json"):
                 json_data = error.to_json()
 
                 try:
-                    json_data = json.loads(json_data)
-                except (TypeError, JSONDecodeError):
+                    json_data = codec.loads(json_data)
+                except (TypeError, ValueError):
                     json_data = json_data
 
-                resp.body = json.dumps({"error": json_data})
+                resp.data = codec.dumps({"error": json_data})
 
             else:
                 exc_data = "".join(traceback.format_exception(*sys.exc_info()))
-                resp.body = json.dumps({"error": exc_data})
+                resp.data = codec.dumps({"error": exc_data})
 
         else:
-            resp.body = json.dumps({"error": resp.status})
+            resp.data = codec.dumps({"error": resp.status})
 
         # Set content type
         resp.content_type = "application/json"
@@ -172,6 +387,69 @@ def get_id_field(resource: "BaseResource", name_only=False, skip_exc=False):
     return resource_id_model_field
 
 
+def is_outer_join_of(joins: Any, table: sa.Table) -> bool:
+    """
+    Checks that ``joins`` is a chain of LEFT OUTER joins starting from
+    ``table``, so every row of ``table`` is kept in the result.
+    """
+    while isinstance(joins, Join):
+        if not joins.isouter:
+            return False
+        joins = joins.left
+
+    return joins is table
+
+
+def get_from_tables(from_clause: Any) -> set:
+    if isinstance(from_clause, Join):
+        return get_from_tables(from_clause.left) | get_from_tables(
+            from_clause.right
+        )
+
+    return {from_clause}
+
+
+def prune_outer_joins(joins: Any, tables: set) -> Any:
+    """
+    Drops LEFT OUTER joined tables of ``joins`` which aren't in ``tables``
+    and aren't needed to join the remaining ones.
+    Inner joins are always kept, as they filter rows.
+    """
+    if not isinstance(joins, Join):
+        return joins
+
+    if joins.isouter and not joins.full:
+        if not get_from_tables(joins.right) & tables:
+            return prune_outer_joins(joins.left, tables)
+
+    tables = tables | set(find_tables(joins.onclause, check_columns=True))
+    left = prune_outer_joins(joins.left, tables)
+    if left is joins.left:
+        return joins
+
+    return left.join(
+        joins.right, joins.onclause, isouter=joins.isouter, full=joins.full
+    )
+
+
+def get_column(model_field: Any) -> Optional[sa.Column]:
+    """Table column of a model attribute, None for other expressions"""
+    if isinstance(model_field, sa.Column):
+        return model_field
+
+    if isinstance(model_field, InstrumentedAttribute):
+        return getattr(model_field.parent.persist_selectable.c, model_field.key)
+
+    return None
+
+
+def ids_bindparam(ids: Iterable, column: Any) -> sa.sql.elements.BindParameter:
+    """Array bind parameter of ids, to use with ``column == sa.any_(...)``"""
+    return sa.bindparam(
+        "ids", list(ids), type_=postgresql.ARRAY(column.type), unique=True
+    )
+
+
 def get_ids_from_payload(model: Any, payload: List[Dict]) -> List:
     if model and hasattr(model, "id"):
         ids = [d.get(model.id.key) for d in payload]
@@ -77,7 +77,7 @@ class AuthorResource(BaseResource):
             sa.select(
                 [
                     m.Author.id.label("id"),
-                    self.fields.name.metadata["model_field"].label("name"),
+                    self.fields["name"].metadata["model_field"].label("name"),
                     books_count.label("books_count"),
                 ]
             )
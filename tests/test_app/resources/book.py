@@ -3,7 +3,16 @@ from marshmallow import fields
 
 import tests.test_app.models as m
 from awokado import custom_fields
-from awokado.consts import CREATE, READ, UPDATE, BULK_UPDATE, DELETE
+from awokado.consts import (
+    CREATE,
+    READ,
+    UPDATE,
+    BULK_UPDATE,
+    DELETE,
+    OP_SEARCH,
+    OP_SIMILAR,
+    OP_STARTSWITH,
+)
 from awokado.meta import ResourceMeta
 from awokado.request import ReadContext
 from awokado.resource import BaseResource
@@ -20,7 +29,11 @@ class BookResource(BaseResource):
     )
 
     id = fields.Int(model_field=m.Book.id)
-    title = fields.String(model_field=m.Book.title, required=True)
+    title = fields.String(
+        model_field=m.Book.title,
+        required=True,
+        text_ops=(OP_SEARCH, OP_STARTSWITH, OP_SIMILAR),
+    )
     description = fields.String(model_field=m.Book.description)
     author = custom_fields.ToOne(
         resource="author", model_field=m.Book.author_id
@@ -5,7 +5,6 @@ import tests.test_app.models as m
 from awokado import custom_fields
 from awokado.consts import CREATE, READ, BULK_CREATE
 from awokado.meta import ResourceMeta
-from awokado.request import ReadContext
 from awokado.resource import BaseResource
 
 STORE_OPEN = "open"
@@ -32,25 +31,3 @@ class StoreResource(BaseResource):
         allowed_values=[STORE_OPEN, STORE_CLOSED],
         allow_none=True,
     )
-
-    def get_by_book_ids(
-        self, session, ctx: ReadContext, field: sa.Column = None
-    ):
-        q = (
-            sa.select(
-                [
-                    m.Store.id.label("id"),
-                    m.Store.name.label("name"),
-                    sa.func.array_agg(m.Book.id).label("book_ids"),
-                ]
-            )
-            .select_from(
-                sa.outerjoin(m.Store, m.Book, m.Store.id == m.Book.store_id)
-            )
-            .where(m.Book.id.in_(ctx.obj_ids))
-            .group_by(m.Store.id)
-        )
-
-        result = session.execute(q).fetchall()
-        serialized_objs = self.dump(result, many=True)
-        return serialized_objs
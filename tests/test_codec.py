@@ -0,0 +1,47 @@
+import datetime
+import json
+import uuid
+from decimal import Decimal
+from unittest import TestCase
+
+from awokado.codec import CODECS, get_codec
+from awokado.exceptions import BadRequest
+
+
+class CodecTest(TestCase):
+    data = {
+        "int": 1,
+        "float": 1.5,
+        "str": "ünïcode",
+        "list": [1, None, True, False],
+        "decimal": Decimal("1.10"),
+        "datetime": datetime.datetime(2020, 1, 2, 3, 4, 5),
+        "date": datetime.date(2020, 1, 2),
+        "uuid": uuid.UUID(int=1),
+        "nested": {"payload": {"book": [{"id": 1}]}},
+    }
+
+    def test_same_as_json(self):
+        expected = json.loads(json.dumps(self.data, default=str))
+
+        for name, codec in CODECS.items():
+            if not codec.is_available():
+                continue
+
+            encoded = codec.dumps(self.data)
+            self.assertIsInstance(encoded, bytes, name)
+            self.assertEqual(json.loads(encoded), expected, name)
+            self.assertEqual(codec.loads(encoded), expected, name)
+            self.assertEqual(codec.loads(encoded.decode()), expected, name)
+
+    def test_get_codec(self):
+        self.assertTrue(get_codec("auto").is_available())
+        self.assertIs(get_codec("json"), CODECS["json"])
+
+        with self.assertRaises(Exception):
+            get_codec("unknown")
+
+    def test_exception_json(self):
+        # error bodies are the same whatever codec is used
+        exc = BadRequest(details="ünïcode")
+        self.assertIn("ünïcode", exc.to_json())
@@ -0,0 +1,193 @@
+import threading
+from unittest.mock import MagicMock, patch
+
+import sqlalchemy as sa
+from clavis import Transaction
+from falcon import testing
+from sqlalchemy.pool import NullPool
+
+import awokado.db
+from awokado.request import ReadContext
+from tests.base import BaseAPITest, Session
+from tests.test_app import models as m
+from tests.test_app.resources import BookResource
+from tests.test_app.routes import api
+
+
+class ConcurrentIncludeTest(BaseAPITest):
+    def setup_dataset(self):
+        self.store_id = self.session.execute(
+            sa.insert(m.Store)
+            .values({m.Store.name: "bookstore"})
+            .returning(m.Store.id)
+        ).scalar()
+        self.author_id = self.create_author("Steven King")
+        self.tag_id = self.create_tag("horror")
+        self.book_id = self.session.execute(
+            sa.insert(m.Book)
+            .values(
+                {
+                    m.Book.title: "It",
+                    m.Book.store_id: self.store_id,
+                    m.Book.author_id: self.author_id,
+                }
+            )
+            .returning(m.Book.id)
+        ).scalar()
+        self.session.execute(
+            sa.insert(m.M2M_Book_Tag).values(
+                {
+                    m.M2M_Book_Tag.c.book_id: self.book_id,
+                    m.M2M_Book_Tag.c.tag_id: self.tag_id,
+                }
+            )
+        )
+
+    def setUp(self):
+        super().setUp()
+        self.app = api
+        self.setup_dataset()
+
+    @patch("awokado.resource.Transaction", autospec=True)
+    def test_concurrent_include(self, session_patch):
+        self.patch_session(session_patch)
+        query_string = "include=tags,author,store"
+
+        sequential = self.simulate_get("/v1/book/", query_string=query_string)
+        self.assertEqual(sequential.status, "200 OK", sequential.text)
+
+        threads = []
+        lock = threading.Lock()
+        load_relation = ReadContext._ReadContext__load_relation
+
+        def load_relation_in_snapshot(ctx, engine, snapshot, relation, path):
+            # data of the test transaction isn't visible in other ones,
+            # load it with the test session in the loader thread
+            self.assertTrue(snapshot)
+            with lock:
+                threads.append(threading.current_thread())
+                return load_relation(ctx, relation, path)
+
+        with patch.object(
+            BookResource.Meta, "concurrent_includes", True
+        ), patch.object(
+            ReadContext,
+            "_ReadContext__load_relation_in_snapshot",
+            load_relation_in_snapshot,
+        ):
+            resp = self.simulate_get("/v1/book/", query_string=query_string)
+
+        self.assertEqual(resp.status, "200 OK", resp.text)
+        self.assertEqual(len(threads), 3)
+        self.assertNotIn(threading.main_thread(), threads)
+
+        self.assertEqual(resp.json, sequential.json)
+        self.assertEqual(
+            list(resp.json["payload"]), ["book", "tag", "author", "store"]
+        )
+
+
+SNAPSHOT_SCHEMA = "awokado_snapshot_include"
+
+
+class SnapshotIncludeTest(testing.TestCase):
+    """
+    Loaders read in the exported snapshot of the request transaction,
+    they see committed data only, it's created in a separate schema
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.app = api
+        self.engine = sa.create_engine(
+            awokado.db.DATABASE_URL,
+            poolclass=NullPool,
+            connect_args={"options": f"-csearch_path={SNAPSHOT_SCHEMA}"},
+        )
+        with self.engine.begin() as conn:
+            conn.execute(f"CREATE SCHEMA IF NOT EXISTS {SNAPSHOT_SCHEMA}")
+            m.Model.metadata.create_all(conn)
+
+            store_id = conn.execute(
+                sa.insert(m.Store)
+                .values({m.Store.name: "bookstore"})
+                .returning(m.Store.id)
+            ).scalar()
+            author_id = conn.execute(
+                sa.insert(m.Author)
+                .values(
+                    {m.Author.first_name: "Steven", m.Author.last_name: "King"}
+                )
+                .returning(m.Author.id)
+            ).scalar()
+            tag_id = conn.execute(
+                sa.insert(m.Tag)
+                .values({m.Tag.name: "horror"})
+                .returning(m.Tag.id)
+            ).scalar()
+            book_id = conn.execute(
+                sa.insert(m.Book)
+                .values(
+                    {
+                        m.Book.title: "It",
+                        m.Book.store_id: store_id,
+                        m.Book.author_id: author_id,
+                    }
+                )
+                .returning(m.Book.id)
+            ).scalar()
+            conn.execute(
+                sa.insert(m.M2M_Book_Tag).values(
+                    {
+                        m.M2M_Book_Tag.c.book_id: book_id,
+                        m.M2M_Book_Tag.c.tag_id: tag_id,
+                    }
+                )
+            )
+
+    def tearDown(self):
+        try:
+            with self.engine.begin() as conn:
+                conn.execute(f"DROP SCHEMA {SNAPSHOT_SCHEMA} CASCADE")
+            self.engine.dispose()
+        finally:
+            super().tearDown()
+
+    @patch("awokado.resource.Transaction", autospec=True)
+    def test_snapshot_include(self, session_patch):
+        load_relation_in_snapshot = (
+            ReadContext._ReadContext__load_relation_in_snapshot
+        )
+
+        with self.engine.connect() as conn, conn.begin():
+
+            class X:
+                session = Session(bind=conn)
+
+            transaction = MagicMock(spec=Transaction)
+            transaction.__enter__.return_value = X
+            session_patch.return_value = transaction
+
+            with patch.object(
+                BookResource.Meta, "concurrent_includes", True
+            ), patch(
+                "awokado.request.get_loader_engine", return_value=self.engine
+            ), patch.object(
+                ReadContext,
+                "_ReadContext__load_relation_in_snapshot",
+                autospec=True,
+                side_effect=load_relation_in_snapshot,
+            ) as load_relation:
+                resp = self.simulate_get(
+                    "/v1/book/", query_string="include=tags,author,store"
+                )
+
+        self.assertEqual(resp.status, "200 OK", resp.text)
+        self.assertEqual(load_relation.call_count, 3)
+
+        payload = resp.json["payload"]
+        self.assertEqual([t["name"] for t in payload["tag"]], ["horror"])
+        self.assertEqual(
+            [a["name"] for a in payload["author"]], ["Steven King"]
+        )
+        self.assertEqual([s["name"] for s in payload["store"]], ["bookstore"])
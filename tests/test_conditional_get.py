@@ -0,0 +1,195 @@
+from unittest.mock import patch
+
+import sqlalchemy as sa
+
+from tests.base import BaseAPITest
+from tests.test_app import models as m
+from tests.test_app.resources import BookResource, StoreResource
+from tests.test_app.routes import api
+
+
+class ConditionalGetTest(BaseAPITest):
+    def setup_dataset(self):
+        self.store_id = self.session.execute(
+            sa.insert(m.Store)
+            .values({m.Store.name: "bookstore"})
+            .returning(m.Store.id)
+        ).scalar()
+        # Last-Modified isn't sent for rows modified in the current second
+        self.book_id = self.session.execute(
+            sa.insert(m.Book)
+            .values(
+                {
+                    m.Book.title: "It",
+                    m.Book.store_id: self.store_id,
+                    m.Book.record_modified: sa.func.now()
+                    - sa.text("interval '1 hour'"),
+                }
+            )
+            .returning(m.Book.id)
+        ).scalar()
+
+    def setUp(self):
+        super().setUp()
+        self.app = api
+        self.setup_dataset()
+
+    @patch("awokado.resource.Transaction", autospec=True)
+    def test_last_modified_validator(self, session_patch):
+        self.patch_session(session_patch)
+
+        with patch.object(
+            BookResource.Meta, "conditional_get", True
+        ), patch.object(
+            BookResource.Meta, "last_modified_column", m.Book.record_modified
+        ):
+            # joined author and tags aren't read with the fieldset
+            resp = self.simulate_get(
+                f"/v1/book/{self.book_id}", query_string="fields=title"
+            )
+            self.assertEqual(resp.status, "200 OK", resp.text)
+            etag = resp.headers["ETag"]
+            self.assertTrue(etag.startswith('W/"'))
+            last_modified = resp.headers["Last-Modified"]
+
+            with patch.object(BookResource, "read_handler") as read_handler:
+                resp = self.simulate_get(
+                    f"/v1/book/{self.book_id}",
+                    query_string="fields=title",
+                    headers={"If-None-Match": etag},
+                )
+                self.assertEqual(resp.status, "304 Not Modified")
+                self.assertEqual(resp.text, "")
+
+                resp = self.simulate_get(
+                    f"/v1/book/{self.book_id}",
+                    query_string="fields=title",
+                    headers={"If-Modified-Since": last_modified},
+                )
+                self.assertEqual(resp.status, "304 Not Modified")
+
+                # the response isn't read at all
+                read_handler.assert_not_called()
+
+            # other filters have other validator
+            resp = self.simulate_get(
+                "/v1/book/",
+                query_string="title[eq]=It",
+                headers={"If-None-Match": etag},
+            )
+            self.assertEqual(resp.status, "200 OK", resp.text)
+
+            self.session.execute(
+                sa.update(m.Book)
+                .where(m.Book.id == self.book_id)
+                .values(
+                    {
+                        m.Book.title: "The Dark Tower",
+                        m.Book.record_modified: sa.func.now()
+                        + sa.text("interval '1 hour'"),
+                    }
+                )
+            )
+            resp = self.simulate_get(
+                f"/v1/book/{self.book_id}",
+                query_string="fields=title",
+                headers={"If-None-Match": etag},
+            )
+            self.assertEqual(resp.status, "200 OK", resp.text)
+            self.assertEqual(resp.json["book"][0]["title"], "The Dark Tower")
+            self.assertNotEqual(resp.headers["ETag"], etag)
+            self.assertNotIn("Last-Modified", resp.headers)
+
+    @patch("awokado.resource.Transaction", autospec=True)
+    def test_list_last_modified(self, session_patch):
+        self.patch_session(session_patch)
+        book_id = self.session.execute(
+            sa.insert(m.Book)
+            .values({m.Book.title: "Carrie", m.Book.store_id: self.store_id})
+            .returning(m.Book.id)
+        ).scalar()
+
+        with patch.object(
+            BookResource.Meta, "conditional_get", True
+        ), patch.object(
+            BookResource.Meta, "last_modified_column", m.Book.record_modified
+        ):
+            resp = self.simulate_get("/v1/book/", query_string="fields=title")
+            self.assertEqual(resp.status, "200 OK", resp.text)
+            self.assertTrue(resp.headers["ETag"].startswith('W/"'))
+            self.assertNotIn("Last-Modified", resp.headers)
+            self.assertEqual(len(resp.json["payload"]["book"]), 2)
+
+            resp = self.simulate_delete(f"/v1/book/{book_id}")
+            self.assertEqual(resp.status, "200 OK", resp.text)
+
+            # max of the rows left is older, but the list has changed
+            resp = self.simulate_get(
+                "/v1/book/",
+                query_string="fields=title",
+                headers={"If-Modified-Since": "Fri, 01 Jan 2100 00:00:00 GMT"},
+            )
+            self.assertEqual(resp.status, "200 OK", resp.text)
+            self.assertEqual(
+                [b["id"] for b in resp.json["payload"]["book"]], [self.book_id],
+            )
+
+    @patch("awokado.resource.Transaction", autospec=True)
+    def test_joined_data_validator(self, session_patch):
+        self.patch_session(session_patch)
+        author_id = self.create_author("Stephen King")
+        self.session.execute(
+            sa.update(m.Book)
+            .where(m.Book.id == self.book_id)
+            .values({m.Book.author_id: author_id})
+        )
+
+        with patch.object(
+            BookResource.Meta, "conditional_get", True
+        ), patch.object(
+            BookResource.Meta, "last_modified_column", m.Book.record_modified
+        ):
+            # author name is joined, the body is hashed
+            resp = self.simulate_get(f"/v1/book/{self.book_id}")
+            self.assertEqual(resp.status, "200 OK", resp.text)
+            etag = resp.headers["ETag"]
+            self.assertFalse(etag.startswith("W/"))
+            self.assertNotIn("Last-Modified", resp.headers)
+
+            self.session.execute(
+                sa.update(m.Author)
+                .where(m.Author.id == author_id)
+                .values({m.Author.first_name: "Richard"})
+            )
+            resp = self.simulate_get(
+                f"/v1/book/{self.book_id}", headers={"If-None-Match": etag}
+            )
+            self.assertEqual(resp.status, "200 OK", resp.text)
+            self.assertEqual(resp.json["book"][0]["author_name"], "Richard")
+
+    @patch("awokado.resource.Transaction", autospec=True)
+    def test_body_hash_validator(self, session_patch):
+        self.patch_session(session_patch)
+
+        with patch.object(StoreResource.Meta, "conditional_get", True):
+            resp = self.simulate_get("/v1/store/")
+            self.assertEqual(resp.status, "200 OK", resp.text)
+            etag = resp.headers["ETag"]
+            self.assertFalse(etag.startswith("W/"))
+            self.assertNotIn("Last-Modified", resp.headers)
+
+            resp = self.simulate_get(
+                "/v1/store/", headers={"If-None-Match": etag}
+            )
+            self.assertEqual(resp.status, "304 Not Modified")
+
+            self.session.execute(
+                sa.update(m.Store)
+                .where(m.Store.id == self.store_id)
+                .values({m.Store.name: "new name"})
+            )
+            resp = self.simulate_get(
+                "/v1/store/", headers={"If-None-Match": etag}
+            )
+            self.assertEqual(resp.status, "200 OK", resp.text)
+            self.assertNotEqual(resp.headers["ETag"], etag)
@@ -0,0 +1,130 @@
+from unittest.mock import patch
+
+import sqlalchemy as sa
+
+from awokado.pagination import encode_cursor
+from tests.base import BaseAPITest
+from tests.test_app import models as m
+from tests.test_app.routes import api
+
+
+class CursorPaginationTest(BaseAPITest):
+    def setup_dataset(self):
+        self.store_id = self.session.execute(
+            sa.insert(m.Store)
+            .values({m.Store.name: "bookstore"})
+            .returning(m.Store.id)
+        ).scalar()
+        self.book_ids = []
+        for title in ("a", "b", "b", "c", None):
+            self.book_ids.append(
+                self.session.execute(
+                    sa.insert(m.Book)
+                    .values(
+                        {m.Book.title: title, m.Book.store_id: self.store_id}
+                    )
+                    .returning(m.Book.id)
+                ).scalar()
+            )
+
+    def setUp(self):
+        super().setUp()
+        self.app = api
+        self.setup_dataset()
+
+    def read_pages(self, query_string: str, cursor_param: str = "after"):
+        ids = []
+        resp = self.simulate_get("/v1/book/", query_string=query_string)
+
+        while True:
+            self.assertEqual(resp.status, "200 OK", resp.text)
+            ids.extend(b["id"] for b in resp.json["payload"]["book"])
+            cursor = resp.json["meta"][
+                "next" if cursor_param == "after" else "prev"
+            ]
+            if not cursor:
+                return ids
+
+            resp = self.simulate_get(
+                "/v1/book/",
+                query_string=f"{query_string}&{cursor_param}={cursor}",
+            )
+
+    @patch("awokado.resource.Transaction", autospec=True)
+    def test_read_forward(self, session_patch):
+        self.patch_session(session_patch)
+        a, b1, b2, c, empty = self.book_ids
+
+        self.assertEqual(
+            self.read_pages("limit=2&sort=title"), [empty, a, b1, b2, c]
+        )
+        self.assertEqual(
+            self.read_pages("limit=2&sort=-title"), [c, b1, b2, a, empty]
+        )
+
+    @patch("awokado.resource.Transaction", autospec=True)
+    def test_read_backward(self, session_patch):
+        self.patch_session(session_patch)
+        a, b1, b2, c, empty = self.book_ids
+
+        resp = self.simulate_get(
+            "/v1/book/", query_string="limit=2&sort=title&offset=3"
+        )
+        self.assertEqual(resp.status, "200 OK", resp.text)
+        self.assertEqual(
+            [b["id"] for b in resp.json["payload"]["book"]], [b2, c]
+        )
+
+        resp = self.simulate_get(
+            "/v1/book/",
+            query_string=f"limit=2&sort=title&before={resp.json['meta']['prev']}",
+        )
+        self.assertEqual(resp.status, "200 OK", resp.text)
+        self.assertEqual(
+            [b["id"] for b in resp.json["payload"]["book"]], [a, b1]
+        )
+        self.assertIsNotNone(resp.json["meta"]["prev"])
+
+    @patch("awokado.resource.Transaction", autospec=True)
+    def test_read_outer_joined_sort(self, session_patch):
+        self.patch_session(session_patch)
+        a, b1, b2, c, empty = self.book_ids
+        # author name is NULL for books without author,
+        # whatever first_name column is declared
+        for book_id, name in ((a, "Zed Z"), (b1, "Ann A"), (c, "Ann B")):
+            self.session.execute(
+                sa.update(m.Book)
+                .where(m.Book.id == book_id)
+                .values({m.Book.author_id: self.create_author(name)})
+            )
+
+        self.assertEqual(
+            self.read_pages("limit=2&sort=author_name"), [b2, empty, b1, c, a]
+        )
+        self.assertEqual(
+            self.read_pages("limit=2&sort=-author_name"), [a, b1, c, b2, empty]
+        )
+
+    @patch("awokado.resource.Transaction", autospec=True)
+    def test_bad_cursor(self, session_patch):
+        self.patch_session(session_patch)
+        resp = self.simulate_get("/v1/book/", query_string="limit=2&sort=title")
+        cursor = resp.json["meta"]["next"]
+
+        resp = self.simulate_get(
+            "/v1/book/", query_string=f"limit=2&sort=-title&after={cursor}"
+        )
+        self.assertEqual(resp.status, "400 Bad Request", resp.text)
+        self.assertEqual(resp.json["code"], "bad-cursor")
+
+        forged = encode_cursor(["title", "id"], ["b", 0])[:-2] + "xx"
+        resp = self.simulate_get(
+            "/v1/book/", query_string=f"limit=2&sort=title&after={forged}"
+        )
+        self.assertEqual(resp.status, "400 Bad Request", resp.text)
+
+        resp = self.simulate_get(
+            "/v1/book/",
+            query_string=f"limit=2&sort=title&offset=2&after={cursor}",
+        )
+        self.assertEqual(resp.status, "400 Bad Request", resp.text)
@@ -0,0 +1,97 @@
+from unittest.mock import patch
+
+import sqlalchemy as sa
+
+from tests.base import BaseAPITest
+from tests.test_app import models as m
+from tests.test_app.routes import api
+
+
+class FieldsetsTest(BaseAPITest):
+    def setup_dataset(self):
+        self.store_id = self.session.execute(
+            sa.insert(m.Store)
+            .values({m.Store.name: "bookstore"})
+            .returning(m.Store.id)
+        ).scalar()
+        self.author_id = self.create_author("Steven King")
+        self.book_id = self.session.execute(
+            sa.insert(m.Book)
+            .values(
+                {
+                    m.Book.title: "The Dark Tower",
+                    m.Book.store_id: self.store_id,
+                    m.Book.author_id: self.author_id,
+                }
+            )
+            .returning(m.Book.id)
+        ).scalar()
+
+    def setUp(self):
+        super().setUp()
+        self.app = api
+        self.setup_dataset()
+
+    @patch("awokado.resource.Transaction", autospec=True)
+    def test_fields(self, session_patch):
+        self.patch_session(session_patch)
+
+        resp = self.simulate_get("/v1/book/", query_string="fields=title,store")
+        self.assertEqual(resp.status, "200 OK", resp.text)
+        self.assertEqual(
+            resp.json["payload"]["book"],
+            [
+                {
+                    "id": self.book_id,
+                    "title": "The Dark Tower",
+                    "store": self.store_id,
+                }
+            ],
+        )
+
+        resp = self.simulate_get(
+            f"/v1/book/{self.book_id}", query_string="fields=author_name"
+        )
+        self.assertEqual(resp.status, "200 OK", resp.text)
+        self.assertEqual(
+            resp.json["book"][0], {"id": self.book_id, "author_name": "Steven"},
+        )
+
+        resp = self.simulate_get(
+            "/v1/book/", query_string="fields=title&sort=-author_name&limit=1"
+        )
+        self.assertEqual(resp.status, "200 OK", resp.text)
+        self.assertEqual(
+            resp.json["payload"]["book"],
+            [
+                {
+                    "id": self.book_id,
+                    "title": "The Dark Tower",
+                    "author_name": "Steven",
+                }
+            ],
+        )
+
+    @patch("awokado.resource.Transaction", autospec=True)
+    def test_include_fields(self, session_patch):
+        self.patch_session(session_patch)
+
+        resp = self.simulate_get(
+            "/v1/book/",
+            query_string="fields=author&include=author&fields[author]=name",
+        )
+        self.assertEqual(resp.status, "200 OK", resp.text)
+        self.assertEqual(
+            resp.json["payload"],
+            {
+                "book": [{"id": self.book_id, "author": self.author_id}],
+                "author": [{"id": self.author_id, "name": "Steven King"}],
+            },
+        )
+
+    @patch("awokado.resource.Transaction", autospec=True)
+    def test_unknown_field(self, session_patch):
+        self.patch_session(session_patch)
+
+        resp = self.simulate_get("/v1/book/", query_string="fields=unknown")
+        self.assertEqual(resp.status, "400 Bad Request", resp.text)
@@ -1,5 +1,9 @@
+from dataclasses import replace
 from unittest import TestCase
 
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
 from awokado.consts import (
     OP_LTE,
     OP_EQ,
@@ -10,17 +14,30 @@ from awokado.consts import (
     OP_CONTAINS,
     OP_LT,
     OP_GT,
+    OP_SEARCH,
+    OP_SIMILAR,
+    OP_STARTSWITH,
 )
 from awokado.exceptions.bad_request import BadFilter
 from awokado.filter_parser import (
     filter_value_to_python,
     parse_filters,
+    FilterGrammar,
+    FilterGroup,
     FilterItem,
+    get_include_filters,
+    get_relation_paths,
 )
-from tests.test_app.resources.author import AuthorResource
+from tests.test_app import models as m
+from tests.test_app.resources import AuthorResource, BookResource, TagResource
 
 
 class FilterParserTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        # resources are registered when instantiated
+        BookResource(), TagResource()
+
     def test_filter_value_to_python(self):
         self.assertEqual([1, 2, 3], filter_value_to_python([1, 2, 3]))
         self.assertEqual(
@@ -134,3 +151,197 @@ class FilterParserTest(TestCase):
                 second.wrapper(second.value),
                 "wrapped value is different",
             )
+
+    def test_parse_filter_groups(self):
+        filters = parse_filters(
+            {
+                f"filter[or][0][last_name][{OP_ILIKE}]": "name",
+                f"filter[or][1][id][{OP_IN}]": "1,2",
+                f"filter[or][1][first_name][{OP_EQ}]": "first",
+                f"filter[not][id][{OP_EQ}]": "3",
+                f"id[{OP_GTE}]": "1",
+            },
+            AuthorResource,
+        )
+
+        self.assertEqual(3, len(filters))
+        or_group, not_group, item = filters
+        self.assertIsInstance(or_group, FilterGroup)
+        self.assertEqual("or", or_group.op)
+        self.assertEqual(["and", "and"], [g.op for g in or_group.items])
+        self.assertFilterItems(
+            [FilterItem("last_name", OP_ILIKE, lambda v: f"%{v}%", "name")],
+            or_group.items[0].items,
+        )
+        self.assertFilterItems(
+            [
+                FilterItem("first_name", "__eq__", lambda v: v, "first"),
+                FilterItem("id", "in_", lambda v: v, ["1", "2"]),
+            ],
+            or_group.items[1].items,
+        )
+        self.assertEqual("not", not_group.op)
+        self.assertFilterItems(
+            [FilterItem("id", "__eq__", lambda v: v, "3")], not_group.items
+        )
+        self.assertFilterItems(
+            [FilterItem("id", "__ge__", lambda v: v, "1")], [item]
+        )
+
+        nested = parse_filters(
+            {f"filter[or][0][not][id][{OP_EQ}]": "1"}, AuthorResource
+        )
+        self.assertEqual("not", nested[0].items[0].items[0].op)
+
+        for param in (
+            f"filter[or][id][{OP_EQ}]",
+            f"filter[xor][0][id][{OP_EQ}]",
+            f"filter[or][0][unknown][{OP_EQ}]",
+            f"filter[or][0][id][nonexistentop]",
+            f"filter[or][0][id]",
+            f"filter[or][0][id][{OP_EQ}]x",
+        ):
+            with self.assertRaises(BadFilter, msg=param):
+                parse_filters({param: "1"}, AuthorResource)
+
+    def test_filter_groups_clause(self):
+        grammar = FilterGrammar.get(AuthorResource)
+        self.assertIs(grammar, FilterGrammar.get(AuthorResource()))
+
+        clause = grammar.to_clause(
+            parse_filters(
+                {
+                    f"filter[or][0][id][{OP_EQ}]": "1",
+                    f"filter[or][1][not][id][{OP_IN}]": "2,3",
+                },
+                AuthorResource,
+            )
+        )
+        sql = str(clause.compile(dialect=postgresql.dialect()))
+        self.assertEqual(
+            "authors.id = %(id_1)s OR authors.id NOT IN "
+            "(%(id_2)s, %(id_3)s)",
+            sql,
+        )
+        self.assertEqual(
+            {"id_1": 1, "id_2": 2, "id_3": 3},
+            clause.compile(dialect=postgresql.dialect()).params,
+        )
+
+    def test_filter_params(self):
+        grammar = FilterGrammar.get(AuthorResource)
+
+        def compile_filter(params):
+            filters = parse_filters(params, AuthorResource)
+            bind_params: dict = {}
+            clause = grammar.to_clause(filters, bind_params)
+            sql = str(clause.compile(dialect=postgresql.dialect()))
+            return sql, bind_params, grammar.shape(filters)
+
+        sql, bind_params, shape = compile_filter(
+            {f"id[{OP_IN}]": "1,2", f"first_name[{OP_EQ}]": "null"}
+        )
+        self.assertEqual(
+            "authors.id IN ([EXPANDING_filter_0]) "
+            "AND authors.first_name IS NULL",
+            sql,
+        )
+        self.assertEqual({"filter_0": [1, 2]}, bind_params)
+
+        other_sql, bind_params, other_shape = compile_filter(
+            {f"id[{OP_IN}]": "3", f"first_name[{OP_EQ}]": "null"}
+        )
+        self.assertEqual(sql, other_sql)
+        self.assertEqual(shape, other_shape)
+        self.assertEqual({"filter_0": [3]}, bind_params)
+
+        _, bind_params, other_shape = compile_filter(
+            {f"id[{OP_IN}]": "3", f"first_name[{OP_EQ}]": "Stephen"}
+        )
+        self.assertNotEqual(shape, other_shape)
+        self.assertEqual({"filter_0": [3], "filter_1": "Stephen"}, bind_params)
+
+    def test_parse_relation_filters(self):
+        filters = parse_filters(
+            {
+                f"books.title[{OP_ILIKE}]": "x",
+                f"filter[books.tags.name][{OP_EQ}]": "tag",
+                f"filter[books.title][{OP_EQ}]": "title",
+            },
+            AuthorResource,
+        )
+
+        item = filters[0]
+        self.assertFilterItems(
+            [FilterItem("books.title", OP_ILIKE, lambda v: f"%{v}%", "x")],
+            [item],
+        )
+        self.assertEqual(
+            {
+                "books.tags": [FilterItem("name", "__eq__", None, "tag")],
+                "books": [FilterItem("title", "__eq__", None, "title")],
+            },
+            {
+                path: [replace(i, wrapper=None) for i in items]
+                for path, items in get_include_filters(filters).items()
+            },
+        )
+        self.assertEqual(["books"], get_relation_paths(filters))
+        self.assertEqual(
+            ["id"], FilterGrammar.get(AuthorResource).referenced_fields(filters)
+        )
+
+        for param in (
+            f"books.unknown[{OP_EQ}]",
+            f"filter[books.unknown][{OP_EQ}]",
+            f"filter[unknown.title][{OP_EQ}]",
+        ):
+            with self.assertRaises(BadFilter, msg=param):
+                parse_filters({param: "1"}, AuthorResource)
+
+        # not a relation, isn't a filter
+        self.assertEqual([], parse_filters({"id.x[eq]": "1"}, AuthorResource))
+
+    def test_relation_filter_clause(self):
+        grammar = FilterGrammar.get(AuthorResource)
+        clause = grammar.to_clause(
+            parse_filters({f"books.store[{OP_EQ}]": "1"}, AuthorResource)
+        )
+        q = sa.select([m.Author.id]).where(clause)
+
+        self.assertEqual(
+            "SELECT authors.id \nFROM authors \nWHERE EXISTS (SELECT * \n"
+            "FROM books AS books_1 \nWHERE books_1.author_id = authors.id "
+            "AND books_1.store_id = %(store_id_1)s)",
+            str(q.compile(dialect=postgresql.dialect())),
+        )
+
+    def test_text_operators(self):
+        grammar = FilterGrammar.get(BookResource)
+
+        def compile_filter(params):
+            clause = grammar.to_clause(grammar.parse(params))
+            compiled = clause.compile(dialect=postgresql.dialect())
+            return str(compiled), list(compiled.params.values())
+
+        self.assertEqual(
+            (
+                "to_tsvector(%(to_tsvector_1)s, books.title) @@ "
+                "plainto_tsquery(%(plainto_tsquery_1)s, "
+                "%(plainto_tsquery_2)s)",
+                ["simple", "simple", "first book"],
+            ),
+            compile_filter({f"title[{OP_SEARCH}]": "first book"}),
+        )
+        self.assertEqual(
+            ("books.title LIKE %(title_1)s", ["50\\%\\_off%"]),
+            compile_filter({f"title[{OP_STARTSWITH}]": "50%_off"}),
+        )
+        self.assertEqual(
+            ("books.title %% %(title_1)s", ["frist"]),
+            compile_filter({f"title[{OP_SIMILAR}]": "frist"}),
+        )
+
+        # text operators are allowed for fields declaring them only
+        with self.assertRaises(BadFilter):
+            grammar.parse({f"description[{OP_SEARCH}]": "x"})
@@ -2,8 +2,10 @@ from unittest.mock import patch
 
 import sqlalchemy as sa
 
+from awokado.filter_parser import FilterGrammar
 from tests.base import BaseAPITest
 from tests.test_app import models as m
+from tests.test_app.resources import BookResource
 from tests.test_app.routes import api
 
 
@@ -117,3 +119,105 @@ class FiltersTest(BaseAPITest):
         resp = self.simulate_get("/v1/book", query_string="title[ilike]=xXx")
         self.assertEqual(resp.status, "200 OK", resp.text)
         self.assertEqual(len(resp.json["payload"]["book"]), 0)
+
+    @patch("awokado.resource.Transaction", autospec=True)
+    def test_filter_relation(self, session_patch):
+        self.patch_session(session_patch)
+        other_store_id = self.session.execute(
+            sa.insert(m.Store)
+            .values({m.Store.name: "other"})
+            .returning(m.Store.id)
+        ).scalar()
+
+        resp = self.simulate_get(
+            "/v1/store", query_string="book_ids.title[eq]=second"
+        )
+        self.assertEqual(resp.status, "200 OK", resp.text)
+        self.assertEqual(
+            [s["id"] for s in resp.json["payload"]["store"]], [self.store_id]
+        )
+
+        resp = self.simulate_get(
+            "/v1/book",
+            query_string="store.name[eq]=bookstore&title[in]=first,second",
+        )
+        self.assertEqual(resp.status, "200 OK", resp.text)
+        self.assertCountEqual(
+            [b["id"] for b in resp.json["payload"]["book"]],
+            [self.book1_id, self.book2_id],
+        )
+
+        resp = self.simulate_get(
+            "/v1/store", query_string="filter[not][book_ids.title][ilike]=i",
+        )
+        self.assertEqual(resp.status, "200 OK", resp.text)
+        self.assertEqual(
+            [s["id"] for s in resp.json["payload"]["store"]], [other_store_id]
+        )
+
+        resp = self.simulate_get(
+            "/v1/store", query_string="book_ids.unknown[eq]=1"
+        )
+        self.assertEqual(resp.status, "400 Bad Request", resp.text)
+
+    @patch("awokado.resource.Transaction", autospec=True)
+    def test_filter_include(self, session_patch):
+        self.patch_session(session_patch)
+
+        resp = self.simulate_get(
+            f"/v1/store/{self.store_id}",
+            query_string="include=book_ids&filter[book_ids.title][in]=first,third",
+        )
+        self.assertEqual(resp.status, "200 OK", resp.text)
+        self.assertCountEqual(
+            [b["id"] for b in resp.json["book"]],
+            [self.book1_id, self.book3_id],
+        )
+
+        resp = self.simulate_get(
+            f"/v1/store/{self.store_id}",
+            query_string="filter[book_ids.title][eq]=first",
+        )
+        self.assertEqual(resp.status, "400 Bad Request", resp.text)
+
+    @patch("awokado.resource.Transaction", autospec=True)
+    def test_filter_text_operators(self, session_patch):
+        self.patch_session(session_patch)
+
+        resp = self.simulate_get("/v1/book", query_string="title[search]=First")
+        self.assertEqual(resp.status, "200 OK", resp.text)
+        self.assertEqual(
+            [b["id"] for b in resp.json["payload"]["book"]], [self.book1_id]
+        )
+
+        resp = self.simulate_get("/v1/book", query_string="title[startswith]=s")
+        self.assertEqual(resp.status, "200 OK", resp.text)
+        self.assertEqual(
+            [b["id"] for b in resp.json["payload"]["book"]], [self.book2_id]
+        )
+
+        resp = self.simulate_get("/v1/book", query_string="title[startswith]=_")
+        self.assertEqual(resp.status, "200 OK", resp.text)
+        self.assertEqual(len(resp.json["payload"]["book"]), 0)
+
+        resp = self.simulate_get(
+            "/v1/book", query_string="description[startswith]=s"
+        )
+        self.assertEqual(resp.status, "400 Bad Request", resp.text)
+
+    @patch("awokado.resource.Transaction", autospec=True)
+    def test_filterable(self, session_patch):
+        self.patch_session(session_patch)
+
+        with patch.object(
+            BookResource.Meta, "filterable", ("id", "title")
+        ), patch.dict(FilterGrammar.GRAMMARS, clear=True):
+            resp = self.simulate_get("/v1/book", query_string="title[eq]=first")
+            self.assertEqual(resp.status, "200 OK", resp.text)
+            self.assertEqual(len(resp.json["payload"]["book"]), 1)
+
+            resp = self.simulate_get(
+                "/v1/book", query_string="description[eq]=first"
+            )
+            self.assertEqual(resp.status, "400 Bad Request", resp.text)
+            self.assertEqual(resp.json["code"], "bad-filter")
@@ -44,6 +44,37 @@ class IncludeTest(BaseAPITest):
         self.assertEqual(len(resp.json["payload"]["book"]), 3)
         self.assertEqual(len(resp.json["payload"]["store"]), 1)
 
+    @patch("awokado.resource.Transaction", autospec=True)
+    def test_include_derived_loader(self, session_patch):
+        self.patch_session(session_patch)
+        book_ids = [self.book1_id, self.book2_id, self.book3_id]
+
+        # book -> store by foreign key of the book
+        resp = self.simulate_get(
+            f"/v1/book/{self.book1_id}", query_string="include=store"
+        )
+        self.assertEqual(resp.status, "200 OK", resp.text)
+        (store,) = resp.json["store"]
+        self.assertCountEqual(store.pop("book_ids"), book_ids)
+        self.assertEqual(
+            store, {"id": self.store_id, "name": "bookstore", "status": None}
+        )
+
+        # foreign key isn't selected with sparse fieldset
+        resp = self.simulate_get(
+            f"/v1/book/{self.book1_id}",
+            query_string="include=store&fields=title",
+        )
+        self.assertEqual(resp.status, "200 OK", resp.text)
+        self.assertEqual(resp.json["store"][0]["id"], self.store_id)
+
+        # store -> books by foreign key of the books
+        resp = self.simulate_get(
+            f"/v1/store/{self.store_id}", query_string="include=book_ids"
+        )
+        self.assertEqual(resp.status, "200 OK", resp.text)
+        self.assertCountEqual([b["id"] for b in resp.json["book"]], book_ids)
+
     @patch("awokado.resource.Transaction", autospec=True)
     def test_include_not_found(self, session_patch):
         self.patch_session(session_patch)
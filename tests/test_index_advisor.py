@@ -0,0 +1,131 @@
+from unittest import TestCase
+from unittest.mock import patch
+
+from awokado.filter_parser import FilterGrammar
+from awokado.index_advisor import (
+    advise,
+    get_resources,
+    normalize_key,
+    parse_index_def,
+    required_indexes,
+    STATUS_MISMATCHED,
+    STATUS_MISSING,
+)
+from tests.test_app.resources import BookResource, StoreResource
+
+
+def index(name: str, table: str, definition: str):
+    return parse_index_def(
+        name, f"CREATE INDEX {name} ON public.{table} {definition}"
+    )
+
+
+class IndexAdvisorTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        # resources are registered when instantiated
+        BookResource()
+
+    def test_parse_index_def(self):
+        parsed = index(
+            "books_search",
+            "books",
+            "USING gin (to_tsvector('simple'::regconfig, (title)::text))",
+        )
+        self.assertEqual("gin", parsed.method)
+        self.assertEqual(["to_tsvector('simple', title)"], parsed.keys)
+
+        parsed = index(
+            "books_title",
+            "books",
+            'USING btree ("title" DESC NULLS LAST, id) WHERE (id > 1)',
+        )
+        self.assertEqual(["title desc nulls last", "id"], parsed.keys)
+        self.assertTrue(parsed.partial)
+
+        self.assertEqual("title", normalize_key("title ASC NULLS LAST"))
+        self.assertEqual("title desc", normalize_key("title DESC NULLS FIRST"))
+
+    def test_required_indexes(self):
+        specs = {
+            (spec.table.name, spec.method, spec.key): spec
+            for spec in required_indexes(BookResource())
+        }
+
+        self.assertIn(
+            "filter book.title", specs["books", "btree", "title"].reasons
+        )
+        self.assertIn(
+            "sort book.title",
+            specs["books", "btree", "title NULLS FIRST"].reasons,
+        )
+        # not nullable columns are sorted without NULLS FIRST
+        self.assertIn("sort book.id", specs["books", "btree", "id"].reasons)
+        self.assertIn(
+            "select_from of book",
+            specs["m2m_books_tags", "btree", "book_id"].reasons,
+        )
+        self.assertIn(("books", "btree", "title text_pattern_ops"), specs)
+        self.assertIn(("books", "gin", "title gin_trgm_ops"), specs)
+        self.assertIn(("books", "gin", "to_tsvector('simple', title)"), specs)
+        self.assertEqual(
+            "CREATE INDEX CONCURRENTLY ON books USING gin "
+            "(to_tsvector('simple', title));",
+            specs["books", "gin", "to_tsvector('simple', title)"].ddl,
+        )
+
+        with patch.object(
+            BookResource.Meta, "filterable", ("id",)
+        ), patch.object(BookResource.Meta, "sortable", ("id",)), patch.dict(
+            FilterGrammar.GRAMMARS, clear=True
+        ):
+            keys = {spec.key for spec in required_indexes(BookResource())}
+
+        self.assertNotIn("title", keys)
+        self.assertNotIn("title NULLS FIRST", keys)
+        self.assertNotIn("title gin_trgm_ops", keys)
+
+    def test_advise(self):
+        indexes = {
+            ("public", "stores"): [
+                index("stores_pkey", "stores", "USING btree (id)"),
+                index("stores_name", "stores", "USING btree (name)"),
+                index(
+                    "stores_status",
+                    "stores",
+                    "USING btree (status DESC NULLS LAST)",
+                ),
+            ],
+            ("public", "books"): [
+                index("books_pkey", "books", "USING btree (id)"),
+                index("books_store_id", "books", "USING btree (store_id)"),
+            ],
+        }
+
+        advices = {
+            advice.spec.key: advice
+            for advice in advise([StoreResource()], indexes)
+        }
+
+        self.assertEqual(
+            {"name NULLS FIRST"}, set(advices) & {"name", "name NULLS FIRST"}
+        )
+        self.assertEqual(STATUS_MISMATCHED, advices["name NULLS FIRST"].status)
+        self.assertEqual("stores_name", advices["name NULLS FIRST"].index)
+        self.assertIn(
+            "CREATE INDEX CONCURRENTLY ON stores (name NULLS FIRST);",
+            str(advices["name NULLS FIRST"]),
+        )
+        # DESC NULLS LAST index serves ASC NULLS FIRST backwards
+        self.assertNotIn("status NULLS FIRST", advices)
+        self.assertNotIn("status", advices)
+        self.assertNotIn("store_id", advices)
+        self.assertNotIn("id", advices)
+
+        advices = advise([StoreResource()], {})
+        self.assertTrue(advices)
+        self.assertTrue(all(a.status == STATUS_MISSING for a in advices))
+
+    def test_get_resources(self):
+        names = {resource.Meta.name for resource in get_resources()}
+        self.assertTrue({"book", "store", "author"} <= names)
@@ -0,0 +1,150 @@
+import threading
+from unittest import TestCase
+
+import falcon
+import sqlalchemy as sa
+from falcon import testing
+
+from awokado.metrics import (
+    CONTENT_TYPE,
+    Counter,
+    Histogram,
+    MeteredQueuePool,
+    Metrics,
+    MetricsMiddleware,
+    MetricsResource,
+)
+from awokado.query_stats import QueryStats
+from tests.test_app.resources import HealthCheckResource
+
+
+class MetricsTest(TestCase):
+    def test_counter(self):
+        counter = Counter("requests_total", "Requests", ("resource",))
+        counter.inc(("book",))
+        counter.inc(("book",), 2)
+
+        threads = [
+            threading.Thread(target=counter.inc, args=(("author",),))
+            for _ in range(4)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(counter.shards), 5)
+        self.assertEqual(
+            list(counter.render()),
+            [
+                "# HELP requests_total Requests",
+                "# TYPE requests_total counter",
+                'requests_total{resource="author"} 4',
+                'requests_total{resource="book"} 3',
+            ],
+        )
+
+    def test_histogram(self):
+        histogram = Histogram("latency", "Latency", ("method",), (0.1, 1))
+        histogram.observe(0.05, ("GET",))
+        histogram.observe(0.1, ("GET",))
+        histogram.observe(0.5, ("GET",))
+        histogram.observe(2.5, ("GET",))
+
+        self.assertEqual(
+            list(histogram.render((("pool", 'a"b'),), header=False)),
+            [
+                'latency_bucket{pool="a\\"b",method="GET",le="0.1"} 2',
+                'latency_bucket{pool="a\\"b",method="GET",le="1"} 3',
+                'latency_bucket{pool="a\\"b",method="GET",le="+Inf"} 4',
+                'latency_sum{pool="a\\"b",method="GET"} 3.15',
+                'latency_count{pool="a\\"b",method="GET"} 4',
+            ],
+        )
+
+    def test_pools(self):
+        engine = sa.create_engine(
+            "sqlite:///:memory:", poolclass=MeteredQueuePool, pool_size=2
+        )
+        with engine.connect() as connection:
+            connection.execute("SELECT 1")
+            metrics = Metrics().render({"primary": engine})
+            self.assertIn(
+                'awokado_db_pool_checked_out{pool="primary"} 1', metrics
+            )
+
+        metrics = Metrics().render({"primary": engine})
+        self.assertIn('awokado_db_pool_size{pool="primary"} 2', metrics)
+        self.assertIn('awokado_db_pool_checked_out{pool="primary"} 0', metrics)
+        self.assertIn('awokado_db_pool_checked_in{pool="primary"} 1', metrics)
+        self.assertIn('awokado_db_pool_overflow{pool="primary"} -1', metrics)
+        self.assertIn(
+            'awokado_db_pool_wait_seconds_count{pool="primary"} 1', metrics
+        )
+        self.assertEqual(
+            metrics.count("# TYPE awokado_db_pool_wait_seconds histogram"), 1
+        )
+
+    def test_observe_request(self):
+        registry = Metrics()
+        stats = QueryStats()
+        stats.add("read__execute_query", 0.01, 20)
+        registry.observe_request("book", "GET", "200", 0.2, 1000, stats)
+
+        metrics = registry.render({})
+        self.assertIn(
+            'awokado_requests_total{resource="book",method="GET",status="200"} 1',
+            metrics,
+        )
+        self.assertIn(
+            'awokado_response_size_bytes_bucket{resource="book",method="GET",'
+            'status="200",le="1024"} 1',
+            metrics,
+        )
+        self.assertIn(
+            'awokado_db_rows_total{resource="book",method="GET"} 20', metrics
+        )
+        self.assertIn(
+            'awokado_db_queries_total{resource="book",method="GET"} 1', metrics
+        )
+
+
+class MetricsResourceTest(testing.TestCase):
+    def setUp(self):
+        super().setUp()
+        self.registry = Metrics()
+        self.app = falcon.API(middleware=[MetricsMiddleware(self.registry)])
+        self.app.add_route("/v1/healthcheck", HealthCheckResource())
+        self.app.add_route(
+            "/metrics", MetricsResource(engines={}, registry=self.registry)
+        )
+
+    def test_metrics(self):
+        self.simulate_get("/v1/healthcheck")
+        self.simulate_get("/v1/healthcheck")
+        self.simulate_get("/v1/unknown/")
+
+        api_response = self.simulate_get("/metrics")
+        self.assertEqual(api_response.status, "200 OK")
+        self.assertEqual(api_response.headers["content-type"], CONTENT_TYPE)
+
+        metrics = api_response.text
+        self.assertIn(
+            'awokado_requests_total{resource="healthcheck",method="GET",'
+            'status="200"} 2',
+            metrics,
+        )
+        self.assertIn(
+            'awokado_requests_total{resource="",method="GET",status="404"} 1',
+            metrics,
+        )
+        self.assertIn(
+            'awokado_request_duration_seconds_count{resource="healthcheck",'
+            'method="GET",status="200"} 2',
+            metrics,
+        )
+        self.assertIn(
+            'awokado_response_size_bytes_sum{resource="healthcheck",'
+            'method="GET",status="200"} 4',
+            metrics,
+        )
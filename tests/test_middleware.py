@@ -1,6 +1,18 @@
 from unittest.mock import patch
 
+import falcon
+import sqlalchemy as sa
+
+from awokado.middleware import HttpMiddleware
+from awokado.query_stats import (
+    instrument_engine,
+    subscribe_stages,
+    unsubscribe_stages,
+)
+from awokado.utils import api_exception_handler
 from tests.base import BaseAPITest
+from tests.test_app import models as m
+from tests.test_app.resources import AuthorResource
 from .test_app.routes import api
 
 
@@ -109,3 +121,164 @@ class ProfilingMiddlewareTest(BaseAPITest):
 
         self.assertTrue(open_patch.key.endswith(".prof"))
         self.assertIsNotNone(open_patch.write_data)
+
+
+class ExplainMiddlewareTest(BaseAPITest):
+    def setUp(self):
+        super().setUp()
+        self.app = api
+
+    @patch("awokado.resource.Transaction", autospec=True)
+    def test_explain(self, session_patch):
+        self.patch_session(session_patch)
+
+        author_id = self.create_author("Steven X")
+        self.session.execute(
+            sa.insert(m.Book).values(
+                {m.Book.title: "Some Book", m.Book.author_id: author_id}
+            )
+        )
+
+        api_response = self.simulate_get(
+            "/v1/author/", query_string="explain=1&include=books"
+        )
+        self.assertEqual(api_response.status, "200 OK", api_response.json)
+
+        plans = api_response.json["meta"]["debug"]["explain"]
+        # the list query and the included books one
+        self.assertGreaterEqual(len(plans), 2)
+        for plan in plans:
+            self.assertTrue(plan["statement"].lstrip().startswith("SELECT"))
+            self.assertIn("Plan", plan["plan"][0])
+            self.assertNotIn("Execution Time", plan["plan"][0])
+
+        self.assertTrue(any("book" in plan["statement"] for plan in plans[1:]))
+
+    @patch("awokado.resource.Transaction", autospec=True)
+    def test_explain_analyze(self, session_patch):
+        self.patch_session(session_patch)
+
+        author_id = self.create_author("Steven X")
+
+        api_response = self.simulate_get(
+            f"/v1/author/{author_id}", query_string="explain=analyze"
+        )
+        self.assertEqual(api_response.status, "200 OK", api_response.json)
+        self.assertEqual(api_response.json["author"][0]["name"], "Steven X")
+
+        plans = api_response.json["meta"]["debug"]["explain"]
+        self.assertTrue(plans)
+        self.assertIn("Execution Time", plans[0]["plan"][0])
+
+    @patch("awokado.resource.Transaction", autospec=True)
+    def test_no_explain(self, session_patch):
+        self.patch_session(session_patch)
+
+        self.create_author("Steven X")
+
+        api_response = self.simulate_get("/v1/author/")
+        self.assertNotIn("debug", api_response.json["meta"])
+
+        api_response = self.simulate_get(
+            "/v1/author/", query_string="explain=0"
+        )
+        self.assertNotIn("debug", api_response.json["meta"])
+
+        with patch("awokado.middleware.settings.AWOKADO_DEBUG", False):
+            api_response = self.simulate_get(
+                "/v1/author/", query_string="explain=1"
+            )
+        self.assertNotIn("debug", api_response.json["meta"])
+
+
+class QueryStatsMiddlewareTest(BaseAPITest):
+    def setUp(self):
+        super().setUp()
+        instrument_engine(self._engine)
+
+        self.stats = []
+        self.app = falcon.API(
+            middleware=[
+                HttpMiddleware(
+                    query_stats_hook=lambda req, stats: self.stats.append(stats)
+                )
+            ]
+        )
+        self.app.add_route("/v1/author/", AuthorResource())
+        self.app.add_error_handler(Exception, api_exception_handler)
+
+    @patch("awokado.resource.Transaction", autospec=True)
+    def test_query_stats(self, session_patch):
+        self.patch_session(session_patch)
+
+        self.create_author("Steven X")
+        self.create_author("Stephen King")
+
+        timings = []
+        subscribe_stages(timings.append)
+        try:
+            api_response = self.simulate_get(
+                "/v1/author/", query_string="include=books"
+            )
+        finally:
+            unsubscribe_stages(timings.append)
+        self.assertEqual(api_response.status, "200 OK", api_response.json)
+
+        self.assertEqual(
+            [(t.resource, t.stage) for t in timings],
+            [
+                ("author", "auth"),
+                ("author", "read__query"),
+                ("author", "read__filtering"),
+                ("author", "read__sorting"),
+                ("author", "read__pagination"),
+                ("author", "read__execute_query"),
+                ("author", "read__includes"),
+                ("author", "read__serializing"),
+            ],
+        )
+
+        self.assertEqual(len(self.stats), 1)
+        stats = self.stats[0]
+        self.assertGreaterEqual(stats.count, 1)
+        self.assertEqual(stats.stages["read__execute_query"].rows, 2)
+
+        server_timing = api_response.headers["server-timing"]
+        self.assertTrue(server_timing.startswith("db;dur="))
+        self.assertIn("db-read__execute_query;dur=", server_timing)
+        self.assertIn("stage-read__serializing;dur=", server_timing)
+        self.assertIn("app;dur=", server_timing)
+
+    @patch("awokado.resource.Transaction", autospec=True)
+    def test_disabled(self, session_patch):
+        self.patch_session(session_patch)
+
+        with patch(
+            "awokado.middleware.settings.AWOKADO_QUERY_STATS",
+            False,
+            create=True,
+        ):
+            api_response = self.simulate_get("/v1/author/")
+
+        self.assertEqual(api_response.status, "200 OK", api_response.json)
+        self.assertNotIn("server-timing", api_response.headers)
+        self.assertEqual(self.stats, [])
+
+    @patch("awokado.resource.Transaction", autospec=True)
+    def test_query_budget(self, session_patch):
+        self.patch_session(session_patch)
+
+        self.create_author("Steven X")
+
+        with patch(
+            "awokado.query_stats.settings.AWOKADO_QUERY_BUDGET_RAISE",
+            True,
+            create=True,
+        ), patch.object(AuthorResource.Meta, "max_queries", 0):
+            api_response = self.simulate_get("/v1/author/")
+
+        self.assertEqual(api_response.status, "500 Internal Server Error")
+        self.assertIn(
+            "Query budget of author exceeded: more than 0 statements",
+            api_response.json["error"]["message"],
+        )
@@ -0,0 +1,127 @@
+from unittest.mock import patch
+
+import sqlalchemy as sa
+
+from tests.base import BaseAPITest
+from tests.test_app import models as m
+from tests.test_app.resources import BookResource, TagResource
+from tests.test_app.routes import api
+
+
+class NestedIncludeTest(BaseAPITest):
+    def setup_dataset(self):
+        self.author_id = self.create_author("Steven King")
+        self.other_author_id = self.create_author("Agatha Christie")
+        self.tag1_id = self.create_tag("horror")
+        self.tag2_id = self.create_tag("fantasy")
+
+        self.book_ids = []
+        for title, author_id in (
+            ("It", self.author_id),
+            ("The Dark Tower", self.author_id),
+            ("Poirot", self.other_author_id),
+        ):
+            self.book_ids.append(
+                self.session.execute(
+                    sa.insert(m.Book)
+                    .values({m.Book.title: title, m.Book.author_id: author_id})
+                    .returning(m.Book.id)
+                ).scalar()
+            )
+
+        self.session.execute(
+            sa.insert(m.M2M_Book_Tag).values(
+                [
+                    {
+                        m.M2M_Book_Tag.c.book_id: self.book_ids[0],
+                        m.M2M_Book_Tag.c.tag_id: self.tag1_id,
+                    },
+                    {
+                        m.M2M_Book_Tag.c.book_id: self.book_ids[1],
+                        m.M2M_Book_Tag.c.tag_id: self.tag1_id,
+                    },
+                    {
+                        m.M2M_Book_Tag.c.book_id: self.book_ids[1],
+                        m.M2M_Book_Tag.c.tag_id: self.tag2_id,
+                    },
+                ]
+            )
+        )
+
+    def setUp(self):
+        super().setUp()
+        self.app = api
+        self.setup_dataset()
+
+    @patch("awokado.resource.Transaction", autospec=True)
+    def test_nested_include(self, session_patch):
+        self.patch_session(session_patch)
+
+        resp = self.simulate_get(
+            f"/v1/author/{self.author_id}", query_string="include=books.tags"
+        )
+        self.assertEqual(resp.status, "200 OK", resp.text)
+        self.assertCountEqual(
+            [b["id"] for b in resp.json["book"]], self.book_ids[:2]
+        )
+        # the tag of both books is included once
+        self.assertCountEqual(
+            [t["id"] for t in resp.json["tag"]], [self.tag1_id, self.tag2_id]
+        )
+
+    @patch("awokado.resource.Transaction", autospec=True)
+    def test_nested_include_one_query_per_relation(self, session_patch):
+        self.patch_session(session_patch)
+
+        get_books = patch.object(
+            BookResource,
+            "get_by_author_ids",
+            autospec=True,
+            side_effect=BookResource.get_by_author_ids,
+        )
+        get_tags = patch.object(
+            TagResource,
+            "get_by_book_ids",
+            autospec=True,
+            side_effect=TagResource.get_by_book_ids,
+        )
+        with get_books as get_books_mock, get_tags as get_tags_mock:
+            resp = self.simulate_get(
+                "/v1/author/", query_string="include=books.tags,books"
+            )
+            self.assertEqual(resp.status, "200 OK", resp.text)
+
+        get_books_mock.assert_called_once()
+        get_tags_mock.assert_called_once()
+        # tags are loaded by ids of all included books
+        ctx = get_tags_mock.call_args[0][2]
+        self.assertCountEqual(ctx.obj_ids, self.book_ids)
+
+        self.assertEqual(len(resp.json["payload"]["author"]), 2)
+        self.assertEqual(len(resp.json["payload"]["book"]), 3)
+        self.assertEqual(len(resp.json["payload"]["tag"]), 2)
+
+    @patch("awokado.resource.Transaction", autospec=True)
+    def test_include_of_requested_resource(self, session_patch):
+        self.patch_session(session_patch)
+
+        resp = self.simulate_get(
+            f"/v1/book/{self.book_ids[0]}", query_string="include=author.books"
+        )
+        self.assertEqual(resp.status, "200 OK", resp.text)
+        books = [b["id"] for b in resp.json["book"]]
+        self.assertEqual(books[0], self.book_ids[0])
+        self.assertCountEqual(books, self.book_ids[:2])
+        self.assertEqual(
+            [a["id"] for a in resp.json["author"]], [self.author_id]
+        )
+
+    @patch("awokado.resource.Transaction", autospec=True)
+    def test_nested_include_not_found(self, session_patch):
+        self.patch_session(session_patch)
+
+        resp = self.simulate_get(
+            "/v1/author/", query_string="include=books.xXx"
+        )
+        self.assertEqual(resp.status, "404 Not Found", resp.text)
+        self.assertEqual(resp.json["code"], "relation-not-found")
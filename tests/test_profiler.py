@@ -0,0 +1,113 @@
+import sys
+import tempfile
+import time
+from unittest import TestCase
+
+import falcon
+from falcon import testing
+
+from awokado.profiler import (
+    collapse_stack,
+    SamplingProfiler,
+    SamplingProfileResource,
+    SamplingProfilerMiddleware,
+)
+
+
+def busy_wait(seconds):
+    started = time.perf_counter()
+    while time.perf_counter() - started < seconds:
+        pass
+
+
+class SlowResource:
+    def on_get(self, req, resp):
+        busy_wait(float(req.get_param("seconds")))
+        resp.body = "OK"
+
+
+class SamplingProfilerTest(TestCase):
+    def test_collapse_stack(self):
+        stack = collapse_stack(sys._getframe(), "GET book")
+        self.assertTrue(stack.startswith("GET book;"))
+        self.assertTrue(
+            stack.endswith(";tests.test_profiler.test_collapse_stack")
+        )
+
+    def test_profiler(self):
+        profiler = SamplingProfiler(interval=0.001)
+
+        profiler.start_request("GET book")
+        busy_wait(0.05)
+        profiler.stop_request(keep=True)
+
+        profiler.start_request("GET author")
+        busy_wait(0.05)
+        profiler.stop_request(keep=False)
+
+        lines = profiler.collapsed().splitlines()
+        self.assertTrue(lines)
+        for line in lines:
+            stack, count = line.rsplit(" ", 1)
+            self.assertTrue(stack.startswith("GET book;"))
+            self.assertGreater(int(count), 0)
+
+        self.assertTrue(
+            any("tests.test_profiler.busy_wait" in line for line in lines)
+        )
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = profiler.save(directory, reset=True)
+            self.assertTrue(path.endswith(".collapsed"))
+            with open(path) as f:
+                self.assertEqual(f.read().splitlines(), lines)
+
+        self.assertEqual(profiler.collapsed(), "")
+
+
+class SamplingProfilerMiddlewareTest(testing.TestCase):
+    def setUp(self):
+        super().setUp()
+        self.profiler = SamplingProfiler(interval=0.001)
+        self.app = falcon.API(
+            middleware=[
+                SamplingProfilerMiddleware(
+                    self.profiler, rate=0, slow_threshold=0.05
+                )
+            ]
+        )
+        self.app.add_route("/slow", SlowResource())
+        self.app.add_route("/profile", SamplingProfileResource(self.profiler))
+
+    def test_slow_requests(self):
+        self.simulate_get("/slow", query_string="seconds=0.01")
+        self.assertEqual(self.profiler.collapsed(), "")
+        self.assertEqual(self.profiler.samples, {})
+
+        self.simulate_get("/slow", query_string="seconds=0.1")
+
+        api_response = self.simulate_get("/profile", query_string="reset=true")
+        self.assertEqual(api_response.status, "200 OK")
+        self.assertIn("GET SlowResource;", api_response.text)
+        self.assertIn("tests.test_profiler.busy_wait", api_response.text)
+
+        # the profile request itself is fast and dropped
+        self.assertEqual(self.simulate_get("/profile").text, "")
+
+    def test_rate(self):
+        self.app = falcon.API(
+            middleware=[SamplingProfilerMiddleware(self.profiler, rate=1)]
+        )
+        self.app.add_route("/slow", SlowResource())
+
+        self.simulate_get("/slow", query_string="seconds=0.05")
+        self.assertIn("GET SlowResource;", self.profiler.collapsed())
+
+    def test_disabled(self):
+        self.app = falcon.API(
+            middleware=[SamplingProfilerMiddleware(self.profiler, rate=0)]
+        )
+        self.app.add_route("/slow", SlowResource())
+
+        self.simulate_get("/slow", query_string="seconds=0.01")
+        self.assertIsNone(self.profiler.thread)
@@ -0,0 +1,87 @@
+from unittest.mock import patch
+
+import sqlalchemy as sa
+
+from awokado.query_cache import query_cache
+from tests.base import BaseAPITest
+from tests.test_app import models as m
+from tests.test_app.routes import api
+
+
+class QueryCacheTest(BaseAPITest):
+    def setup_dataset(self):
+        self.book_ids = [
+            self.session.execute(
+                sa.insert(m.Book)
+                .values({m.Book.title: title})
+                .returning(m.Book.id)
+            ).scalar()
+            for title in ("first", "second")
+        ]
+
+    def setUp(self):
+        super().setUp()
+        self.app = api
+        self.setup_dataset()
+        query_cache.clear()
+
+    @patch("awokado.resource.Transaction", autospec=True)
+    def test_read(self, session_patch):
+        self.patch_session(session_patch)
+
+        for _ in range(2):
+            for book_id, title in zip(self.book_ids, ("first", "second")):
+                resp = self.simulate_get(f"/v1/book/{book_id}")
+                self.assertEqual(resp.status, "200 OK", resp.text)
+                self.assertEqual(resp.json["book"][0]["title"], title)
+
+        stats = query_cache.stats()
+        self.assertEqual(stats["misses"], 1)
+        self.assertEqual(stats["hits"], 3)
+
+        resp = self.simulate_get("/v1/book/", query_string="title[eq]=second")
+        self.assertEqual(resp.status, "200 OK", resp.text)
+        self.assertEqual(
+            [b["id"] for b in resp.json["payload"]["book"]], self.book_ids[1:]
+        )
+        self.assertEqual(query_cache.stats()["misses"], 2)
+
+        resp = self.simulate_get("/v1/book/", query_string="title[eq]=first")
+        self.assertEqual(
+            [b["id"] for b in resp.json["payload"]["book"]], self.book_ids[:1]
+        )
+        stats = query_cache.stats()
+        self.assertEqual(stats["hits"], 4)
+
+        # filter values are bind params, the statement is compiled once
+        self.assertEqual(stats["compiled_misses"], 2)
+        self.assertEqual(stats["compiled_hits"], 4)
+
+    @patch("awokado.resource.Transaction", autospec=True)
+    def test_compiled_pages(self, session_patch):
+        self.patch_session(session_patch)
+
+        ids = []
+        query_string = "limit=1&sort=title"
+        while True:
+            resp = self.simulate_get("/v1/book/", query_string=query_string)
+            self.assertEqual(resp.status, "200 OK", resp.text)
+            ids.extend(b["id"] for b in resp.json["payload"]["book"])
+
+            cursor = resp.json["meta"]["next"]
+            if cursor is None:
+                break
+            query_string = f"limit=1&sort=title&after={cursor}"
+
+        self.assertEqual(ids, self.book_ids)
+
+        # pages after cursors are one statement, counts aren't cached
+        stats = query_cache.stats()
+        self.assertEqual(stats["compiled_misses"], 2)
+        self.assertEqual(stats["compiled_hits"], 1)
+
+        resp = self.simulate_get("/v1/book/", query_string="limit=1&offset=1")
+        self.assertEqual(
+            [b["id"] for b in resp.json["payload"]["book"]], self.book_ids[1:]
+        )
+        self.assertEqual(query_cache.stats()["compiled_misses"], 3)
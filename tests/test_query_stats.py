@@ -0,0 +1,204 @@
+import contextvars
+import threading
+from unittest import TestCase
+from unittest.mock import patch
+
+import sqlalchemy as sa
+from sqlalchemy.pool import StaticPool
+
+from awokado.query_stats import (
+    get_query_stats,
+    get_stage,
+    instrument_engine,
+    QueryBudget,
+    QueryBudgetExceeded,
+    QueryStats,
+    StageTiming,
+    start_query_stats,
+    stop_query_stats,
+    subscribe_stages,
+    track_stage,
+    unsubscribe_stages,
+)
+from tests.test_app.resources import BookResource
+
+
+class QueryStatsTest(TestCase):
+    def setUp(self):
+        # one connection, so threads see the same in-memory database
+        self.engine = instrument_engine(
+            sa.create_engine(
+                "sqlite://",
+                poolclass=StaticPool,
+                connect_args={"check_same_thread": False},
+            )
+        )
+        self.engine.execute("CREATE TABLE item (id INTEGER)")
+        self.engine.execute("INSERT INTO item VALUES (1), (2), (3)")
+
+    def test_stats(self):
+        token = start_query_stats()
+        try:
+            with track_stage("read__execute_query"):
+                self.assertEqual(get_stage(), "read__execute_query")
+                self.engine.execute("UPDATE item SET id = id + 1").close()
+                self.engine.execute("SELECT id FROM item").fetchall()
+
+            self.engine.execute("SELECT id FROM item WHERE id = 2").fetchall()
+            stats = get_query_stats()
+        finally:
+            stop_query_stats(token)
+
+        self.assertIsNone(get_query_stats())
+        self.assertEqual(get_stage(), "request")
+
+        self.assertEqual(stats.count, 3)
+        self.assertEqual(set(stats.stages), {"read__execute_query", "request"})
+        self.assertEqual(stats.stages["read__execute_query"].count, 2)
+        self.assertEqual(stats.stages["read__execute_query"].rows, 3)
+        self.assertEqual(stats.stages["request"].count, 1)
+        self.assertGreater(stats.duration, 0)
+        self.assertEqual(
+            stats.to_dict()["stages"]["request"]["count"], stats.count - 2
+        )
+
+    def test_not_collected(self):
+        # statements out of requests aren't recorded
+        self.engine.execute("SELECT id FROM item").fetchall()
+        self.assertIsNone(get_query_stats())
+
+        instrument_engine(self.engine)
+        token = start_query_stats()
+        try:
+            self.engine.execute("SELECT id FROM item").fetchall()
+            # listeners are added once
+            self.assertEqual(get_query_stats().count, 1)
+        finally:
+            stop_query_stats(token)
+
+    def test_threads(self):
+        token = start_query_stats()
+        try:
+            with track_stage("read__includes"):
+                thread = threading.Thread(
+                    target=contextvars.copy_context().run,
+                    args=(self.engine.execute, "SELECT id FROM item"),
+                )
+                thread.start()
+                thread.join()
+
+            stats = get_query_stats()
+        finally:
+            stop_query_stats(token)
+
+        self.assertEqual(stats.stages["read__includes"].count, 1)
+
+    def test_server_timing(self):
+        stats = QueryStats()
+        stats.add("read__execute_query", 0.002, 10)
+        stats.add("read__includes", 0.0005, 2)
+
+        header = stats.server_timing()
+        metrics = header.split(", ")
+        self.assertEqual(metrics[0], 'db;dur=2.50;desc="2 queries/12 rows"')
+        self.assertEqual(
+            metrics[1], 'db-read__execute_query;dur=2.00;desc="1 queries"'
+        )
+        self.assertTrue(metrics[-1].startswith("app;dur="))
+
+    def test_stage_subscribers(self):
+        timings = []
+        subscribe_stages(timings.append)
+        subscribe_stages(timings.append)
+        try:
+            with track_stage("create", "book"):
+                with track_stage("read__query", "book"):
+                    pass
+
+            with self.assertRaises(ValueError):
+                with track_stage("delete", "book"):
+                    raise ValueError()
+        finally:
+            unsubscribe_stages(timings.append)
+
+        with track_stage("update", "book"):
+            pass
+
+        self.assertEqual(
+            [(t.resource, t.stage, t.failed) for t in timings],
+            [
+                ("book", "read__query", False),
+                ("book", "create", False),
+                ("book", "delete", True),
+            ],
+        )
+        self.assertIsInstance(timings[0], StageTiming)
+        # outer stages include nested ones
+        self.assertGreaterEqual(timings[1].duration, timings[0].duration)
+
+    def test_stage_times(self):
+        token = start_query_stats()
+        try:
+            with track_stage("read__includes", "book"):
+                self.engine.execute("SELECT id FROM item").fetchall()
+            with track_stage("read__includes", "book"):
+                pass
+
+            stats = get_query_stats()
+        finally:
+            stop_query_stats(token)
+
+        self.assertEqual(list(stats.stage_times), ["read__includes"])
+        self.assertGreater(stats.stage_times["read__includes"], 0)
+        self.assertIn("stage-read__includes;dur=", stats.server_timing())
+
+    def test_budget(self):
+        token = start_query_stats()
+        stats = get_query_stats()
+        stats.budget = QueryBudget(max_queries=2, max_rows=4, raise_exc=True)
+        try:
+            # sqlite has rowcount of changed rows only
+            self.engine.execute("UPDATE item SET id = id").close()
+            with self.assertRaises(QueryBudgetExceeded) as cm:
+                self.engine.execute("UPDATE item SET id = id").close()
+        finally:
+            stop_query_stats(token)
+
+        self.assertIn("more than 4 rows (6)", cm.exception.message)
+        self.assertEqual(cm.exception.statement, "UPDATE item SET id = id")
+        # the stack ends in the code executing the statement
+        self.assertIn("test_budget", cm.exception.stack[-1])
+        self.assertEqual(
+            set(cm.exception.to_dict()), {"message", "statement", "stack"}
+        )
+
+    def test_budget_repeats(self):
+        token = start_query_stats()
+        stats = get_query_stats()
+        stats.budget = QueryBudget(max_repeats=2)
+        try:
+            with self.assertLogs("awokado.query_stats", "WARNING") as logs:
+                for item_id in range(5):
+                    self.engine.execute(
+                        sa.text("SELECT id FROM item WHERE id = :id"),
+                        id=item_id,
+                    )
+                self.engine.execute("SELECT 1")
+        finally:
+            stop_query_stats(token)
+
+        # reported once
+        self.assertEqual(len(logs.output), 1)
+        self.assertIn("statement repeated more than 2 times", logs.output[0])
+        self.assertIn("WHERE id = ?", logs.output[0])
+
+    def test_budget_from_resource(self):
+        resource = BookResource()
+        with patch.object(resource.Meta, "max_queries", 3):
+            budget = QueryBudget.from_resource(resource)
+
+        self.assertEqual(budget.name, "book")
+        self.assertEqual(budget.max_queries, 3)
+        self.assertIsNone(budget.max_rows)
+        self.assertEqual(budget.max_repeats, 5)
+        self.assertFalse(budget.raise_exc)
@@ -3,6 +3,7 @@ from unittest.mock import patch
 
 import sqlalchemy as sa
 
+from awokado.consts import TOTAL_KIND_EXACT
 from awokado.response import Response
 from tests.base import BaseAPITest
 from tests.test_app import models as m
@@ -56,7 +57,10 @@ class ReadTest(BaseAPITest):
             resp.json,
             {
                 Response.PAYLOAD_KEYWORD: {"author": []},
-                Response.META_KEYWORD: {Response.TOTAL_KEYWORD: 0},
+                Response.META_KEYWORD: {
+                    Response.TOTAL_KEYWORD: 0,
+                    Response.TOTAL_KIND_KEYWORD: TOTAL_KIND_EXACT,
+                },
             },
         )
 
@@ -0,0 +1,201 @@
+from unittest import TestCase
+from unittest.mock import MagicMock, patch
+
+import sqlalchemy as sa
+from clavis import Transaction
+
+from awokado.cache import (
+    get_read_tables,
+    is_user_scoped,
+    MemoryCacheBackend,
+    read_cache,
+)
+from awokado.db import replica_router
+from awokado.utils import AuthBundle, PRIMARY_UNTIL_HEADER
+from tests.base import BaseAPITest, Session
+from tests.test_app import models as m
+from tests.test_app.resources import BookResource, StoreResource
+from tests.test_app.resources.author import AuthorAuth
+from tests.test_app.routes import api
+
+
+class MemoryCacheBackendTest(TestCase):
+    def test_lru(self):
+        backend = MemoryCacheBackend(2)
+        backend.set("a", b"1")
+        backend.set("b", b"2")
+        self.assertEqual(backend.get("a"), b"1")
+
+        backend.set("c", b"3")
+        self.assertIsNone(backend.get("b"))
+        self.assertEqual(backend.get("a"), b"1")
+        self.assertEqual(backend.get("c"), b"3")
+
+    def test_ttl(self):
+        backend = MemoryCacheBackend(2)
+        with patch("awokado.cache.time.monotonic", return_value=100):
+            backend.set("a", b"1", ttl=10)
+
+        with patch("awokado.cache.time.monotonic", return_value=105):
+            self.assertEqual(backend.get("a"), b"1")
+
+        with patch("awokado.cache.time.monotonic", return_value=110):
+            self.assertIsNone(backend.get("a"))
+
+    def test_versions(self):
+        backend = MemoryCacheBackend(2)
+        backend.bump_versions(["books", "stores"])
+        backend.bump_versions(["books"])
+        self.assertEqual(
+            backend.get_versions(["books", "stores", "x"]), [2, 1, 0]
+        )
+
+    def test_read_tables(self):
+        self.assertEqual(
+            get_read_tables(BookResource()),
+            {"books", "m2m_books_tags", "authors"},
+        )
+        self.assertEqual(
+            get_read_tables(BookResource(), ["store"]),
+            {"books", "m2m_books_tags", "authors", "stores"},
+        )
+
+    def test_user_scoped(self):
+        book = BookResource()
+        self.assertFalse(is_user_scoped(book))
+        self.assertFalse(is_user_scoped(book, ["store"]))
+        self.assertTrue(is_user_scoped(book, ["author"]))
+        self.assertTrue(is_user_scoped(book, ["store.book_ids.author"]))
+
+
+class ReadCacheTest(BaseAPITest):
+    def setUp(self):
+        super().setUp()
+        self.app = api
+        read_cache.clear()
+
+        self.store_id = self.session.execute(
+            sa.insert(m.Store)
+            .values({m.Store.name: "bookstore"})
+            .returning(m.Store.id)
+        ).scalar()
+        self.author_id = self.create_author("Stephen King")
+        self.session.execute(
+            sa.insert(m.Book).values(
+                {
+                    m.Book.title: "It",
+                    m.Book.store_id: self.store_id,
+                    m.Book.author_id: self.author_id,
+                }
+            )
+        )
+
+    def tearDown(self):
+        read_cache.clear()
+        super().tearDown()
+
+    @patch("awokado.resource.Transaction", autospec=True)
+    def test_read_cache(self, session_patch):
+        self.patch_session(session_patch)
+
+        with patch.object(BookResource.Meta, "cache_ttl", 60), patch.object(
+            BookResource,
+            "read_handler",
+            autospec=True,
+            side_effect=BookResource.read_handler,
+        ) as read_handler:
+            resp = self.simulate_get(
+                "/v1/book/", query_string="include=store&sort=title"
+            )
+            self.assertEqual(resp.status, "200 OK", resp.text)
+
+            # params are normalized
+            cached = self.simulate_get(
+                "/v1/book/", query_string="sort=title&include=store"
+            )
+            self.assertEqual(cached.json, resp.json)
+            self.assertEqual(read_handler.call_count, 1)
+
+            # other params are cached separately
+            resp = self.simulate_get("/v1/book/", query_string="limit=1")
+            self.assertEqual(resp.status, "200 OK", resp.text)
+            self.assertEqual(read_handler.call_count, 2)
+
+            # writes of stores invalidate responses with included stores
+            resp = self.simulate_post(
+                "/v1/store", json={"store": [{"name": "new"}]}
+            )
+            self.assertEqual(resp.status, "200 OK", resp.text)
+
+            resp = self.simulate_get("/v1/book/", query_string="limit=1")
+            self.assertEqual(read_handler.call_count, 2)
+
+            resp = self.simulate_get(
+                "/v1/book/", query_string="include=store&sort=title"
+            )
+            self.assertEqual(resp.status, "200 OK", resp.text)
+            self.assertEqual(read_handler.call_count, 3)
+
+    @patch("awokado.resource.Transaction", autospec=True)
+    def test_included_auth(self, session_patch):
+        self.patch_session(session_patch)
+
+        def can_read(ctx, query, skip_exc=False):
+            # only the first user reads authors
+            return query if ctx.uid == 1 else query.where(sa.false())
+
+        with patch.object(BookResource.Meta, "cache_ttl", 60), patch.object(
+            AuthorAuth, "can_read", side_effect=can_read
+        ), patch.object(
+            BookResource,
+            "auth",
+            side_effect=[AuthBundle(1, ""), AuthBundle(2, "")],
+        ):
+            resp = self.simulate_get("/v1/book/", query_string="include=author")
+            self.assertEqual(resp.status, "200 OK", resp.text)
+            self.assertEqual(len(resp.json["payload"]["author"]), 1)
+
+            # included records of other users aren't cached together
+            resp = self.simulate_get("/v1/book/", query_string="include=author")
+            self.assertEqual(resp.status, "200 OK", resp.text)
+            self.assertEqual(resp.json["payload"]["author"], [])
+
+    @patch("awokado.resource.Transaction", autospec=True)
+    def test_replica_reads_not_cached(self, session_patch):
+        # the replica lags behind: it doesn't see the uncommitted
+        # data of the test transaction
+        replica_conn = self._engine.connect()
+        self.addCleanup(replica_conn.close)
+        sessions = {"replica": Session(bind=replica_conn)}
+
+        def transaction(url, engine=None):
+            class X:
+                session = sessions.get(url, self.session)
+
+            mock_client = MagicMock(spec=Transaction)
+            mock_client.__enter__.return_value = X
+            return mock_client
+
+        session_patch.side_effect = transaction
+
+        with patch.object(StoreResource.Meta, "cache_ttl", 60), patch.object(
+            replica_router, "replicas", [("replica", None)]
+        ), patch.object(replica_router, "get_lag", return_value=1):
+            resp = self.simulate_post(
+                "/v1/store", json={"store": [{"name": "new"}]}
+            )
+            self.assertEqual(resp.status, "200 OK", resp.text)
+            until = resp.headers[PRIMARY_UNTIL_HEADER]
+
+            resp = self.simulate_get("/v1/store/")
+            self.assertEqual(resp.status, "200 OK", resp.text)
+            names = [s["name"] for s in resp.json["payload"]["store"]]
+            self.assertNotIn("new", names)
+
+            # the stale replica response isn't cached for primary reads
+            resp = self.simulate_get(
+                "/v1/store/", headers={PRIMARY_UNTIL_HEADER: until}
+            )
+            self.assertEqual(resp.status, "200 OK", resp.text)
+            names = [s["name"] for s in resp.json["payload"]["store"]]
+            self.assertIn("new", names)
@@ -0,0 +1,114 @@
+import time
+from unittest import TestCase
+from unittest.mock import MagicMock, patch
+
+import falcon
+from falcon import testing
+
+from awokado.db_helper import ReplicaRouter
+from awokado.utils import (
+    is_pinned_to_primary,
+    pin_reads_to_primary,
+    PRIMARY_UNTIL_COOKIE,
+    PRIMARY_UNTIL_HEADER,
+)
+from tests.base import BaseAPITest
+from tests.test_app.routes import api
+
+
+class ReplicaRouterTest(TestCase):
+    def setUp(self):
+        self.primary = ("primary", MagicMock())
+        self.replicas = [("replica1", MagicMock()), ("replica2", MagicMock())]
+        self.lags = {"replica1": 0, "replica2": 0}
+        self.router = ReplicaRouter(self.primary, self.replicas, max_lag=10)
+
+        get_lag = patch.object(
+            self.router, "get_lag", side_effect=lambda url, _: self.lags[url]
+        )
+        get_lag.start()
+        self.addCleanup(get_lag.stop)
+
+    def test_round_robin(self):
+        chosen = [self.router.choose()[0] for _ in range(4)]
+        self.assertEqual(
+            chosen, ["replica1", "replica2", "replica1", "replica2"]
+        )
+
+    def test_lag(self):
+        self.lags["replica1"] = 30
+        self.assertEqual(self.router.choose()[0], "replica2")
+        self.assertEqual(self.router.choose()[0], "replica2")
+
+        # replica is down
+        self.lags["replica2"] = None
+        self.assertEqual(self.router.choose(), self.primary)
+
+    def test_pinned(self):
+        self.assertEqual(self.router.choose(pinned=True), self.primary)
+
+    def test_no_replicas(self):
+        router = ReplicaRouter(self.primary, [])
+        self.assertEqual(router.choose(), self.primary)
+
+    def test_lag_check_interval(self):
+        engine = MagicMock()
+        conn = engine.connect.return_value.__enter__.return_value
+        conn.execute.return_value.scalar.return_value = 3
+
+        router = ReplicaRouter(
+            self.primary, [("replica", engine)], lag_check_interval=5
+        )
+        self.assertEqual(router.get_lag("replica", engine), 3)
+        self.assertEqual(router.get_lag("replica", engine), 3)
+        self.assertEqual(conn.execute.call_count, 1)
+
+
+class ReadYourWritesTest(TestCase):
+    def test_pin(self):
+        req = falcon.Request(testing.create_environ())
+        resp = falcon.Response()
+        pin_reads_to_primary(req, resp)
+
+        until = resp.get_header(PRIMARY_UNTIL_HEADER)
+        self.assertGreater(float(until), time.time())
+        self.assertIn(PRIMARY_UNTIL_COOKIE, resp._cookies)
+
+        for headers in (
+            {PRIMARY_UNTIL_HEADER: until},
+            {"Cookie": f"{PRIMARY_UNTIL_COOKIE}={until}"},
+        ):
+            req = falcon.Request(testing.create_environ(headers=headers))
+            self.assertTrue(is_pinned_to_primary(req))
+
+        for headers in (
+            {},
+            {PRIMARY_UNTIL_HEADER: str(time.time() - 1)},
+            {PRIMARY_UNTIL_HEADER: "xXx"},
+            # forged deadlines past the window
+            {PRIMARY_UNTIL_HEADER: str(time.time() + 60)},
+            {PRIMARY_UNTIL_HEADER: "1e12"},
+            {PRIMARY_UNTIL_HEADER: "inf"},
+            {PRIMARY_UNTIL_HEADER: "nan"},
+        ):
+            req = falcon.Request(testing.create_environ(headers=headers))
+            self.assertFalse(is_pinned_to_primary(req))
+
+
+class WriteResponseTest(BaseAPITest):
+    def setUp(self):
+        super().setUp()
+        self.app = api
+
+    @patch("awokado.resource.Transaction", autospec=True)
+    def test_write_pins_reads(self, session_patch):
+        self.patch_session(session_patch)
+
+        with patch(
+            "awokado.resource.replica_router.replicas", [("replica", None)]
+        ):
+            resp = self.simulate_post(
+                "/v1/store", json={"store": [{"name": "bookstore"}]}
+            )
+        self.assertEqual(resp.status, "200 OK", resp.text)
+        self.assertIn(PRIMARY_UNTIL_HEADER, resp.headers)
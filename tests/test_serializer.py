@@ -0,0 +1,143 @@
+import datetime
+from decimal import Decimal
+from unittest import TestCase
+
+from marshmallow import fields, post_dump, Schema
+
+from awokado.serializer import get_converter, RowSerializer
+from tests.test_app.resources import (
+    AuthorResource,
+    BookResource,
+    StoreStatsResource,
+    TagStatsResource,
+)
+
+
+class Row(dict):
+    """Mapping row without attribute access, like result rows"""
+
+
+class UpperString(fields.String):
+    def _serialize(self, value, attr, obj, **kwargs):
+        value = super()._serialize(value, attr, obj, **kwargs)
+        return value.upper() if value else value
+
+
+class ExampleSchema(Schema):
+    id = fields.Int()
+    number = fields.Int(as_string=True)
+    price = fields.Float()
+    title = fields.Str(data_key="name")
+    flag = fields.Bool()
+    created = fields.DateTime()
+    created_on = fields.Date()
+    created_at = fields.Time()
+    custom_format = fields.DateTime(format="%Y/%m/%d")
+    ids = fields.List(fields.Int())
+    raw = fields.Raw()
+    upper = UpperString()
+    renamed = fields.Str(attribute="original")
+    constant = fields.Function(lambda obj: "constant")
+    decimal = fields.Decimal()
+    with_default = fields.Int(dump_default=42)
+    write_only = fields.Int(load_only=True)
+
+
+class SerializerTest(TestCase):
+    rows = [
+        Row(
+            id=1,
+            number=2,
+            price=Decimal("3.5"),
+            title="first",
+            flag="false",
+            created=datetime.datetime(2020, 1, 2, 3, 4, 5),
+            created_on=datetime.date(2020, 1, 2),
+            created_at=datetime.time(3, 4, 5),
+            custom_format=datetime.datetime(2020, 1, 2),
+            ids=[1, None, "3"],
+            raw={"a": 1},
+            upper="text",
+            original="original",
+            decimal=Decimal("1.10"),
+            write_only=1,
+        ),
+        Row(
+            id="2",
+            number=None,
+            price=1,
+            title=b"second",
+            flag=1,
+            created=None,
+            created_on=None,
+            created_at=None,
+            custom_format=None,
+            ids=None,
+            raw=None,
+            upper=None,
+            original=None,
+            decimal=None,
+            with_default=None,
+        ),
+        Row(id=3),
+    ]
+
+    def assert_same_dump(self, schema: Schema, rows):
+        serializer = RowSerializer.compile(schema)
+        self.assertIsNotNone(serializer)
+
+        expected = Schema.dump(schema, rows, many=True)
+        result = serializer.dump(rows)
+
+        self.assertEqual(result, expected)
+        for rec, expected_rec in zip(result, expected):
+            self.assertEqual(list(rec), list(expected_rec))
+            for key, value in rec.items():
+                self.assertIs(type(value), type(expected_rec[key]), key)
+
+    def test_same_as_marshmallow(self):
+        self.assert_same_dump(ExampleSchema(), self.rows)
+
+    def test_resources(self):
+        rows = [
+            Row(id=1, title="book", author=2, author_name="A", tags=[1, 2]),
+            Row(id=2, title=None, store=1, tags=[]),
+        ]
+        self.assert_same_dump(BookResource(), rows)
+
+        for resource in (AuthorResource, StoreStatsResource, TagStatsResource):
+            resource = resource()
+            rows = [
+                Row(
+                    {
+                        name: [1] if isinstance(field, fields.List) else 1
+                        for name, field in resource.dump_fields.items()
+                    }
+                ),
+                Row({name: None for name in resource.dump_fields}),
+            ]
+            self.assert_same_dump(resource, rows)
+
+            # resource dump serializes rows with compiled serializer
+            self.assertEqual(
+                resource.dump(rows, many=True),
+                Schema.dump(resource, rows, many=True),
+            )
+
+    def test_custom_fields(self):
+        schema = ExampleSchema()
+        self.assertIsNotNone(get_converter(schema.fields["id"]))
+        self.assertIsNotNone(get_converter(schema.fields["ids"]))
+        self.assertIsNone(get_converter(schema.fields["upper"]))
+        self.assertIsNone(get_converter(schema.fields["decimal"]))
+
+    def test_dump_hooks(self):
+        class HookSchema(Schema):
+            id = fields.Int()
+
+            @post_dump
+            def add_type(self, data, **kwargs):
+                data["type"] = "hook"
+                return data
+
+        self.assertIsNone(RowSerializer.compile(HookSchema()))
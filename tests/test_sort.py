@@ -1,9 +1,12 @@
 from unittest.mock import patch
 
 import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
 
+from awokado.utils import get_sort_way
 from tests.base import BaseAPITest
 from tests.test_app import models as m
+from tests.test_app.resources import BookResource
 from tests.test_app.routes import api
 
 
@@ -93,3 +96,44 @@ class SortTest(BaseAPITest):
         self.patch_session(session_patch)
         # TODO: add exception
         resp = self.simulate_get("/v1/book/", query_string="sort=xxx")
+
+    @patch("awokado.resource.Transaction", autospec=True)
+    def test_sortable(self, session_patch):
+        self.patch_session(session_patch)
+
+        with patch.object(BookResource.Meta, "sortable", ("id", "title")):
+            resp = self.simulate_get("/v1/book/", query_string="sort=-title")
+            self.assertEqual(resp.status, "200 OK", resp.text)
+            self.assertEqual(resp.json["payload"]["book"][0]["title"], "third")
+
+            resp = self.simulate_get(
+                "/v1/book/", query_string="sort=description"
+            )
+            self.assertEqual(resp.status, "400 Bad Request", resp.text)
+            self.assertEqual(resp.json["code"], "bad-sort")
+
+    def test_sort_nulls(self):
+        # NULLS isn't added for not nullable columns, plain indexes serve them
+        for sort, expected in (
+            ("id", "books.id ASC"),
+            ("-id", "books.id DESC"),
+            ("title", "books.title ASC NULLS FIRST"),
+            ("-title", "books.title DESC NULLS LAST"),
+        ):
+            _, sort_way = get_sort_way(sort)
+            column = getattr(m.Book, sort.lstrip("-"))
+            self.assertEqual(
+                str(sort_way(column).compile(dialect=postgresql.dialect())),
+                expected,
+            )
+
+        # outer joined columns are NULL for not matched rows
+        _, sort_way = get_sort_way("author_name", BookResource.Meta.select_from)
+        self.assertEqual(
+            str(
+                sort_way(m.Author.first_name).compile(
+                    dialect=postgresql.dialect()
+                )
+            ),
+            "authors.first_name ASC NULLS FIRST",
+        )
@@ -0,0 +1,104 @@
+from unittest.mock import patch
+
+import sqlalchemy as sa
+
+from awokado.request import ReadContext
+from tests.base import BaseAPITest
+from tests.test_app import models as m
+from tests.test_app.resources import BookResource
+from tests.test_app.routes import api
+
+stream_rows = ReadContext.stream_rows
+
+
+class StreamTest(BaseAPITest):
+    def setup_dataset(self):
+        self.author_id = self.create_author("Steven King")
+        for i in range(5):
+            self.session.execute(
+                sa.insert(m.Book).values(
+                    {
+                        m.Book.title: f"book {i}",
+                        m.Book.author_id: self.author_id,
+                    }
+                )
+            )
+
+    def setUp(self):
+        super().setUp()
+        self.app = api
+        self.setup_dataset()
+
+    @patch("awokado.resource.Transaction", autospec=True)
+    def test_same_response(self, session_patch):
+        self.patch_session(session_patch)
+
+        for query_string in (
+            "sort=title",
+            "limit=2&sort=-title",
+            "limit=2&offset=4&sort=title",
+            "limit=10&include=author",
+            "title[eq]=unknown",
+        ):
+            resp = self.simulate_get("/v1/book/", query_string=query_string)
+            self.assertEqual(resp.status, "200 OK", resp.text)
+
+            streamed = self.simulate_get(
+                "/v1/book/", query_string=f"{query_string}&stream=true"
+            )
+            self.assertEqual(streamed.status, "200 OK", streamed.text)
+            self.assertEqual(streamed.json, resp.json, query_string)
+
+    @patch("awokado.resource.Transaction", autospec=True)
+    def test_before_cursor(self, session_patch):
+        self.patch_session(session_patch)
+
+        resp = self.simulate_get(
+            "/v1/book/", query_string="limit=2&offset=2&sort=title"
+        )
+        resp = self.simulate_get(
+            "/v1/book/",
+            query_string=f"limit=2&sort=title&stream=true"
+            f"&before={resp.json['meta']['prev']}",
+        )
+        self.assertEqual(resp.status, "400 Bad Request", resp.text)
+
+    @patch("awokado.resource.Transaction", autospec=True)
+    def test_invalid_includes(self, session_patch):
+        self.patch_session(session_patch)
+
+        # errors are responded before the rows are written
+        for query_string, status, code in (
+            ("include=bogus", "404 Not Found", "relation-not-found"),
+            ("include=author.bogus", "404 Not Found", "relation-not-found"),
+            (
+                "include=author&filter[store.name][eq]=x",
+                "400 Bad Request",
+                "bad-filter",
+            ),
+            (
+                "include=author&fields[author]=bogus",
+                "400 Bad Request",
+                "bad-request",
+            ),
+        ):
+            resp = self.simulate_get(
+                "/v1/book/", query_string=f"{query_string}&stream=true"
+            )
+            self.assertEqual(resp.status, status, query_string)
+            self.assertEqual(resp.json["code"], code, query_string)
+
+    @patch("awokado.resource.Transaction", autospec=True)
+    def test_no_includes(self, session_patch):
+        self.patch_session(session_patch)
+
+        # ids of the rows aren't kept without includes to load
+        with patch.object(
+            ReadContext, "stream_rows", autospec=True, side_effect=stream_rows
+        ) as rows, patch.object(BookResource, "read__includes") as includes:
+            resp = self.simulate_get("/v1/book/", query_string="stream=true")
+
+        self.assertEqual(resp.status, "200 OK", resp.text)
+        self.assertEqual(len(resp.json["payload"]["book"]), 5)
+        self.assertEqual(rows.call_args[0][0].obj_ids, [])
+        includes.assert_not_called()
@@ -0,0 +1,112 @@
+from unittest.mock import patch
+
+import sqlalchemy as sa
+
+from awokado.consts import (
+    TOTAL_KIND_CAPPED,
+    TOTAL_KIND_ESTIMATED,
+    TOTAL_KIND_EXACT,
+    TOTAL_KIND_HAS_MORE,
+)
+from awokado.total import (
+    CappedTotal,
+    EstimatedTotal,
+    ExactTotal,
+    HasMoreTotal,
+)
+from tests.base import BaseAPITest
+from tests.test_app import models as m
+from tests.test_app.resources import BookResource
+from tests.test_app.routes import api
+
+
+class CappedTotalTwo(CappedTotal):
+    CAP = 2
+
+
+class TotalTest(BaseAPITest):
+    def setup_dataset(self):
+        self.store_id = self.session.execute(
+            sa.insert(m.Store)
+            .values({m.Store.name: "bookstore"})
+            .returning(m.Store.id)
+        ).scalar()
+        for title in ("first", "second", "third"):
+            self.session.execute(
+                sa.insert(m.Book).values(
+                    {m.Book.title: title, m.Book.store_id: self.store_id}
+                )
+            )
+
+    def setUp(self):
+        super().setUp()
+        self.app = api
+        self.setup_dataset()
+
+    @patch.object(BookResource.Meta, "total", ExactTotal)
+    @patch("awokado.resource.Transaction", autospec=True)
+    def test_exact(self, session_patch):
+        self.patch_session(session_patch)
+
+        for query_string in ("limit=1", "limit=2&offset=2", "offset=3"):
+            resp = self.simulate_get("/v1/book/", query_string=query_string)
+            self.assertEqual(resp.status, "200 OK", resp.text)
+            self.assertEqual(resp.json["meta"]["total"], 3, query_string)
+            self.assertEqual(resp.json["meta"]["total_kind"], TOTAL_KIND_EXACT)
+
+        resp = self.simulate_get(
+            "/v1/book/", query_string="limit=1&total=false"
+        )
+        self.assertEqual(resp.status, "200 OK", resp.text)
+        self.assertEqual(len(resp.json["payload"]["book"]), 1)
+        self.assertNotIn("total", resp.json["meta"])
+
+    @patch.object(BookResource.Meta, "total", EstimatedTotal)
+    @patch("awokado.resource.Transaction", autospec=True)
+    def test_estimated(self, session_patch):
+        self.patch_session(session_patch)
+
+        resp = self.simulate_get("/v1/book/", query_string="limit=1")
+        self.assertEqual(resp.status, "200 OK", resp.text)
+        self.assertIsInstance(resp.json["meta"]["total"], int)
+        self.assertEqual(resp.json["meta"]["total_kind"], TOTAL_KIND_ESTIMATED)
+
+        resp = self.simulate_get("/v1/book/", query_string="limit=10")
+        self.assertEqual(resp.json["meta"]["total"], 3)
+        self.assertEqual(resp.json["meta"]["total_kind"], TOTAL_KIND_EXACT)
+
+    @patch.object(BookResource.Meta, "total", CappedTotalTwo)
+    @patch("awokado.resource.Transaction", autospec=True)
+    def test_capped(self, session_patch):
+        self.patch_session(session_patch)
+
+        resp = self.simulate_get("/v1/book/", query_string="limit=1")
+        self.assertEqual(resp.status, "200 OK", resp.text)
+        self.assertEqual(resp.json["meta"]["total"], 2)
+        self.assertEqual(resp.json["meta"]["total_kind"], TOTAL_KIND_CAPPED)
+
+        resp = self.simulate_get(
+            "/v1/book/", query_string="limit=1&title[in]=first,second"
+        )
+        self.assertEqual(resp.json["meta"]["total"], 2)
+        self.assertEqual(resp.json["meta"]["total_kind"], TOTAL_KIND_EXACT)
+
+    @patch.object(BookResource.Meta, "total", HasMoreTotal)
+    @patch("awokado.resource.Transaction", autospec=True)
+    def test_has_more(self, session_patch):
+        self.patch_session(session_patch)
+
+        resp = self.simulate_get("/v1/book/", query_string="limit=2")
+        self.assertEqual(resp.status, "200 OK", resp.text)
+        self.assertEqual(len(resp.json["payload"]["book"]), 2)
+        self.assertNotIn("total", resp.json["meta"])
+        self.assertTrue(resp.json["meta"]["has_more"])
+        self.assertEqual(resp.json["meta"]["total_kind"], TOTAL_KIND_HAS_MORE)
+
+        resp = self.simulate_get(
+            "/v1/book/",
+            query_string=f"limit=2&after={resp.json['meta']['next']}",
+        )
+        self.assertEqual(len(resp.json["payload"]["book"]), 1)
+        self.assertFalse(resp.json["meta"]["has_more"])
+        self.assertIsNone(resp.json["meta"]["next"])
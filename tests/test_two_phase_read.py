@@ -0,0 +1,92 @@
+from unittest.mock import patch
+
+import sqlalchemy as sa
+
+from awokado.total import HasMoreTotal
+from tests.base import BaseAPITest
+from tests.test_app import models as m
+from tests.test_app.resources import AuthorResource
+from tests.test_app.routes import api
+
+
+class TwoPhaseReadTest(BaseAPITest):
+    def setup_dataset(self):
+        for name, books_count in (
+            ("Steven King", 3),
+            ("Agatha Christie", 0),
+            ("Leo Tolstoy", 2),
+            ("Jules Verne", 1),
+        ):
+            author_id = self.create_author(name)
+            for i in range(books_count):
+                self.session.execute(
+                    sa.insert(m.Book).values(
+                        {
+                            m.Book.title: f"{name} {i}",
+                            m.Book.author_id: author_id,
+                        }
+                    )
+                )
+
+    def setUp(self):
+        super().setUp()
+        self.app = api
+        self.setup_dataset()
+
+    def read(self, query_string: str, two_phase: bool) -> dict:
+        with patch.object(AuthorResource.Meta, "two_phase_read", two_phase):
+            resp = self.simulate_get("/v1/author/", query_string=query_string)
+
+        self.assertEqual(resp.status, "200 OK", resp.text)
+
+        # array_agg order depends on the query plan
+        for author in resp.json["payload"]["author"]:
+            author["books"].sort()
+
+        return resp.json
+
+    @patch("awokado.resource.Transaction", autospec=True)
+    def test_same_response(self, session_patch):
+        self.patch_session(session_patch)
+
+        for query_string in (
+            "limit=2&sort=name",
+            "limit=2&offset=1&sort=-name",
+            "limit=3&offset=3&sort=name",
+            "limit=2&sort=-books_count",
+            "limit=2&sort=name&id[gte]=0",
+            "offset=1",
+        ):
+            self.assertEqual(
+                self.read(query_string, two_phase=True),
+                self.read(query_string, two_phase=False),
+                query_string,
+            )
+
+        first_page = self.read("limit=2&sort=name", two_phase=True)
+        self.assertEqual(
+            [a["name"] for a in first_page["payload"]["author"]],
+            ["Agatha Christie", "Jules Verne"],
+        )
+        self.assertEqual(first_page["meta"]["total"], 4)
+
+        query_string = f"limit=2&sort=name&after={first_page['meta']['next']}"
+        self.assertEqual(
+            self.read(query_string, two_phase=True),
+            self.read(query_string, two_phase=False),
+        )
+
+    @patch.object(AuthorResource.Meta, "total", HasMoreTotal)
+    @patch("awokado.resource.Transaction", autospec=True)
+    def test_has_more(self, session_patch):
+        self.patch_session(session_patch)
+
+        response = self.read("limit=3&sort=-name", two_phase=True)
+        self.assertEqual(
+            [
+                (a["name"], a["books_count"])
+                for a in response["payload"]["author"]
+            ],
+            [("Steven King", 3), ("Leo Tolstoy", 2), ("Jules Verne", 1)],
+        )
+        self.assertTrue(response["meta"]["has_more"])